@@ -0,0 +1,165 @@
+"""Apply a profile's patches to DOT.jar files without the GUI.
+
+    python -m app.cli apply [--profile NAME ...] [--jobs N] [--format text|json] DOT.jar [DOT.jar ...]
+
+Each JAR is opened, backed up, patched with the profile's latest patch per record
+(the same merge as "Reapply My Changes") and written once. If the game updated the
+JAR, the backup is refreshed and the patches rebased first (see patch_engine.rebase).
+Repeating --profile stacks several profiles, later ones winning where they disagree
+(see patch_engine.load_order); the stack is still applied in one write. Independent
+JARs run in parallel worker processes. Exit status: 0 all applied cleanly, 1 a JAR failed,
+3 applied with conflicts. Never imports Qt; the heavy modules load in the workers.
+"""
+import argparse, contextlib, json, os, sys, time
+from concurrent.futures import ProcessPoolExecutor, as_completed
+from app.safety.atomic import DURABILITY
+
+EXIT_OK, EXIT_FAILED, EXIT_CONFLICTS = 0, 1, 3
+
+
+def apply_to_jar(jar_path: str, profiles_root: str, profiles: list[str], durability: str | None = None) -> dict:
+    """Open one JAR, apply the profiles' patches and close it. Backups go to the
+    default profile, like the app's, so a JAR's baseline does not depend on which
+    profiles are applied. Runs in a worker process; log lines go to stderr so stdout stays
+    machine-readable. The helper reads and writes the .dat files against this JAR's
+    own classes, whatever DOT_JAR_PATH says."""
+    started = time.perf_counter()
+    result = {"jar": jar_path, "ok": False, "conflicts": [], "error": None}
+    previous_jar = os.environ.get("DOT_JAR_PATH")
+    os.environ["DOT_JAR_PATH"] = jar_path
+    with contextlib.redirect_stdout(sys.stderr):
+        try:
+            from app.data.jar_io import JarSession
+            from app.patch_engine.patch_apply import apply_all
+            from app.patch_engine.load_order import LoadOrder
+            from app.patch_engine.patch_store import PatchStore
+            from app.patch_engine.rebase import rebase_patches
+            from app.safety.backups import BackupManager
+            stores = [(name, PatchStore(os.path.join(profiles_root, name))) for name in profiles]
+            with JarSession.open(jar_path, BackupManager(profiles_root)) as session:
+                if durability:
+                    session.durability = durability
+                if session.game_update:
+                    rebased = [rebase_patches(session, s) for _, s in stores]
+                    result["game_update"] = {
+                        "entries": session.game_update["entries"],
+                        "records": rebased[0]["changed"],
+                        "rebased": sum(len(r["rebased"]) for r in rebased),
+                    }
+                store = stores[0][1] if len(stores) == 1 else LoadOrder(stores)
+                result["conflicts"] = apply_all(session, store)     # one serialize + repack
+                result["jar_hash"] = session.jar_hash
+            result["ok"] = True
+        except Exception as exc:
+            result["error"] = f"{type(exc).__name__}: {exc}"
+        finally:
+            if previous_jar is None:
+                os.environ.pop("DOT_JAR_PATH", None)
+            else:
+                os.environ["DOT_JAR_PATH"] = previous_jar
+    result["seconds"] = round(time.perf_counter() - started, 3)
+    return result
+
+
+def _patch_count(profiles_root: str, profiles: list[str]) -> int:
+    """Number of records the profiles patch, without loading the patch engine."""
+    targets = set()
+    for profile in profiles:
+        path = os.path.join(profiles_root, profile, "patches.jsonl")
+        if not os.path.exists(path):
+            continue
+        with open(path, "r", encoding="utf-8") as f:
+            for line in f:
+                if line.strip():
+                    t = json.loads(line)["target"]
+                    targets.add((t["type"], t["key"]))
+    return len(targets)
+
+
+def _report_overlaps(overlaps: list[dict], out):
+    for o in overlaps:
+        a, b = o["profiles"]
+        won = ", ".join(f"{f} from {o['winners'][f]}" for f in o["fields"])
+        print(f"OVERRIDE  {o['type']}:{o['key']} ({a} vs {b}): {won}", file=out)
+
+
+def _report_text(results: list[dict], out):
+    for r in results:
+        if not r["ok"]:
+            print(f"FAILED    {r['jar']}: {r['error']}", file=out)
+            continue
+        status = "CONFLICTS" if r["conflicts"] else "OK"
+        print(f"{status:9} {r['jar']} ({r['seconds']:.1f}s, {len(r['conflicts'])} conflicts)", file=out)
+        if "game_update" in r:
+            u = r["game_update"]
+            records = sum(len(keys) for diff in u["records"].values() for keys in diff.values())
+            print(f"    game update: {len(u['entries'])} files, {records} records changed, "
+                  f"{u['rebased']} patches rebased", file=out)
+        for c in r["conflicts"]:
+            where = f"{c['type']}:{c['key']}" + (f".{c['field']}" if "field" in c else "")
+            print(f"    {where}: {c.get('error') or 'changed upstream'}", file=out)
+
+
+def exit_code(results: list[dict]) -> int:
+    if any(not r["ok"] for r in results):
+        return EXIT_FAILED
+    if any(r["conflicts"] for r in results):
+        return EXIT_CONFLICTS
+    return EXIT_OK
+
+
+def cmd_apply(args) -> int:
+    jars = list(dict.fromkeys(os.path.abspath(j) for j in args.jars))
+    order = args.profile or ["default"]
+    if len(set(order)) != len(order):
+        print(f"a profile is listed twice: {' '.join(order)}", file=sys.stderr)
+        return EXIT_FAILED
+    patches = _patch_count(args.profiles, order)
+    overlaps = []
+    if patches and len(order) > 1:
+        from app.patch_engine.load_order import LoadOrder
+        overlaps = LoadOrder.from_profiles(order, args.profiles).overlaps
+    results = {j: {"jar": j, "ok": False, "conflicts": [], "error": "FileNotFoundError: no such JAR"}
+               for j in jars if not os.path.isfile(j)}
+    todo = [j for j in jars if j not in results]
+    if not patches:
+        results.update((j, {"jar": j, "ok": True, "conflicts": [], "error": None, "skipped": "no patches"}) for j in todo)
+    elif args.jobs == 1 or len(todo) <= 1:
+        results.update((j, apply_to_jar(j, args.profiles, order, args.durability)) for j in todo)
+    else:
+        with ProcessPoolExecutor(max_workers=min(args.jobs or os.cpu_count() or 1, len(todo))) as pool:
+            futures = [pool.submit(apply_to_jar, j, args.profiles, order, args.durability) for j in todo]
+            for f in as_completed(futures):
+                r = f.result()
+                results[r["jar"]] = r
+    results = [results[j] for j in jars]
+
+    code = exit_code(results)
+    if args.format == "json":
+        json.dump({"profile": order[0], "load_order": order, "patches": patches, "overlaps": overlaps,
+                   "exit": code, "results": results}, sys.stdout, ensure_ascii=False, indent=2)
+        print()
+    else:
+        _report_overlaps(overlaps, sys.stdout)
+        _report_text(results, sys.stdout)
+    return code
+
+
+def main(argv=None) -> int:
+    ap = argparse.ArgumentParser(prog="python -m app.cli", description=__doc__.splitlines()[0])
+    sub = ap.add_subparsers(dest="command", required=True)
+    p = sub.add_parser("apply", help="apply a profile's patches to one or more DOT.jar files")
+    p.add_argument("jars", nargs="+", metavar="DOT.jar")
+    p.add_argument("--profile", action="append",
+                   help="profile to apply; repeat to stack several, lowest priority first (default: default)")
+    p.add_argument("--profiles", default="profiles", help="profiles directory (default: ./profiles)")
+    p.add_argument("--jobs", "-j", type=int, default=0, help="worker processes (default: one per CPU)")
+    p.add_argument("--format", choices=("text", "json"), default="text")
+    p.add_argument("--durability", choices=DURABILITY,
+                   help="fsync policy for the JAR writes (default: file)")
+    args = ap.parse_args(argv)
+    return cmd_apply(args)
+
+
+if __name__ == "__main__":
+    sys.exit(main())
@@ -1,35 +1,215 @@
 ﻿# app/data/dat_parser.py
-import os, json, subprocess, tempfile
-from typing import List, Dict, Any
+import os, re, json, shutil, subprocess, tempfile, threading, atexit, zipfile
+from contextlib import closing
+from typing import List, Dict, Any, Iterator, Tuple
+from .helper_daemon import HelperDaemon, HelperError, HelperUnavailable
+from .record_cache import RecordCache
+from .object_types import get_type
+from app.diagnostics import trace
+from app.safety.hashes import sha256_bytes, sha256_file
 
 # tools/java relative to this file: app/data -> ../../tools/java
 JAVA_DIR  = os.path.abspath(os.path.join(os.path.dirname(__file__), "..", "..", "tools", "java"))
 DUMP_MAIN = "DumpLoadouts"
+DUMP_TYPES_MAIN = "DumpTypes"
 WRITE_MAIN = "WriteLoadouts"
+DAEMON_MAIN = "HelperDaemon"
 
+_daemons: Dict[str, HelperDaemon | None] = {}   # {dotjar: daemon, or None if it can't run}
+_daemons_lock = threading.Lock()
 
-def _java_classpath(dotjar: str) -> str:
-    helper_root = os.path.abspath(JAVA_DIR)
-    if dotjar:
-        return os.pathsep.join([helper_root, dotjar])
-    return helper_root
 
+_helper_source = None
 
-def _ensure_java_helper(main: str, classpath: str | None = None) -> None:
-    source = os.path.join(JAVA_DIR, f"{main}.java")
-    if not os.path.exists(source):
-        raise FileNotFoundError(source)
-    target = os.path.join(JAVA_DIR, f"{main}.class")
-    needs_compile = not os.path.exists(target) or os.path.getmtime(target) < os.path.getmtime(source)
-    if not needs_compile:
-        return
-    cmd = ["javac"]
-    if classpath:
-        cmd.extend(["-cp", classpath])
-    cmd.append(source)
-    proc = subprocess.run(cmd, cwd=JAVA_DIR, capture_output=True, text=True)
-    if proc.returncode != 0:
-        raise RuntimeError(proc.stderr.strip() or proc.stdout.strip() or "javac failed")
+def helper_version(type_name: str) -> str:
+    """Fingerprint of the dump helper sources and the type's spec; cached records
+    from other versions are ignored."""
+    global _helper_source
+    if _helper_source is None:
+        blob = b""
+        for main in (DUMP_MAIN, DUMP_TYPES_MAIN):
+            with open(os.path.join(JAVA_DIR, f"{main}.java"), "rb") as f:
+                blob += f.read()
+        _helper_source = blob
+    return sha256_bytes(_helper_source + get_type(type_name).fingerprint().encode("utf-8"))[7:23]
+
+
+HELPER_MAINS = (DUMP_MAIN, DUMP_TYPES_MAIN, WRITE_MAIN, DAEMON_MAIN)
+HELPER_CACHE = os.path.join("profiles", "cache", "helpers")
+_helper_jars: Dict[str, str] = {}     # {dotjar: built helper jar}, checked once per process
+_helper_lock = threading.Lock()
+_jdk = None
+
+
+def _jdk_version() -> str:
+    """`javac -version`, remembered on disk per javac binary so it costs no JVM start."""
+    global _jdk
+    if _jdk is not None:
+        return _jdk
+    javac = shutil.which("javac")
+    if not javac:
+        raise FileNotFoundError("javac not found on PATH (a JDK is needed to build the helpers)")
+    real = os.path.realpath(javac)
+    st = os.stat(real)
+    stamp = f"{real}|{st.st_size}|{st.st_mtime_ns}"
+    memo_path = os.path.join(HELPER_CACHE, "jdk.json")
+    try:
+        with open(memo_path, "r", encoding="utf-8") as f:
+            memo = json.load(f)
+    except (OSError, ValueError):
+        memo = {}
+    if stamp not in memo:
+        proc = subprocess.run([javac, "-version"], capture_output=True, text=True)
+        memo[stamp] = (proc.stdout.strip() or proc.stderr.strip()).splitlines()[0]
+        os.makedirs(HELPER_CACHE, exist_ok=True)
+        tmp = f"{memo_path}.{os.getpid()}.tmp"
+        with open(tmp, "w", encoding="utf-8") as f:
+            json.dump(memo, f)
+        os.replace(tmp, memo_path)
+    _jdk = memo[stamp]
+    return _jdk
+
+
+def _game_api(dotjar: str, sources: bytes) -> str:
+    """CRCs of the game classes the helpers import, so a game update that changes them
+    gets freshly compiled helpers."""
+    imports = re.findall(r"^import\s+(dot\.[\w.]+);", sources.decode("utf-8", "ignore"), re.M)
+    names = sorted({m.replace(".", "/") + ".class" for m in imports})
+    with zipfile.ZipFile(dotjar, "r") as z:
+        return ",".join(f"{n}:{z.NameToInfo[n].CRC if n in z.NameToInfo else '-'}" for n in names)
+
+
+def helper_build_key(dotjar: str) -> str:
+    """Hash of the helper sources, the JDK and the game classes they compile against."""
+    sources = b""
+    for main in HELPER_MAINS:
+        with open(os.path.join(JAVA_DIR, f"{main}.java"), "rb") as f:
+            sources += f.read()
+    return sha256_bytes(sources + _jdk_version().encode() + _game_api(dotjar, sources).encode())[7:23]
+
+
+@trace.traced("helper.jar_check")
+def helper_jar(dotjar: str) -> str:
+    """Prebuilt jar of every helper class, from profiles/cache/helpers or compiled now
+    (one javac run for all of them) if no jar matches helper_build_key()."""
+    with _helper_lock:
+        jar = _helper_jars.get(dotjar)
+        if jar and os.path.exists(jar):
+            return jar
+        jar = os.path.join(HELPER_CACHE, f"helpers-{helper_build_key(dotjar)}.jar")
+        if not os.path.exists(jar):
+            _build_helper_jar(dotjar, jar)
+        _helper_jars[dotjar] = jar
+        return jar
+
+
+def _build_helper_jar(dotjar: str, jar: str):
+    work = tempfile.mkdtemp(prefix="dotmodder_javac_")
+    try:
+        sources = [os.path.join(JAVA_DIR, f"{main}.java") for main in HELPER_MAINS]
+        with trace.span("helper.javac", sources=len(sources)):
+            proc = subprocess.run(["javac", "-d", work, "-cp", dotjar] + sources,
+                                  cwd=JAVA_DIR, capture_output=True, text=True)
+        if proc.returncode != 0:
+            raise RuntimeError(proc.stderr.strip() or proc.stdout.strip() or "javac failed")
+        os.makedirs(HELPER_CACHE, exist_ok=True)
+        tmp = f"{jar}.{os.getpid()}.tmp"
+        with zipfile.ZipFile(tmp, "w", zipfile.ZIP_DEFLATED) as z:
+            for root, _, files in os.walk(work):
+                for name in files:
+                    full = os.path.join(root, name)
+                    z.write(full, os.path.relpath(full, work).replace(os.sep, "/"))
+        os.replace(tmp, jar)
+        print(f"[DoT-Modder] Built helper jar: {jar}")
+    finally:
+        shutil.rmtree(work, ignore_errors=True)
+
+
+def _java_classpath(dotjar: str, run_from: str | None = None) -> str:
+    """Helper jar + DOT.jar (or `run_from`, a copy of it)."""
+    return os.pathsep.join([os.path.abspath(helper_jar(dotjar)), run_from or dotjar])
+
+
+def _daemon_enabled() -> bool:
+    return os.getenv("DOTMODDER_HELPER_DAEMON", "1").strip().lower() not in ("0", "false", "no", "off")
+
+
+@trace.traced("helper.jvm_start")
+def _start_daemon(dotjar: str) -> HelperDaemon:
+    classpath = _java_classpath(dotjar)
+    scratch = None
+    if os.name == "nt":
+        # Windows keeps classpath jars locked while the JVM runs; run the daemon off a
+        # private copy so _repack can still replace DOT.jar underneath it.
+        scratch = tempfile.mkdtemp(prefix="dotmodder_cp_")
+        copy = os.path.join(scratch, os.path.basename(dotjar))
+        shutil.copy2(dotjar, copy)
+        classpath = _java_classpath(dotjar, run_from=copy)
+    cmd = ["java", "-Dfile.encoding=UTF-8", "-cp", classpath, DAEMON_MAIN]
+    daemon = HelperDaemon(cmd, cwd=JAVA_DIR, scratch=scratch)
+    try:
+        daemon.start()
+    except Exception:
+        daemon.close()
+        raise
+    print(f"[DoT-Modder] Helper daemon started (v{daemon.version}).")
+    return daemon
+
+
+def _helper_daemon(dotjar: str) -> HelperDaemon | None:
+    """Warm helper JVM for this DOT.jar, or None to fall back to one-shot java."""
+    if not _daemon_enabled():
+        return None
+    with _daemons_lock:
+        if dotjar not in _daemons:
+            try:
+                _daemons[dotjar] = _start_daemon(dotjar)
+            except Exception as exc:
+                print(f"[DoT-Modder] Helper daemon unavailable, using one-shot java: {exc}")
+                _daemons[dotjar] = None
+        return _daemons[dotjar]
+
+
+def _disable_daemon(dotjar: str, exc: Exception):
+    print(f"[DoT-Modder] Helper daemon failed, using one-shot java: {exc}")
+    with _daemons_lock:
+        daemon = _daemons.get(dotjar)
+        _daemons[dotjar] = None
+    if daemon:
+        daemon.close()
+
+
+def shutdown_helpers():
+    """Stop every helper daemon; the next parse/write starts a fresh one."""
+    with _daemons_lock:
+        daemons = [d for d in _daemons.values() if d]
+        _daemons.clear()
+    for d in daemons:
+        d.close()
+
+
+atexit.register(shutdown_helpers)
+
+
+def warm_up(dotjar: str | None = None) -> threading.Thread | None:
+    """Build the helper jar and start the helper daemon in the background, so the first
+    read waits for neither javac nor a JVM. Off with DOTMODDER_WARMUP=0."""
+    if os.getenv("DOTMODDER_WARMUP", "1").strip().lower() in ("0", "false", "no", "off"):
+        return None
+    dotjar = dotjar or _dot_jar()
+    if not os.path.exists(dotjar):
+        return None
+
+    def run():
+        try:
+            if _helper_daemon(dotjar) is None:
+                helper_jar(dotjar)
+        except Exception as exc:
+            print(f"[DoT-Modder] Helper warm-up failed: {exc}")
+
+    t = threading.Thread(target=run, name="helper-warmup", daemon=True)
+    t.start()
+    return t
 
 def _is_java_serialized(path: str) -> bool:
     try:
@@ -46,81 +226,178 @@ def _dot_jar() -> str:
     # fallback guess
     return r"C:\Program Files (x86)\Steam\steamapps\common\The Doors of Trithius\DOT.jar"
 
-def parse_dat(path: str, type_name: str) -> List[Dict[str, Any]]:
-    """Read modules/*.dat via Java helper (FileCache -> LoadoutsXml -> JSON arrays)."""
-    if not os.path.exists(path):
-        return [{"key": f"missing_{type_name.lower()}",
-                 "name": f"{type_name} file not found"}]
-
-    if _is_java_serialized(path):
-        dotjar = _dot_jar()
-        if not os.path.exists(dotjar):
-            return [{
-                "key": f"raw_{type_name.lower()}",
-                "name": "DOT.jar not found",
-                "error": dotjar
-            }]
-        try:
-            _ensure_java_helper(DUMP_MAIN, _java_classpath(dotjar))
-        except Exception as exc:
-            return [{
-                "key": f"raw_{type_name.lower()}",
-                "name": "Java helper compile failed",
-                "error": str(exc)
-            }]
-        cmd = [
-            "java",
-            "-Dfile.encoding=UTF-8",         # force UTF-8 stdout on Windows
-            "-cp", _java_classpath(dotjar),
-            DUMP_MAIN, path, "true"          # arrays=true
-        ]
-        # capture as BYTES; we’ll decode ourselves
-        proc = subprocess.run(cmd, cwd=JAVA_DIR, capture_output=True)
-        if proc.returncode != 0:
-            err = (proc.stderr or b"").decode("utf-8", "ignore")
-            return [{
-                "key": f"raw_{type_name.lower()}",
-                "name": "Java deserialization failed",
-                "error": err.strip()
-            }]
-
-        raw = proc.stdout or b""
+def _placeholder(type_name: str, name: str, prefix: str = "raw", **extra) -> List[Dict[str, Any]]:
+    return [dict({"key": f"{prefix}_{type_name.lower()}", "name": name}, **extra)]
+
+
+class _DumpFailed(Exception):
+    """The helper could not dump the .dat; `fields` become the placeholder record."""
+
+    def __init__(self, name: str, **extra):
+        super().__init__(name)
+        self.fields = {"name": name, **extra}
+
+
+class IncompleteRead(RuntimeError):
+    """The helper failed partway: `types` got none or only some of their records, so
+    they must not be written back (a writer replaces the whole array)."""
+
+    def __init__(self, types: List[str], fields: Dict[str, Any]):
+        super().__init__(f"{fields.get('name')} while reading {', '.join(types)}")
+        self.types = list(types)
+        self.fields = fields
+
+
+def _decode(raw: bytes) -> str:
+    try:
+        return raw.decode("utf-8")
+    except UnicodeDecodeError:
+        return raw.decode("cp1252", errors="replace")  # Windows fallback
+
+
+def _stream_java(path: str, type_names: List[str]) -> Iterator[Tuple[str, Dict[str, Any]]]:
+    """Run the DumpTypes helper once for every type in the .dat, yielding (type, record)
+    as the helper emits them. Raises _DumpFailed, possibly after some records."""
+    dotjar = _dot_jar()
+    if not os.path.exists(dotjar):
+        raise _DumpFailed("DOT.jar not found", error=dotjar)
+    try:
+        classpath = _java_classpath(dotjar)
+    except Exception as exc:
+        raise _DumpFailed("Java helper compile failed", error=str(exc))
+    specs = [get_type(t).spec() for t in type_names]
+    daemon = _helper_daemon(dotjar)
+    if daemon is not None:
+        started = False
         try:
-            text = raw.decode("utf-8")
-        except UnicodeDecodeError:
-            text = raw.decode("cp1252", errors="replace")  # Windows fallback
+            with closing(daemon.stream("dump_stream", path=os.path.abspath(path), types=specs)) as items:
+                for t, record in items:
+                    started = True
+                    yield t, record
+            return
+        except HelperError as exc:
+            raise _DumpFailed("Java deserialization failed", error=str(exc))
+        except HelperUnavailable as exc:
+            _disable_daemon(dotjar, exc)
+            if started:
+                raise _DumpFailed("Helper daemon died mid-dump", error=str(exc))
 
+    cmd = [
+        "java",
+        "-Dfile.encoding=UTF-8",         # force UTF-8 stdout on Windows
+        "-cp", classpath,
+        DUMP_TYPES_MAIN, path, json.dumps(specs, separators=(",", ":")),
+    ]
+    # stdout is NDJSON read as BYTES, one ["Type",{record}] per line; stderr goes to a
+    # file so a chatty JVM can't fill the pipe and stall us.
+    with tempfile.TemporaryFile() as err:
+        proc = subprocess.Popen(cmd, cwd=JAVA_DIR, stdout=subprocess.PIPE, stderr=err)
         try:
-            data = json.loads(text)
-            if isinstance(data, list):
-                return data
-            return [{"key": f"raw_{type_name.lower()}",
-                     "name": "Unexpected helper output"}]
-        except Exception as e:
-            return [{
-                "key": f"raw_{type_name.lower()}",
-                "name": "Bad JSON from helper",
-                "error": str(e),
-                "firstOut": text[:400]
-            }]
-
-    # Fallback for future plain-text files (not used for loadouts)
-    with open(path, "r", encoding="utf-8", errors="ignore") as f:
-        txt = f.read()
-    return [{"key": f"raw_{type_name.lower()}",
-             "name": f"Unparsed {type_name}",
-             "raw": txt[:4000]}]
+            for line in proc.stdout:
+                if not line.strip():
+                    continue
+                text = _decode(line)
+                try:
+                    t, record = json.loads(text)
+                except Exception as e:
+                    raise _DumpFailed("Bad JSON from helper", error=str(e), firstOut=text[:400])
+                yield t, record
+            if proc.wait() != 0:
+                err.seek(0)
+                raise _DumpFailed("Java deserialization failed",
+                                  error=err.read().decode("utf-8", "ignore").strip())
+        finally:
+            if proc.poll() is None:
+                proc.kill()
+            proc.stdout.close()
+            proc.wait()
+
+def iter_types(path: str, type_names: List[str], cache: RecordCache | None = None,
+               dat_hash: str | None = None) -> Iterator[Tuple[str, Dict[str, Any]]]:
+    """Yield (type, record) for several object types of one modules/*.dat, streaming.
+
+    With a RecordCache, types already parsed from a .dat with the same SHA-256 are
+    served from disk; the JVM only runs for the rest, all of them in one pass, and
+    records are yielded as the helper prints them. If the helper fails, each type
+    that got no records yields one placeholder record describing the error, and then
+    IncompleteRead is raised for every type of that pass: any of them may be cut short.
+    Nothing from a failed pass is cached.
+    `dat_hash` skips hashing the file when the caller already knows it (backup blobs).
+    """
+    if not os.path.exists(path):
+        for t in type_names:
+            yield from ((t, r) for r in _placeholder(t, f"{t} file not found", prefix="missing"))
+        return
 
+    if not _is_java_serialized(path):
+        # Fallback for future plain-text files (not used for loadouts)
+        with open(path, "r", encoding="utf-8", errors="ignore") as f:
+            txt = f.read()
+        for t in type_names:
+            yield from ((t, r) for r in _placeholder(t, f"Unparsed {t}", raw=txt[:4000]))
+        return
+
+    missing = list(type_names)
+    if cache is not None:
+        dat_hash = dat_hash or sha256_file(path)
+        for t in type_names:
+            records = cache.get(dat_hash, t, helper_version(t))
+            if records is not None:
+                trace.count("record_cache_hits")
+                missing.remove(t)
+                yield from ((t, r) for r in records)
+    if not missing:
+        return
+    counts = dict.fromkeys(missing, 0)
+    # For the cache we keep references only; the records are the ones the caller holds.
+    kept = {t: [] for t in missing} if cache is not None else None
+    try:
+        with closing(_stream_java(path, missing)) as records:
+            for t, record in records:
+                if t not in counts:
+                    continue
+                counts[t] += 1
+                trace.count("helper_records")
+                if kept is not None:
+                    kept[t].append(record)
+                yield t, record
+    except _DumpFailed as exc:
+        for t in missing:
+            if not counts[t]:
+                yield t, {"key": f"raw_{t.lower()}", **exc.fields}
+        raise IncompleteRead(missing, exc.fields) from exc
+    if kept is not None:
+        for t in missing:
+            cache.put(dat_hash, t, helper_version(t), kept[t])
+
+def parse_types(path: str, type_names: List[str], cache: RecordCache | None = None,
+                dat_hash: str | None = None) -> Dict[str, List[Dict[str, Any]]]:
+    """iter_types() collected into {type: records}; types the .dat lacks map to [].
+    Raises IncompleteRead if the helper fails."""
+    out = {t: [] for t in type_names}
+    for t, record in iter_types(path, type_names, cache, dat_hash):
+        out[t].append(record)
+    return out
+
+def parse_dat(path: str, type_name: str, cache: RecordCache | None = None) -> Iterator[Dict[str, Any]]:
+    """Yield one type's records from modules/*.dat as the Java helper streams them
+    (FileCache -> xml -> NDJSON)."""
+    for _, record in iter_types(path, [type_name], cache):
+        yield record
+
+@trace.traced("dat.serialize")
 def serialize_dat(path: str, type_name: str, records: List[Dict[str, Any]]):
     preview = os.path.splitext(path)[0] + ".json"
     os.makedirs(os.path.dirname(preview), exist_ok=True)
-    with open(preview, "w", encoding="utf-8", newline="\n") as f:
+    with trace.span("dat.preview_write") as sp, open(preview, "w", encoding="utf-8", newline="\n") as f:
         json.dump(records, f, indent=2, ensure_ascii=False)
+        sp.count("bytes", f.tell())
 
     if type_name == "Loadouts":
         _write_loadouts(path, records)
 
 
+@trace.traced("helper.write_loadouts")
 def _write_loadouts(path: str, records: List[Dict[str, Any]]):
     if not os.path.exists(path):
         raise FileNotFoundError(path)
@@ -128,10 +405,20 @@ def _write_loadouts(path: str, records: List[Dict[str, Any]]):
     if not os.path.exists(dotjar):
         raise FileNotFoundError(dotjar)
     try:
-        _ensure_java_helper(WRITE_MAIN, _java_classpath(dotjar))
+        classpath = _java_classpath(dotjar)
     except Exception as exc:
         raise RuntimeError(f"javac failed for {WRITE_MAIN}: {exc}") from exc
 
+    daemon = _helper_daemon(dotjar)
+    if daemon is not None:
+        try:
+            daemon.request("write", path=os.path.abspath(path), records=records)
+            return
+        except HelperError as exc:
+            raise RuntimeError(str(exc) or f"{WRITE_MAIN} failed") from exc
+        except HelperUnavailable as exc:
+            _disable_daemon(dotjar, exc)
+
     with tempfile.NamedTemporaryFile("w", encoding="utf-8", delete=False, suffix=".json") as tmp:
         json.dump(records, tmp, ensure_ascii=False)
         tmp_path = tmp.name
@@ -140,7 +427,7 @@ def _write_loadouts(path: str, records: List[Dict[str, Any]]):
         cmd = [
             "java",
             "-Dfile.encoding=UTF-8",
-            "-cp", _java_classpath(dotjar),
+            "-cp", classpath,
             WRITE_MAIN,
             path,
             tmp_path,
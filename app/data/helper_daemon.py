@@ -0,0 +1,172 @@
+﻿# app/data/helper_daemon.py
+import json, shutil, struct, subprocess, threading
+from typing import Any, Iterator
+from app.diagnostics import trace
+
+_HEADER = struct.Struct(">I")   # 4-byte big-endian frame length, matches DataInputStream.readInt
+
+
+class HelperUnavailable(RuntimeError):
+    """The daemon could not be started (or keeps crashing); use the one-shot path."""
+
+
+class HelperError(RuntimeError):
+    """The daemon is healthy but the command itself failed."""
+
+
+class HelperDaemon:
+    """Long-lived JVM running tools/java/HelperDaemon.
+
+    Speaks length-prefixed JSON frames over stdin/stdout. Restarts the JVM if it dies
+    between or during requests, and gives up after `max_restarts` failed restarts in a row.
+    """
+
+    def __init__(self, cmd: list[str], cwd: str, max_restarts: int = 3, scratch: str | None = None):
+        self.cmd = cmd
+        self.cwd = cwd
+        self.max_restarts = max_restarts
+        self.scratch = scratch      # private dir removed on close (e.g. classpath copy)
+        self.version = None
+        self._proc = None
+        self._failures = 0
+        self._lock = threading.Lock()
+
+    def alive(self) -> bool:
+        return self._proc is not None and self._proc.poll() is None
+
+    def start(self):
+        with self._lock:
+            if not self.alive():
+                self._spawn()
+
+    def ping(self) -> bool:
+        try:
+            self.request("ping")
+            return True
+        except (HelperError, HelperUnavailable):
+            return False
+
+    def request(self, cmd: str, **args) -> Any:
+        payload = {"cmd": cmd, **args}
+        with self._lock, trace.span("helper.request", cmd=cmd):
+            for attempt in (0, 1):
+                if not self.alive():
+                    self._spawn()
+                try:
+                    reply = self._roundtrip(payload)
+                    break
+                except (OSError, EOFError, ValueError) as exc:
+                    # JVM crashed mid-request (or spoke garbage): restart once and retry.
+                    self._kill()
+                    if attempt:
+                        raise HelperUnavailable(f"helper daemon died during '{cmd}': {exc}") from exc
+            self._failures = 0
+        if not reply.get("ok"):
+            raise HelperError(reply.get("error") or f"{cmd} failed")
+        return reply.get("result")
+
+    def stream(self, cmd: str, **args) -> Iterator[Any]:
+        """Yield the "item" frames of a streaming command as they arrive.
+
+        A crash before the first item is retried once, like request(); after that it
+        raises HelperUnavailable. If the caller stops early, the rest of the reply is
+        drained so the next request starts on a frame boundary.
+        """
+        payload = {"cmd": cmd, **args}
+        with self._lock:
+            for attempt in (0, 1):
+                if not self.alive():
+                    self._spawn()
+                try:
+                    self._send(payload)
+                    frame = self._recv()
+                    break
+                except (OSError, EOFError, ValueError) as exc:
+                    self._kill()
+                    if attempt:
+                        raise HelperUnavailable(f"helper daemon died during '{cmd}': {exc}") from exc
+            self._failures = 0
+            done = False
+            try:
+                while "item" in frame:
+                    yield frame["item"]
+                    frame = self._recv()
+                done = True
+            except (OSError, EOFError, ValueError) as exc:
+                self._kill()
+                raise HelperUnavailable(f"helper daemon died during '{cmd}': {exc}") from exc
+            finally:
+                if not done and self.alive():
+                    try:
+                        while "item" in frame:
+                            frame = self._recv()
+                    except (OSError, EOFError, ValueError):
+                        self._kill()
+        if not frame.get("ok"):
+            raise HelperError(frame.get("error") or f"{cmd} failed")
+
+    def close(self):
+        with self._lock:
+            if self.alive():
+                try:
+                    self._roundtrip({"cmd": "shutdown"})
+                    self._proc.wait(timeout=5)
+                except (OSError, EOFError, ValueError, subprocess.TimeoutExpired):
+                    pass
+            self._kill()
+            if self.scratch:
+                shutil.rmtree(self.scratch, ignore_errors=True)
+                self.scratch = None
+
+    # --- internals (caller holds _lock) ---
+    @trace.traced("helper.spawn")
+    def _spawn(self):
+        if self._failures >= self.max_restarts:
+            raise HelperUnavailable(f"helper daemon failed {self._failures} times; giving up")
+        self._failures += 1
+        try:
+            self._proc = subprocess.Popen(self.cmd, cwd=self.cwd,
+                                          stdin=subprocess.PIPE, stdout=subprocess.PIPE)
+            reply = self._roundtrip({"cmd": "ping"})
+        except (OSError, EOFError, ValueError) as exc:
+            self._kill()
+            raise HelperUnavailable(f"helper daemon did not start: {exc}") from exc
+        if not reply.get("ok"):
+            self._kill()
+            raise HelperUnavailable(reply.get("error") or "helper daemon ping failed")
+        self.version = (reply.get("result") or {}).get("version")
+
+    def _roundtrip(self, payload: dict) -> dict:
+        self._send(payload)
+        return self._recv()
+
+    def _send(self, payload: dict):
+        body = json.dumps(payload, ensure_ascii=False).encode("utf-8")
+        self._proc.stdin.write(_HEADER.pack(len(body)) + body)
+        self._proc.stdin.flush()
+
+    def _recv(self) -> dict:
+        (size,) = _HEADER.unpack(self._read(_HEADER.size))
+        return json.loads(self._read(size).decode("utf-8"))
+
+    def _read(self, n: int) -> bytes:
+        buf = self._proc.stdout.read(n)
+        if len(buf) < n:
+            raise EOFError("helper daemon closed its output")
+        return buf
+
+    def _kill(self):
+        proc, self._proc = self._proc, None
+        if proc is None:
+            return
+        if proc.poll() is None:
+            proc.kill()
+        try:
+            proc.wait(timeout=5)
+        except subprocess.TimeoutExpired:
+            pass
+        for stream in (proc.stdin, proc.stdout):
+            try:
+                stream.close()
+            except OSError:
+                pass
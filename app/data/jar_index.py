@@ -0,0 +1,159 @@
+﻿# app/data/jar_index.py
+import os, re, struct, zipfile, zlib
+from collections import OrderedDict
+from app.diagnostics import trace
+
+_CHUNK = 1 << 20
+DEFAULT_CACHE_BYTES = 128 * 1024 * 1024
+
+
+def data_offset(raw, info: zipfile.ZipInfo) -> int:
+    """Offset of an entry's compressed bytes, read from its local header."""
+    raw.seek(info.header_offset)
+    header = raw.read(zipfile.sizeFileHeader)
+    if len(header) != zipfile.sizeFileHeader or header[:4] != zipfile.stringFileHeader:
+        raise zipfile.BadZipFile(f"Bad local header for {info.filename}")
+    fields = struct.unpack(zipfile.structFileHeader, header)
+    return info.header_offset + zipfile.sizeFileHeader + fields[10] + fields[11]
+
+
+def fingerprint(infos) -> dict[str, list[int]]:
+    """{entry name: [CRC, size]} from a central directory: cheap to take and compare,
+    and enough to tell which entries of two JARs differ without reading either."""
+    return {i.filename: [i.CRC, i.file_size] for i in infos if not i.is_dir()}
+
+
+class JarIndex:
+    """Entry names, sizes, CRCs and offsets from the JAR's central directory.
+
+    Read once on open and replaced wholesale after a repack; entries are pulled out
+    by seeking straight to their data, without re-reading the directory.
+    """
+
+    def __init__(self, jar_path: str, infos: list[zipfile.ZipInfo] | None = None):
+        self.jar_path = jar_path
+        self.entries: dict[str, zipfile.ZipInfo] = {}
+        if infos is None:
+            self.refresh()
+        else:
+            self.update(infos)
+
+    def refresh(self):
+        with zipfile.ZipFile(self.jar_path, "r") as z:
+            self.update(z.infolist())
+
+    def update(self, infos: list[zipfile.ZipInfo]):
+        self.entries = {i.filename: i for i in infos if not i.is_dir()}
+
+    def __contains__(self, name: str) -> bool:
+        return name in self.entries
+
+    def find(self, name_regex: str) -> str | None:
+        rx = re.compile(name_regex, re.IGNORECASE)
+        for name in self.entries:
+            if rx.search(name):
+                return name
+        return None
+
+    def crc(self, name: str) -> int:
+        return self.entries[name].CRC
+
+    def size(self, name: str) -> int:
+        return self.entries[name].file_size
+
+    @trace.traced("jar.extract")
+    def extract(self, name: str, dest: str):
+        """Inflate one entry to `dest`, checking its CRC. Written via a .part file."""
+        info = self.entries[name]
+        os.makedirs(os.path.dirname(dest), exist_ok=True)
+        part = dest + ".part"
+        if info.compress_type not in (zipfile.ZIP_STORED, zipfile.ZIP_DEFLATED):
+            with zipfile.ZipFile(self.jar_path, "r") as z, z.open(name) as src, open(part, "wb") as out:
+                while buf := src.read(_CHUNK):
+                    out.write(buf)
+            os.replace(part, dest)
+            return
+        crc = 0
+        decomp = zlib.decompressobj(-15) if info.compress_type == zipfile.ZIP_DEFLATED else None
+        try:
+            with open(self.jar_path, "rb") as raw, open(part, "wb") as out:
+                raw.seek(data_offset(raw, info))
+                left = info.compress_size
+                while left:
+                    buf = raw.read(min(_CHUNK, left))
+                    if not buf:
+                        raise zipfile.BadZipFile(f"Truncated entry {name}")
+                    left -= len(buf)
+                    if decomp:
+                        buf = decomp.decompress(buf)
+                    crc = zlib.crc32(buf, crc)
+                    out.write(buf)
+                if decomp:
+                    buf = decomp.flush()
+                    crc = zlib.crc32(buf, crc)
+                    out.write(buf)
+            trace.count("bytes", info.file_size)
+            if crc != info.CRC:
+                raise zipfile.BadZipFile(f"CRC mismatch for {name}")
+            os.replace(part, dest)
+        finally:
+            if os.path.exists(part):
+                os.unlink(part)
+
+
+class EntryCache:
+    """Bounded on-disk cache of extracted entries, least-recently-used first out.
+
+    Entries marked dirty hold local edits that are not in the JAR yet; they are never
+    evicted or re-extracted until `commit()` after a repack.
+    """
+
+    def __init__(self, index: JarIndex, root: str, max_bytes: int = DEFAULT_CACHE_BYTES):
+        self.index = index
+        self.root = root
+        self.max_bytes = max_bytes
+        self.dirty: set[str] = set()
+        self._files = OrderedDict()     # {name: (crc, size)} as extracted
+
+    def path(self, name: str) -> str:
+        return os.path.join(self.root, *name.split("/"))
+
+    def get(self, name: str) -> str:
+        """Local path of `name`, extracting it from the JAR if missing or stale."""
+        path = self.path(name)
+        held = self._files.get(name)
+        if name in self.dirty or (held and held[0] == self.index.crc(name) and os.path.exists(path)):
+            self._files.move_to_end(name)
+            return path
+        self.index.extract(name, path)
+        self._files[name] = (self.index.crc(name), os.path.getsize(path))
+        self._files.move_to_end(name)
+        self._evict(keep=name)
+        return path
+
+    def mark_dirty(self, name: str):
+        self.dirty.add(name)
+        if name not in self._files:
+            self._files[name] = (None, 0)
+
+    def commit(self):
+        """The JAR now contains the dirty files; adopt its CRCs for them."""
+        for name in self.dirty:
+            path = self.path(name)
+            if name in self.index and os.path.exists(path):
+                self._files[name] = (self.index.crc(name), os.path.getsize(path))
+        self.dirty.clear()
+        self._evict()
+
+    def _evict(self, keep: str | None = None):
+        total = sum(size for _, size in self._files.values())
+        for name in list(self._files):
+            if total <= self.max_bytes:
+                break
+            if name in self.dirty or name == keep:
+                continue
+            total -= self._files.pop(name)[1]
+            try:
+                os.unlink(self.path(name))
+            except OSError:
+                pass
@@ -1,133 +1,553 @@
-﻿import os, zipfile, json, tempfile, shutil, re
-from .dat_parser import parse_dat, serialize_dat
+﻿import os, zipfile, tempfile, shutil, re, threading
+from contextlib import closing, contextmanager
+from .dat_parser import IncompleteRead, iter_types, parse_types, serialize_dat, shutdown_helpers, warm_up
+from .jar_index import JarIndex, EntryCache, DEFAULT_CACHE_BYTES, fingerprint
+from .jar_repack import repack_incremental, repack_full, check_written
+from .record_cache import RecordCache
+from .record_index import RecordIndex, matches, query_words, record_tokens
+from .ref_index import RefIndex
+from .record_store import RecordStore, freeze, thaw
+from .object_types import DEFAULT_DATS, get_type, type_names
+from app.diagnostics import trace
 from app.safety.backups import BackupManager
-from app.safety.atomic import atomic_replace
-from app.safety.hashes import sha256_json
+from app.safety.hashes import has_record, known_hash, record_entries, recorded_entries, sha256_json
+from app.safety.atomic import AtomicFile, DEFAULT_DURABILITY, recover_temp_files
+from app.schema.validate import validate_record
 
 class JarSession:
-    def __init__(self, jar_path: str, workdir: str, backups: BackupManager):
+    def __init__(self, jar_path: str, workdir: str, backups: BackupManager,
+                 index: JarIndex|None = None, cache_bytes: int = DEFAULT_CACHE_BYTES,
+                 record_cache: RecordCache|None = None):
         self.jar_path = jar_path
         self.workdir = workdir
         self.backups = backups
-        self._cache = {}        # {(type,key): dict}
-        self._original = {}     # {(type,key): dict}
-        self._resolved = {}     # {"Loadouts": abs_path}
+        self.index = index or JarIndex(jar_path)
+        self.entries = EntryCache(self.index, workdir, cache_bytes)   # extracted on demand
+        self.record_cache = record_cache    # parsed records by .dat hash, skips the JVM on a hit
+        self._records = RecordStore()   # originals once, frozen; edits as field deltas
+        self._resolved = {}     # {"Loadouts": "modules/loadouts.dat"}
+        self._loaded = set()    # types whose records have been read into _records
+        self._failed = {}       # {type: error} read only partly; read-only until re-read
+        self._baseline = {}     # {type: {key: (frozen record, hash)}} from the baseline backup
+        self._indexes = {}      # {"Loadouts": RecordIndex over _records}, for search()
+        self._refs = RefIndex()     # where-used index over every loaded record
+        self._pending = set()   # types with record edits not yet serialized
+        self._batch_depth = 0
+        self._lock = threading.RLock()
+        self._flush_timer = None
+        self.auto_flush = True      # False: edits stay pending until the caller flush()es
+        self.auto_flush_delay: float|None = None   # seconds; None = write on every edit
+        self.on_auto_flush = None   # callback(exc|None) after a debounced flush
+        self.durability = DEFAULT_DURABILITY    # fsync policy for JAR writes (see safety.atomic)
+        self.jar_hash: str|None = None      # SHA-256 of the JAR as we last wrote it, if known
+        self.game_update: dict|None = None  # {"previous", "baseline", "entries"} if the game changed the JAR
 
     @classmethod
-    def open(cls, jar_path: str, backups: BackupManager) -> "JarSession":
+    @trace.traced("session.open")
+    def open(cls, jar_path: str, backups: BackupManager, progress=None) -> "JarSession":
+        """`progress(message, done, total)` is called between steps; it may raise to cancel.
+
+        If the game replaced DOT.jar since the baseline backup (see
+        BackupManager.upstream_changes), the baseline is refreshed from the changed
+        entries and `game_update` says what changed; see changed_records().
+        """
         if not os.path.exists(jar_path): raise FileNotFoundError(jar_path)
-        backups.ensure_backup(jar_path)
+        recover_temp_files(jar_path)
+        warm_up()       # helper JVM boots while we back up and index
+        if progress: progress("Checking backup", 0, 0)
+        backups.ensure_backup(jar_path, progress)
+        if progress: progress("Indexing DOT.jar", 0, 0)
+        index = JarIndex(jar_path)
+        game_update = None
+        current, written = fingerprint(index.entries.values()), recorded_entries(jar_path)
+        changed = backups.upstream_changes(jar_path, current, written,
+                                           wrote=written is None and has_record(jar_path))
+        if changed:
+            print(f"[DoT-Modder] DOT.jar was updated by the game ({len(changed)} entries changed); "
+                  f"refreshing the baseline backup.")
+            previous = backups.baseline(jar_path)
+            baseline = backups.refresh_baseline(jar_path, changed, progress)
+            game_update = {"previous": previous, "baseline": baseline, "entries": changed}
+        if changed or written is None:
+            record_entries(jar_path, current)   # what is in the JAR now is accounted for
         workdir = tempfile.mkdtemp(prefix="dotmodder_")
-        with zipfile.ZipFile(jar_path, "r") as z:
-            z.extractall(workdir)
-        print(f"[DoT-Modder] Extracted JAR to: {workdir}")
-        return cls(jar_path, workdir, backups)
+        print(f"[DoT-Modder] Indexed {len(index.entries)} JAR entries; cache at: {workdir}")
+        record_cache = RecordCache(os.path.join(backups.root, "cache", "records"))
+        session = cls(jar_path, workdir, backups, index=index, record_cache=record_cache)
+        session.jar_hash = known_hash(jar_path)     # recorded by our last write, if nothing changed it since
+        session.game_update = game_update
+        return session
+
+    def close(self):
+        """Write pending edits, stop the helper daemon and drop the extraction cache."""
+        try:
+            self.flush()
+        finally:
+            shutdown_helpers()
+            shutil.rmtree(self.workdir, ignore_errors=True)
+
+    def __enter__(self):
+        return self
+
+    def __exit__(self, *exc):
+        self.close()
+
+    def _entry_name(self, path: str) -> str:
+        return os.path.relpath(path, self.workdir).replace("\\","/")
 
     def _find_in_modules(self, name_regex: str) -> str|None:
-        """Search extracted workdir for modules/<something> that matches the regex."""
+        """Search the JAR index for a modules/ entry that matches the regex."""
         rx = re.compile(name_regex, re.IGNORECASE)
-        for root, _, files in os.walk(self.workdir):
-            # Look only under *modules* dirs to keep it fast
-            if "modules" not in root.replace("\\","/").lower():
-                continue
-            for f in files:
-                rel = os.path.relpath(os.path.join(root, f), self.workdir).replace("\\","/")
-                if rx.search(rel):
-                    path = os.path.join(self.workdir, rel)
-                    print(f"[DoT-Modder] Auto-located: {rel}")
-                    return path
+        for name in self.index.entries:
+            if "modules/" in name.lower() and rx.search(name):
+                print(f"[DoT-Modder] Auto-located: {name}")
+                return name
         return None
 
-    def _dat_path(self, type_name: str) -> str:
+    def _dat_entry(self, type_name: str) -> str:
+        """JAR entry of the FileCache .dat holding a type (see object_types)."""
         if type_name in self._resolved:
             return self._resolved[type_name]
+        otype = get_type(type_name)
+        found = next((rel for rel in otype.dats if rel in self.index), None)
+        if not found and otype.dat_pattern:
+            found = self._find_in_modules(otype.dat_pattern)
+        if not found:
+            found = next((rel for rel in DEFAULT_DATS if rel in self.index), None)
+        if not found:
+            print(f"[DoT-Modder] {type_name} .dat not found in JAR.")
+            # keep a best-guess name so error messages have a filename
+            found = otype.dats[0]
+        print(f"[DoT-Modder] Using {type_name} at: {found}")
+        self._resolved[type_name] = found
+        return found
+
+    def _dat_path(self, type_name: str) -> str:
+        """Local copy of the type's .dat, extracted from the JAR on first use."""
+        name = self._dat_entry(type_name)
+        if name in self.index:
+            return self.entries.get(name)
+        return self.entries.path(name)
+
+    def _siblings(self, type_name: str) -> list[str]:
+        """Registered types stored in the same .dat as `type_name` (itself included)."""
+        rel = self._dat_entry(type_name)
+        return [t for t in type_names() if self._dat_entry(t) == rel]
+
+    def load_types(self, progress=None, on_keys=None) -> list[str]:
+        """Read every registered type, one helper pass per .dat. Returns the types that have
+        records. `on_keys` is passed to list_records()."""
+        for t in type_names():
+            if t not in self._loaded and t not in self._failed:
+                if progress: progress(f"Reading {self._dat_entry(t)}", 0, 0)
+                self.list_records(t, on_keys=on_keys, progress=progress)
+        return [t for t in type_names() if self._records.keys(t)]
+
+    STREAM_BATCH = 500      # records per on_keys call while streaming
+
+    @trace.traced("session.list_records")
+    def list_records(self, type_name: str, on_keys=None, progress=None) -> list[str]:
+        """(Re)read a type from its .dat. Not-yet-loaded types sharing that .dat are read
+        in the same helper pass.
 
-        if type_name == "Loadouts":
-            # Try common locations first
-            candidates = [
-                "modules/loadouts.dat",
-                "dot/modules/loadouts.dat",
-            ]
-            for rel in candidates:
-                p = os.path.join(self.workdir, rel)
-                if os.path.exists(p):
-                    self._resolved[type_name] = p
-                    print(f"[DoT-Modder] Using Loadouts at: {rel}")
-                    return p
-            # Fallback: search anywhere under modules for a file with 'loadouts' in the name and .dat
-            found = self._find_in_modules(r"modules/.*/?loadouts.*\.dat$|modules/loadouts\.dat$")
-            if not found:
-                print("[DoT-Modder] Loadouts .dat not found in JAR extraction.")
-                # keep a best-guess path so error messages have a filename
-                found = os.path.join(self.workdir, "modules", "loadouts.dat")
-            self._resolved[type_name] = found
-            return found
-
-        raise KeyError(f"Unsupported type: {type_name}")
-
-    def list_records(self, type_name: str) -> list[str]:
+        Records are stored as the helper streams them; `on_keys(type, keys)` gets each
+        new batch of keys so a view can fill in before the read finishes, and
+        `progress(message, done, total)` may raise to cancel (records read so far stay,
+        but the type is not marked loaded). Search indexes are built once a type is complete.
+
+        If the helper fails partway, the records read so far stay visible, but types
+        that were not complete before are marked failed: read-only, and not loaded, so
+        a flush can never write a truncated array back. Reading them again clears that.
+        """
         path = self._dat_path(type_name)
-        print(f"[DoT-Modder] Reading {type_name} from: {os.path.relpath(path, self.workdir).replace('\\','/')}")
-        data = parse_dat(path, type_name)
-        keys = []
-        for rec in data:
-            k = rec.get("key") or rec.get("id")
-            if k:
-                keys.append(k)
-                self._cache[(type_name,k)] = rec
-                self._original.setdefault((type_name,k), json.loads(json.dumps(rec)))
-        if not keys:
-            print(f"[DoT-Modder] No records parsed for {type_name}.")
-        return keys
+        types = [type_name] + [t for t in self._siblings(type_name) if t != type_name and t not in self._loaded]
+        print(f"[DoT-Modder] Reading {', '.join(types)} from: {self._dat_entry(type_name)}")
+        with self._lock:
+            for t in types:
+                if t in self._failed:
+                    self._records.drop_type(t)  # partial records and error placeholder of the last try
+        keep_edits = {t: t in self._pending for t in types}   # unflushed edits are newer than the .dat
+        counts = dict.fromkeys(types, 0)
+        batch, batch_type = [], None
+        failed = None
+
+        def emit():
+            if batch and on_keys:
+                on_keys(batch_type, list(batch))
+            batch.clear()
+
+        try:
+            with closing(iter_types(path, types, self.record_cache)) as records:
+                for t, rec in records:
+                    if t != batch_type:
+                        emit()
+                        batch_type = t
+                    k = rec.get("key") or rec.get("id")
+                    if not k:
+                        continue
+                    with self._lock:
+                        self._records.load(t, k, rec, keep_edits[t])
+                    counts[t] += 1
+                    batch.append(k)
+                    if len(batch) >= self.STREAM_BATCH:
+                        emit()
+                        if progress: progress(f"Reading {t}: {counts[t]:,} records", 0, 0)
+        except IncompleteRead as exc:
+            failed = exc
+        emit()
+        trace.count("records", sum(counts.values()))
+        with self._lock, trace.span("session.index", types=len(types)):
+            for t in types:
+                self._indexes[t] = RecordIndex((k, self._records.view(t,k)) for k in self._records.keys(t))
+                self._refs.drop_type(t)
+                for k in self._records.keys(t):
+                    self._refs.update(t, k, self._records.view(t, k))
+                if failed and t in failed.types and t not in self._loaded:
+                    self._failed[t] = str(failed)
+                    print(f"[DoT-Modder] {t} was only partly read ({failed}); it stays read-only.")
+                    continue
+                self._loaded.add(t)
+                self._failed.pop(t, None)
+                if not counts[t]:
+                    print(f"[DoT-Modder] No records parsed for {t}.")
+        return self._records.keys(type_name)
+
+    def loaded_keys(self, type_name: str) -> list[str]|None:
+        """Keys already in memory for a type, or None if it was never listed."""
+        index = self._indexes.get(type_name)
+        return index.keys() if index is not None else None
+
+    def search(self, type_name: str, query: str) -> list[str]|None:
+        """Keys of loaded records matching `query` (see RecordIndex.search), or None if
+        the type was never listed. Does not wait for a running flush."""
+        index = self._indexes.get(type_name)
+        return index.search(query) if index is not None else None
+
+    def match(self, type_name: str, query: str, keys: list[str]) -> list[str]:
+        """Those of `keys` that search() would return for `query`, checked record by record;
+        for a type still being read, which has no index yet."""
+        words = query_words(query)
+        if not words:
+            return list(keys)
+        return [k for k in keys
+                if (type_name, k) in self._records and matches(words, record_tokens(k, self._records.view(type_name, k)))]
+
+    def ensure_loaded(self, type_name: str):
+        """Read the type unless it is loaded, or its last read failed (see list_records)."""
+        if type_name not in self._loaded and type_name not in self._failed:
+            self.list_records(type_name)
+
+    def _ref_types(self, namespace: str) -> list[str]:
+        return [t for t in type_names() if namespace in (get_type(t).refs or {}).values()]
+
+    def where_used(self, namespace: str, ident: str) -> dict[tuple[str, str], list[str]]:
+        """{(type, key): [fields]} of every record referring to `ident` (a perk, skill,
+        loot table, ... see ObjectType.refs). Loads the types that can refer to it."""
+        for t in self._ref_types(namespace):
+            self.ensure_loaded(t)
+        return self._refs.users(namespace, ident)
+
+    def references(self, namespace: str) -> dict[str, int]:
+        """Identifiers referenced in `namespace`, with the number of records using each."""
+        for t in self._ref_types(namespace):
+            self.ensure_loaded(t)
+        return self._refs.identifiers(namespace)
+
+    def has_record(self, type_name: str, key: str) -> bool:
+        self.ensure_loaded(type_name)
+        return self._records.has_original(type_name, key)
 
     def get_record(self, type_name: str, key: str) -> dict:
-        return json.loads(json.dumps(self._cache[(type_name,key)]))
+        return self._records.get(type_name, key)
+
+    def original_record(self, type_name: str, key: str) -> dict:
+        """The record as it was in the JAR when this session first read it."""
+        return self._records.original(type_name, key)
 
     def update_record(self, type_name: str, key: str, new_data: dict):
-        self._cache[(type_name,key)] = new_data
-        allrecs = [v for (t,k),v in self._cache.items() if t==type_name]
-        serialize_dat(self._dat_path(type_name), type_name, allrecs)
-        self._repack()
+        self._check_writable(type_name)
+        validate_record(type_name, new_data)    # reject bad data before any Java round-trip
+        with self._lock:
+            self.ensure_loaded(type_name)   # serialize needs every record of the type
+            self._records.set(type_name, key, new_data)
+            self._edited(type_name, key)
 
     def restore_record(self, type_name: str, key: str):
-        orig = self._original[(type_name,key)]
-        self.update_record(type_name, key, json.loads(json.dumps(orig)))
+        """Put one record back to its backup version (only its .dat's blob is read).
+        Records the backup lacks go back to how this session first read them."""
+        self._check_writable(type_name)
+        with self._lock:
+            self.ensure_loaded(type_name)   # serialize needs every record of the type
+            rec, _ = self._baseline_records(type_name).get(key, (None, None))
+            if rec is not None:
+                self._records.set(type_name, key, rec)
+            elif not self._records.revert(type_name, key):
+                raise KeyError((type_name, key))
+            self._edited(type_name, key)
+
+    def patch_base(self, type_name: str, key: str) -> tuple[dict|None, str|None]:
+        """(record, hash) a patch of this record is diffed against: its version in the
+        baseline backup, so one patch holds every change made since, not only this
+        session's. Records the backup lacks use how this session first read them; a
+        record new in this session has no base, (None, None)."""
+        with self._lock:
+            rec, digest = self._baseline_records(type_name).get(key, (None, None))
+            if rec is not None:
+                return thaw(rec), digest
+            if self.has_record(type_name, key):
+                return self.original_record(type_name, key), self.base_hash(type_name, key)
+            return None, None
+
+    def _baseline_records(self, type_name: str) -> dict[str, tuple[dict, str]]:
+        """{key: (frozen record, hash)} of a type in the baseline backup, read once."""
+        out = self._baseline.get(type_name)
+        if out is None:
+            out = {}
+            for r in self._backup_records(type_name) or ():
+                k = r.get("key") or r.get("id")
+                if k:
+                    out[k] = (freeze(r), sha256_json(r))
+            self._baseline[type_name] = out
+        return out
+
+    def _check_writable(self, type_name: str):
+        if not get_type(type_name).writable:
+            raise ValueError(f"{type_name} is read-only: there is no writer for it yet")
+        if type_name in self._failed:
+            raise ValueError(f"{type_name} is read-only: it was only partly read "
+                             f"({self._failed[type_name]}); reload it first")
+
+    def _edited(self, type_name: str, key: str):
+        view = self._records.view(type_name, key)
+        self._indexes[type_name].update(key, view)
+        self._refs.update(type_name, key, view)
+        self._pending.add(type_name)
+        self._changed()
 
+    def _backup_records(self, type_name: str, snap: str|None = None) -> list[dict]|None:
+        """A type's records in the baseline backup (or snapshot `snap`), or None if it has
+        no such .dat. Reads that one blob; a record cache hit (keyed by the blob's hash)
+        skips the JVM."""
+        snap = snap or self.backups.baseline(self.jar_path)
+        rel = self._dat_entry(type_name)
+        dat_hash = self.backups.entry_hash(snap, rel) if snap else None
+        if dat_hash is None:
+            return None
+        target = os.path.join(self.workdir, ".backup", *rel.split("/"))
+        self.backups.extract_entry(snap, rel, target)
+        try:
+            return parse_types(target, [type_name], self.record_cache, dat_hash=dat_hash)[type_name]
+        finally:
+            os.unlink(target)
+
+    @trace.traced("session.changed_records")
+    def changed_records(self, progress=None) -> dict[str, dict[str, list[str]]]:
+        """After a game update, the records it changed: {type: {"added", "removed",
+        "changed": [keys]}} for types with any. Only types in a changed .dat are read,
+        old and new, and compared by record hash; the rest are not touched."""
+        if not self.game_update:
+            return {}
+        entries = set(self.game_update["entries"])
+        out = {}
+        for t in type_names():
+            if self._dat_entry(t) not in entries:
+                continue
+            if progress: progress(f"Comparing {t} with the previous version", 0, 0)
+            old = {(r.get("key") or r.get("id")): sha256_json(r)
+                   for r in self._backup_records(t, self.game_update["previous"]) or ()}
+            old.pop(None, None)
+            self.ensure_loaded(t)
+            new = [k for k in self._records.keys(t) if self._records.has_original(t, k)]
+            diff = {"added": [k for k in new if k not in old],
+                    "removed": sorted(k for k in old if not self._records.has_original(t, k)),
+                    "changed": [k for k in new if k in old and old[k] != self.base_hash(t, k)]}
+            if any(diff.values()):
+                out[t] = diff
+        trace.count("records", sum(len(v) for d in out.values() for v in d.values()))
+        return out
+
+    @trace.traced("session.restore_object_type")
     def restore_object_type(self, type_name: str):
-        # Restore the file from the .backup jar
-        bak = self.backups.jar_backup_path(self.jar_path)
-        with zipfile.ZipFile(bak, "r") as z:
-            target = self._dat_path(type_name)
-            rel = os.path.relpath(target, self.workdir).replace("\\","/")
-            tmp = tempfile.mkdtemp()
-            try:
-                z.extract(rel, tmp)
-                shutil.copy2(os.path.join(tmp, rel), target)
-            except KeyError:
-                print(f"[DoT-Modder] Could not find {rel} in backup JAR.")
-        self._reload_type(type_name)
-        self._repack()
+        """Put one type back to the baseline backup's version.
+
+        If nothing else is read from the type's .dat, the file is copied back as-is;
+        otherwise only this type's records are replaced, leaving the others' edits alone.
+        """
+        rel = self._dat_entry(type_name)
+        self.ensure_loaded(type_name)
+        shared = [t for t in self._siblings(type_name) if t != type_name and self._records.keys(t)]
+        if shared:
+            self._check_writable(type_name)
+        with self._lock:
+            if shared:
+                records = self._backup_records(type_name)
+                if records is None:
+                    print(f"[DoT-Modder] Could not find {rel} in backup.")
+                    return
+                self._replace_records(type_name, records)
+                return
+            snap = self.backups.baseline(self.jar_path)
+            if not (snap and self.backups.extract_entry(snap, rel, self.entries.path(rel))):
+                print(f"[DoT-Modder] Could not find {rel} in backup.")
+                return
+            self.entries.mark_dirty(rel)
+            self._pending.discard(type_name)    # the backup copy replaces unsaved edits
+            self._reload_type(type_name)
+            self._changed()
+
+    def _replace_records(self, type_name: str, records: list[dict]):
+        keep = set()
+        for rec in records:
+            k = rec.get("key") or rec.get("id")
+            if k:
+                keep.add(k)
+                self._records.set(type_name, k, rec)
+                view = self._records.view(type_name, k)
+                self._indexes[type_name].update(k, view)
+                self._refs.update(type_name, k, view)
+        for k in self._records.keys(type_name):
+            if k not in keep:
+                self._records.discard(type_name, k)
+                self._indexes[type_name].remove(k)
+                self._refs.remove(type_name, k)
+        self._pending.add(type_name)
+        self._changed()
+
+    @trace.traced("session.restore_all")
+    def restore_all(self, progress=None):
+        """Rebuild DOT.jar from the baseline backup. Entries the JAR still has unchanged
+        are copied from it; only the changed ones are read from the backup store."""
+        snap = self.backups.baseline(self.jar_path)
+        if snap is None:
+            raise FileNotFoundError(f"No backup of {self.jar_path}")
+        step = (lambda done, total: progress("Restoring DOT.jar from backup", done, total)) if progress else None
+        with self._lock:
+            if progress: progress("Restoring DOT.jar from backup", 0, 0)
+            self._cancel_flush_timer()
+            self._pending.clear()
+            self.entries.dirty.clear()
+            with AtomicFile(self.jar_path, self.durability) as out:
+                infos = self.backups.restore_jar(snap, out, current=self.jar_path, progress=step)
+                self.jar_hash = out.commit(lambda tmp: check_written(tmp, infos), fingerprint(infos))
+            self.index.update(infos)
+            self._records.clear()
+            self._indexes.clear()
+            self._refs.clear()
+            self._loaded.clear()
+            self._failed.clear()
+
+    # --- write-behind batching ---
+    @contextmanager
+    def transaction(self, progress=None):
+        """Batch edits: one serialize per touched type and one repack when the outermost
+        block exits. If the block raises, its edits stay pending until the next flush().
+        `progress` is passed to that flush."""
+        with self._lock:
+            self._batch_depth += 1
+        try:
+            yield self
+        finally:
+            with self._lock:
+                self._batch_depth -= 1
+        with self._lock:
+            if self._batch_depth == 0:
+                self.flush(progress)
+
+    @property
+    def has_pending(self) -> bool:
+        return bool(self._pending or self.entries.dirty)
+
+    @trace.traced("session.flush")
+    def flush(self, progress=None) -> bool:
+        """Serialize every pending type once and repack once. Returns True if the JAR was written.
 
-    def restore_all(self):
-        bak = self.backups.jar_backup_path(self.jar_path)
-        atomic_replace(bak, self.jar_path)
+        `progress(message, done, total)` may raise to cancel; whatever was not written
+        yet stays pending.
+        """
+        with self._lock:
+            self._cancel_flush_timer()
+            for type_name in sorted(self._pending):
+                if progress: progress(f"Writing {type_name}", 0, 0)
+                path = self._dat_path(type_name)
+                allrecs = self._records.views(type_name)
+                serialize_dat(path, type_name, allrecs)
+                trace.count("records", len(allrecs))
+                self.entries.mark_dirty(self._entry_name(path))
+                self._pending.discard(type_name)
+            if not self.entries.dirty:
+                return False
+            self._repack(progress=progress)
+            return True
+
+    def flush_later(self, delay: float|None = None):
+        """Debounced flush: each call restarts the timer, so a burst of edits costs one write."""
+        delay = self.auto_flush_delay if delay is None else delay
+        with self._lock:
+            self._cancel_flush_timer()
+            self._flush_timer = threading.Timer(delay or 0, self._timed_flush)
+            self._flush_timer.daemon = True
+            self._flush_timer.start()
+
+    def _changed(self):
+        if self._batch_depth or not self.auto_flush:
+            return
+        if self.auto_flush_delay is not None:
+            self.flush_later()
+        else:
+            self.flush()
+
+    def _cancel_flush_timer(self):
+        if self._flush_timer is not None:
+            self._flush_timer.cancel()
+            self._flush_timer = None
+
+    def _timed_flush(self):
+        error = None
+        with self._lock:
+            if self._batch_depth:
+                return      # the open transaction flushes on exit
+            try:
+                self.flush()
+            except Exception as exc:
+                print(f"[DoT-Modder] Auto-flush failed: {exc}")
+                error = exc
+        if self.on_auto_flush:
+            self.on_auto_flush(error)
 
     def base_hash(self, type_name: str, key: str) -> str:
-        return sha256_json(self._original[(type_name,key)])
+        return self._records.base_hash(type_name, key)
 
     def _reload_type(self, type_name: str):
-        for (t,k) in list(self._cache.keys()):
-            if t==type_name:
-                del self._cache[(t,k)]
-                del self._original[(t,k)]
+        self._records.drop_type(type_name)
+        self._loaded.discard(type_name)
+        self._indexes.pop(type_name, None)
+        self._refs.drop_type(type_name)
         self.list_records(type_name)
 
-    def _repack(self):
-        tmp = self.jar_path + ".tmp.zip"
-        with zipfile.ZipFile(tmp, "w", zipfile.ZIP_DEFLATED) as z:
-            for root, _, files in os.walk(self.workdir):
-                for f in files:
-                    abspath = os.path.join(root, f)
-                    rel = os.path.relpath(abspath, self.workdir)
-                    z.write(abspath, rel)
-        atomic_replace(tmp, self.jar_path)
+    @trace.traced("session.repack")
+    def _repack(self, incremental: bool = True, progress=None):
+        """Write dirty entries back into the JAR.
+
+        Incremental mode copies unchanged entries' compressed bytes straight from the
+        current JAR and recompresses only dirty entries; full mode re-deflates every
+        entry. Either way the new JAR is written once, into a temp file beside it that
+        is hashed as it is written, checked against the central directory and then
+        renamed over DOT.jar (see safety.atomic.AtomicFile).
+        """
+        dirty = {name: self.entries.path(name) for name in self.entries.dirty}
+        trace.count("dirty_entries", len(dirty))
+        step = (lambda done, total: progress("Repacking DOT.jar", done, total)) if progress else None
+        with AtomicFile(self.jar_path, self.durability) as out:
+            if incremental:
+                try:
+                    infos = repack_incremental(self.jar_path, out, dirty, progress=step)
+                except zipfile.BadZipFile as exc:
+                    print(f"[DoT-Modder] Incremental repack failed ({exc}); falling back to full repack.")
+                    out.reset()
+                    incremental = False
+            if not incremental:
+                infos = repack_full(self.jar_path, out, dirty, progress=step)
+            if progress: progress("Replacing DOT.jar", 0, 0)
+            self.jar_hash = out.commit(lambda tmp: check_written(tmp, infos), fingerprint(infos))
+        self.index.update(infos)
+        self.entries.commit()
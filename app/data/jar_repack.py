@@ -0,0 +1,174 @@
+﻿# app/data/jar_repack.py
+import copy, zipfile, zlib
+from typing import Callable
+from .jar_index import data_offset
+from app.diagnostics import trace
+
+_CHUNK = 1 << 20
+_PROGRESS_EVERY = 256   # entries between progress callbacks
+_DESCRIPTOR_SIG = b"PK\x07\x08"
+
+
+def _entry_span(raw, info: zipfile.ZipInfo) -> tuple[int, int]:
+    """Byte range [start, end) of an entry in the source file: local header, data, descriptor."""
+    end = data_offset(raw, info) + info.compress_size
+    if info.flag_bits & 0x08:
+        zip64 = info.file_size > zipfile.ZIP64_LIMIT or info.compress_size > zipfile.ZIP64_LIMIT
+        raw.seek(end)
+        size = 20 if zip64 else 12
+        if raw.read(4) == _DESCRIPTOR_SIG:
+            size += 4
+        end += size
+    return info.header_offset, end
+
+
+def _copy_range(raw, out, start: int, end: int):
+    raw.seek(start)
+    left = end - start
+    while left:
+        buf = raw.read(min(_CHUNK, left))
+        if not buf:
+            raise zipfile.BadZipFile("Unexpected end of source JAR")
+        out.write(buf)
+        left -= len(buf)
+    trace.count("bytes_copied", end - start)
+
+
+def _add_info(out: zipfile.ZipFile, info: zipfile.ZipInfo):
+    out.filelist.append(info)
+    out.NameToInfo[info.filename] = info
+    out.start_dir = out.fp.tell()
+    out._didModify = True
+
+
+def _write_entry(out: zipfile.ZipFile, info: zipfile.ZipInfo, data: bytes):
+    """Compress and write one entry forward-only (no seek back to patch the header)."""
+    zinfo = copy.copy(info)
+    zinfo.file_size = len(data)
+    zinfo.CRC = zlib.crc32(data)
+    if zinfo.compress_type == zipfile.ZIP_STORED:
+        payload = data
+    else:
+        zinfo.compress_type = zipfile.ZIP_DEFLATED
+        comp = zlib.compressobj(zlib.Z_DEFAULT_COMPRESSION, zlib.DEFLATED, -15)
+        payload = comp.compress(data) + comp.flush()
+    write_raw_entry(out, zinfo, payload)
+
+
+def write_raw_entry(out: zipfile.ZipFile, zinfo: zipfile.ZipInfo, payload: bytes):
+    """Write an entry whose compressed bytes are already known. `zinfo` must carry the
+    method, CRC and uncompressed size of `payload`; it is modified and adopted."""
+    zinfo.flag_bits &= ~0x08        # sizes live in the local header, no data descriptor
+    zinfo.compress_size = len(payload)
+    zinfo.header_offset = out.fp.tell()
+    zip64 = zinfo.file_size > zipfile.ZIP64_LIMIT or zinfo.compress_size > zipfile.ZIP64_LIMIT
+    out.fp.write(zinfo.FileHeader(zip64))
+    out.fp.write(payload)
+    _add_info(out, zinfo)
+    trace.count("entries_written")
+    trace.count("bytes_written", len(payload))
+
+
+@trace.traced("jar.repack_incremental")
+def repack_incremental(src_jar: str, dst, dirty: dict[str, str],
+                       progress: Callable[[int, int], None] | None = None) -> list[zipfile.ZipInfo]:
+    """Rebuild `src_jar` into `dst` (path or writable binary file), swapping in `dirty` entries.
+
+    `dirty` maps entry names to files on disk. Unchanged entries are copied as raw
+    compressed bytes (local header included), so nothing is inflated or deflated;
+    consecutive unchanged entries go across in one block copy. Entry order and
+    metadata follow the source central directory; names not in the source are
+    appended at the end. `progress(done, total)` is called every few hundred
+    entries. Returns the new central directory.
+    """
+    with zipfile.ZipFile(src_jar, "r") as src, open(src_jar, "rb") as raw, \
+            zipfile.ZipFile(dst, "w") as out:
+        out.comment = src.comment
+        run_start = run_end = None      # pending block of unchanged source bytes
+        run_infos = []
+
+        def flush_run():
+            nonlocal run_start, run_end, run_infos
+            if run_start is None:
+                return
+            base = out.fp.tell()
+            _copy_range(raw, out.fp, run_start, run_end)
+            for info in run_infos:
+                moved = copy.copy(info)
+                moved.header_offset = base + (info.header_offset - run_start)
+                _add_info(out, moved)
+            run_start = run_end = None
+            run_infos = []
+
+        infos = src.infolist()
+        for n, info in enumerate(infos):
+            if progress and n % _PROGRESS_EVERY == 0:
+                progress(n, len(infos))
+            if info.filename in dirty:
+                flush_run()
+                with open(dirty[info.filename], "rb") as f:
+                    _write_entry(out, info, f.read())
+                continue
+            start, end = _entry_span(raw, info)
+            if run_start is not None and start != run_end:
+                flush_run()
+            if run_start is None:
+                run_start = start
+            run_end = end
+            run_infos.append(info)
+        flush_run()
+
+        for name in sorted(set(dirty) - set(src.NameToInfo)):
+            info = zipfile.ZipInfo.from_file(dirty[name], name)
+            info.compress_type = zipfile.ZIP_DEFLATED
+            with open(dirty[name], "rb") as f:
+                _write_entry(out, info, f.read())
+        infos = out.infolist()
+    return infos
+
+
+@trace.traced("jar.repack_full")
+def repack_full(src_jar: str, dst, dirty: dict[str, str],
+                progress: Callable[[int, int], None] | None = None) -> list[zipfile.ZipInfo]:
+    """Like repack_incremental, but inflates and recompresses every entry."""
+    with zipfile.ZipFile(src_jar, "r") as src, zipfile.ZipFile(dst, "w") as out:
+        out.comment = src.comment
+        infos = src.infolist()
+        for n, info in enumerate(infos):
+            if progress and n % _PROGRESS_EVERY == 0:
+                progress(n, len(infos))
+            if info.filename in dirty:
+                with open(dirty[info.filename], "rb") as f:
+                    data = f.read()
+            else:
+                data = src.read(info)
+            info = copy.copy(info)
+            if info.compress_type != zipfile.ZIP_STORED:
+                info.compress_type = zipfile.ZIP_DEFLATED
+            _write_entry(out, info, data)
+        for name in sorted(set(dirty) - set(src.NameToInfo)):
+            info = zipfile.ZipInfo.from_file(dirty[name], name)
+            info.compress_type = zipfile.ZIP_DEFLATED
+            with open(dirty[name], "rb") as f:
+                _write_entry(out, info, f.read())
+        infos = out.infolist()
+    return infos
+
+
+@trace.traced("jar.check_written")
+def check_written(path: str, infos: list[zipfile.ZipInfo]):
+    """Read back the central directory of a freshly written JAR (only its tail, not the
+    entries) and make sure it lists exactly `infos`, in order, without overlaps."""
+    with zipfile.ZipFile(path, "r") as z:
+        got = z.infolist()
+        start_dir = z.start_dir
+    if len(got) != len(infos):
+        raise zipfile.BadZipFile(f"Central directory lists {len(got)} entries, expected {len(infos)}")
+    last = -1
+    for a, b in zip(got, infos):
+        if (a.filename, a.header_offset, a.CRC, a.compress_size, a.file_size) != \
+                (b.filename, b.header_offset, b.CRC, b.compress_size, b.file_size):
+            raise zipfile.BadZipFile(f"Central directory entry for {b.filename} does not match what was written")
+        if a.header_offset <= last or a.header_offset + a.compress_size > start_dir:
+            raise zipfile.BadZipFile(f"Entry {a.filename} overlaps another entry or the central directory")
+        last = a.header_offset
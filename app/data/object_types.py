@@ -0,0 +1,89 @@
+# app/data/object_types.py
+"""Object types the modder can read, and where they live in DOT.jar.
+
+Each type is one array inside an xml file of a FileCache .dat. Types that share a
+.dat are dumped together in one helper pass (see dat_parser.parse_types).
+"""
+import json
+from typing import Dict, List, Tuple
+
+# The main FileCache; types whose own .dat isn't found are looked up in here.
+DEFAULT_DATS = ("modules/loadouts.dat", "dot/modules/loadouts.dat")
+
+
+class ObjectType:
+    def __init__(self, name: str, xml: str, array: str, fields: List[Tuple[str, str]] | None = None,
+                 dats: Tuple[str, ...] = DEFAULT_DATS, dat_pattern: str | None = None,
+                 xml_path: str | None = None, writable: bool = False, refs: Dict[str, str] | None = None):
+        self.name = name
+        self.xml = xml                  # xmlFiles key suffix, e.g. "loadouts.xml"
+        self.xml_path = xml_path        # exact xmlFiles key, preferred over the suffix
+        self.array = array              # field of the xml object holding the records
+        self.fields = fields            # [(field, "string"|"int"|"list")]; None = every simple field
+        self.dats = dats                # candidate JAR entries, in order
+        self.dat_pattern = dat_pattern  # regex fallback under modules/, before DEFAULT_DATS
+        self.writable = writable        # a Java writer exists for this type
+        self.refs = refs                # {field: namespace} of fields naming other game objects (ref_index)
+
+    def spec(self) -> dict:
+        """The DumpTypes spec for this type."""
+        spec = {"type": self.name, "xml": self.xml, "array": self.array}
+        if self.xml_path:
+            spec["path"] = self.xml_path
+        if self.fields is not None:
+            spec["fields"] = [list(f) for f in self.fields]
+        return spec
+
+    def fingerprint(self) -> str:
+        return json.dumps(self.spec(), sort_keys=True)
+
+
+_TYPES: Dict[str, ObjectType] = {}
+
+
+def register(object_type: ObjectType) -> ObjectType:
+    _TYPES[object_type.name] = object_type
+    return object_type
+
+
+def get_type(name: str) -> ObjectType:
+    try:
+        return _TYPES[name]
+    except KeyError:
+        raise KeyError(f"Unsupported type: {name}") from None
+
+
+def type_names() -> List[str]:
+    return list(_TYPES)
+
+
+register(ObjectType(
+    "Loadouts", xml="loadouts.xml", xml_path="/modules/loadouts/data/loadouts.xml", array="loadouts",
+    fields=[
+        ("key", "string"), ("name", "string"), ("description", "string"),
+        ("sortOrder", "int"), ("selectMajorSkills", "int"), ("selectMinorSkills", "int"),
+        ("majorSkills", "list"), ("minorSkills", "list"), ("abilities", "list"),
+        ("perks", "list"), ("selectPerks", "list"),
+        ("lootTable", "string"), ("lootDescription", "string"),
+        ("card", "string"), ("cardSmall", "string"), ("cardSquare", "string"),
+        ("defaultBodyType", "string"), ("warning", "string"),
+    ],
+    dat_pattern=r"modules/.*/?loadouts.*\.dat$|modules/loadouts\.dat$",
+    writable=True,
+    refs={
+        "majorSkills": "skill", "minorSkills": "skill", "abilities": "ability",
+        "perks": "perk", "selectPerks": "perk", "lootTable": "lootTable",
+        "card": "card", "cardSmall": "card", "cardSquare": "card", "defaultBodyType": "bodyType",
+    },
+))
+
+register(ObjectType(
+    "Backgrounds", xml="backgrounds.xml", array="backgrounds",
+    fields=[
+        ("key", "string"), ("name", "string"), ("description", "string"),
+        ("sortOrder", "int"), ("abilities", "list"), ("perks", "list"),
+    ],
+    dats=("modules/backgrounds.dat", "dot/modules/backgrounds.dat"),
+    dat_pattern=r"modules/.*/?backgrounds.*\.dat$",
+    refs={"abilities": "ability", "perks": "perk"},
+))
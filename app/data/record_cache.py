@@ -0,0 +1,78 @@
+﻿# app/data/record_cache.py
+import os, marshal, hashlib
+from typing import List, Dict, Any
+
+_MAGIC = b"DMRC1"
+DEFAULT_MAX_BYTES = 64 * 1024 * 1024
+
+
+class RecordCache:
+    """Parsed .dat records on disk, keyed by the .dat's SHA-256, the type and the helper version.
+
+    Entries are marshal blobs (fast to load, no JVM needed) written atomically; the
+    directory is trimmed to `max_bytes`, oldest-used first.
+    """
+
+    def __init__(self, root: str = os.path.join("profiles", "cache", "records"), max_bytes: int = DEFAULT_MAX_BYTES):
+        self.root = root
+        self.max_bytes = max_bytes
+
+    def _path(self, dat_hash: str, type_name: str, helper: str) -> str:
+        name = hashlib.sha256(f"{dat_hash}|{type_name}|{helper}".encode("utf-8")).hexdigest()[:32]
+        return os.path.join(self.root, name + ".rec")
+
+    def get(self, dat_hash: str, type_name: str, helper: str) -> List[Dict[str, Any]] | None:
+        path = self._path(dat_hash, type_name, helper)
+        try:
+            with open(path, "rb") as f:
+                blob = f.read()
+        except OSError:
+            return None
+        if not blob.startswith(_MAGIC):
+            return None
+        try:
+            records = marshal.loads(blob[len(_MAGIC):])
+        except (EOFError, ValueError, TypeError):
+            return None
+        try:
+            os.utime(path)      # LRU: a hit counts as a use
+        except OSError:
+            pass
+        return records if isinstance(records, list) else None
+
+    def put(self, dat_hash: str, type_name: str, helper: str, records: List[Dict[str, Any]]):
+        os.makedirs(self.root, exist_ok=True)
+        path = self._path(dat_hash, type_name, helper)
+        tmp = f"{path}.{os.getpid()}.tmp"
+        try:
+            with open(tmp, "wb") as f:
+                f.write(_MAGIC + marshal.dumps(records))
+            os.replace(tmp, path)
+        except (OSError, ValueError) as exc:
+            print(f"[DoT-Modder] Could not cache {type_name} records: {exc}")
+            try:
+                os.unlink(tmp)
+            except OSError:
+                pass
+            return
+        self._evict()
+
+    def _evict(self):
+        entries = []
+        for name in os.listdir(self.root):
+            if name.endswith(".rec"):
+                p = os.path.join(self.root, name)
+                try:
+                    st = os.stat(p)
+                except OSError:
+                    continue
+                entries.append((st.st_mtime, st.st_size, p))
+        total = sum(size for _, size, _ in entries)
+        for _, size, p in sorted(entries):
+            if total <= self.max_bytes:
+                break
+            try:
+                os.unlink(p)
+                total -= size
+            except OSError:
+                pass
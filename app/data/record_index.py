@@ -0,0 +1,124 @@
+﻿# app/data/record_index.py
+import re, threading
+from bisect import bisect_left
+
+_WORD = re.compile(r"[a-z0-9]+")
+
+
+def _texts(value, out: list):
+    if isinstance(value, str):
+        out.append(value)
+    elif isinstance(value, (list, tuple)):
+        out.extend(v for v in value if isinstance(v, str))
+
+
+def query_words(query: str) -> list[str]:
+    """Words of a search query, longest (most selective) first."""
+    return sorted(set(_WORD.findall(query.lower())), key=len, reverse=True)
+
+
+def matches(words: list[str], tokens: set[str]) -> bool:
+    """Whether every query word is a prefix of one of a record's tokens; the same test
+    RecordIndex.search() answers from its postings."""
+    return all(any(t.startswith(w) for t in tokens) for w in words)
+
+
+def record_tokens(key: str, record: dict) -> set[str]:
+    """Searchable words of a record: its key plus every text / text-list field
+    (name, description, skills, perks, loot table, ...)."""
+    texts = [key]
+    for value in record.values():
+        _texts(value, texts)
+    return set(_WORD.findall(" ".join(texts).lower()))
+
+
+class RecordIndex:
+    """Inverted index word -> keys for one object type, for as-you-type search.
+
+    A query matches records containing every query word as a word prefix
+    ("fig ax" finds a record mentioning "Fighter" and "axes"). Results keep the
+    order records were added in. Updates are per record, so a save touches only
+    that record's postings. Safe to search from one thread while another updates.
+    """
+
+    def __init__(self, records=()):
+        self._postings: dict[str, set[str]] = {}
+        self._words: list[str] = []         # sorted keys of _postings, for prefix ranges
+        self._by_key: dict[str, set[str]] = {}
+        self._order: dict[str, int] = {}
+        self._lock = threading.Lock()
+        self.build(records)
+
+    def build(self, records):
+        """Replace the index with (key, record) pairs."""
+        with self._lock:
+            self._postings, self._by_key, self._order = {}, {}, {}
+            for key, record in records:
+                self._order[key] = len(self._order)
+                words = record_tokens(key, record)
+                self._by_key[key] = words
+                for w in words:
+                    self._postings.setdefault(w, set()).add(key)
+            self._words = sorted(self._postings)
+
+    def __len__(self) -> int:
+        return len(self._order)
+
+    def keys(self) -> list[str]:
+        with self._lock:
+            return list(self._order)
+
+    def update(self, key: str, record: dict):
+        with self._lock:
+            self._order.setdefault(key, len(self._order))
+            self._set_words(key, record_tokens(key, record))
+
+    def remove(self, key: str):
+        with self._lock:
+            self._order.pop(key, None)
+            self._set_words(key, set())
+            self._by_key.pop(key, None)
+
+    def _set_words(self, key: str, words: set[str]):
+        old = self._by_key.get(key, set())
+        for w in old - words:
+            keys = self._postings[w]
+            keys.discard(key)
+            if not keys:
+                del self._postings[w]
+                del self._words[bisect_left(self._words, w)]
+        for w in words - old:
+            if w not in self._postings:
+                self._postings[w] = set()
+                self._words.insert(bisect_left(self._words, w), w)
+            self._postings[w].add(key)
+        self._by_key[key] = words
+
+    def _prefix(self, prefix: str) -> set[str]:
+        postings = []
+        i = bisect_left(self._words, prefix)
+        while i < len(self._words) and self._words[i].startswith(prefix):
+            keys = self._postings[self._words[i]]
+            if len(keys) == len(self._order):
+                return keys     # one word already covers every record
+            postings.append(keys)
+            i += 1
+        return set().union(*postings)
+
+    def search(self, query: str) -> list[str]:
+        """Keys matching every word of `query`, in insertion order; all keys if it is blank."""
+        words = query_words(query)
+        with self._lock:
+            if not words:
+                return list(self._order)
+            hits = None
+            for w in words:
+                found = self._prefix(w)
+                hits = found if hits is None else hits & found
+                if not hits:
+                    return []
+            if len(hits) == len(self._order):
+                return list(self._order)
+            if 4 * len(hits) > len(self._order):    # broad prefixes: a scan beats sorting
+                return [k for k in self._order if k in hits]
+            return sorted(hits, key=self._order.__getitem__)
@@ -0,0 +1,136 @@
+# app/data/record_store.py
+from app.safety.hashes import sha256_json
+
+_DELETED = object()     # delta marker: field removed from the original
+
+
+class FrozenDict(dict):
+    """Read-only dict for nested record values. Still a dict, so json.dumps takes it as-is."""
+
+    def _readonly(self, *args, **kwargs):
+        raise TypeError("record data is read-only; use RecordStore.set()")
+
+    __setitem__ = __delitem__ = clear = pop = popitem = setdefault = update = _readonly
+
+
+def freeze(value):
+    """Immutable copy of JSON data: lists become tuples, dicts FrozenDicts. Scalars are shared."""
+    if isinstance(value, (list, tuple)):
+        return tuple(freeze(v) for v in value)
+    if isinstance(value, dict) and not isinstance(value, FrozenDict):
+        return FrozenDict((k, freeze(v)) for k, v in value.items())
+    return value
+
+
+def thaw(value):
+    """Plain mutable copy of frozen data, safe to hand to editors."""
+    if isinstance(value, tuple):
+        return [thaw(v) for v in value]
+    if isinstance(value, dict):
+        return {k: thaw(v) for k, v in value.items()}
+    return value
+
+
+class RecordStore:
+    """Records of a JarSession: each original stored once, frozen, edits as per-field deltas.
+
+    `view()` builds a shallow dict that shares the frozen field values, so listing,
+    indexing and serializing a type never deep-copies it; `get()` / `original()`
+    thaw a private copy for callers that mutate. Original hashes are computed once.
+    """
+
+    def __init__(self):
+        self._base = {}         # {(type,key): FrozenDict} as first read
+        self._delta = {}        # {(type,key): {field: frozen value | _DELETED}}
+        self._hash = {}         # {(type,key): sha256 of the original}
+        self._order = {}        # {type: {key: None}} in load order
+
+    def __contains__(self, tk) -> bool:
+        return tk in self._base or tk in self._delta
+
+    def has_original(self, type_name: str, key: str) -> bool:
+        return (type_name, key) in self._base
+
+    def keys(self, type_name: str) -> list[str]:
+        return list(self._order.get(type_name, ()))
+
+    def load(self, type_name: str, key: str, record: dict, keep_edits: bool = False):
+        """Record as read from the .dat. The first read becomes the original; later reads
+        become the current value unless `keep_edits` is set and it has been edited."""
+        tk = (type_name, key)
+        if tk not in self._base:
+            self._base[tk] = freeze(record)
+            self._order.setdefault(type_name, {})[key] = None
+        elif not (keep_edits and tk in self._delta):
+            self.set(type_name, key, record)
+
+    def set(self, type_name: str, key: str, record: dict):
+        """Make `record` the current value; only fields that differ from the original are kept."""
+        tk = (type_name, key)
+        base = self._base.get(tk, FrozenDict())
+        delta = {f: v for f, v in ((f, freeze(v)) for f, v in record.items()) if base.get(f, _DELETED) != v}
+        delta.update((f, _DELETED) for f in base if f not in record)
+        if delta or tk not in self._base:
+            self._delta[tk] = delta
+        else:
+            self._delta.pop(tk, None)
+        self._order.setdefault(type_name, {})[key] = None
+
+    def revert(self, type_name: str, key: str):
+        """Back to the original; returns False if there is none."""
+        self._delta.pop((type_name, key), None)
+        return (type_name, key) in self._base
+
+    def discard(self, type_name: str, key: str):
+        """Remove a record entirely (it will not be serialized)."""
+        tk = (type_name, key)
+        self._base.pop(tk, None)
+        self._delta.pop(tk, None)
+        self._hash.pop(tk, None)
+        self._order.get(type_name, {}).pop(key, None)
+
+    def view(self, type_name: str, key: str) -> dict:
+        """Current record without copying field values: the frozen original itself if
+        unedited, else a shallow dict over it. Treat as read-only."""
+        tk = (type_name, key)
+        base = self._base.get(tk)
+        delta = self._delta.get(tk)
+        if delta is None:
+            if base is None:
+                raise KeyError(tk)
+            return base
+        out = dict(base) if base else {}
+        for f, v in delta.items():
+            if v is _DELETED:
+                out.pop(f, None)
+            else:
+                out[f] = v
+        return out
+
+    def views(self, type_name: str) -> list[dict]:
+        return [self.view(type_name, k) for k in self._order.get(type_name, ())]
+
+    def get(self, type_name: str, key: str) -> dict:
+        if (type_name, key) not in self:
+            raise KeyError((type_name, key))
+        return thaw(self.view(type_name, key))
+
+    def original(self, type_name: str, key: str) -> dict:
+        return thaw(self._base[(type_name, key)])
+
+    def base_hash(self, type_name: str, key: str) -> str:
+        tk = (type_name, key)
+        h = self._hash.get(tk)
+        if h is None:
+            h = self._hash[tk] = sha256_json(self._base[tk])
+        return h
+
+    def drop_type(self, type_name: str):
+        for key in self._order.pop(type_name, ()):
+            tk = (type_name, key)
+            self._base.pop(tk, None)
+            self._delta.pop(tk, None)
+            self._hash.pop(tk, None)
+
+    def clear(self):
+        self._base.clear(); self._delta.clear(); self._hash.clear(); self._order.clear()
@@ -0,0 +1,81 @@
+# app/data/ref_index.py
+import threading
+from .object_types import get_type
+
+
+def record_refs(type_name: str, record: dict) -> set[tuple[str, str, str]]:
+    """(namespace, identifier, field) for every reference a record makes, per its type's
+    `refs` (e.g. Loadouts.perks -> ("perk", "P_Tough", "perks"))."""
+    out = set()
+    for field, ns in (get_type(type_name).refs or {}).items():
+        value = record.get(field)
+        if isinstance(value, str):
+            if value:
+                out.add((ns, value, field))
+        elif isinstance(value, (list, tuple)):
+            out.update((ns, v, field) for v in value if isinstance(v, str) and v)
+    return out
+
+
+class RefIndex:
+    """Where-used index over every loaded record: (namespace, identifier) -> the records
+    and fields that name it.
+
+    Kept in step with the session per record (update / remove), like RecordIndex, so an
+    edit touches only that record's entries. Safe to query from one thread while
+    another updates.
+    """
+
+    def __init__(self):
+        self._users: dict[tuple[str, str], dict[tuple[str, str], set[str]]] = {}
+        self._by_record: dict[tuple[str, str], set[tuple[str, str, str]]] = {}
+        self._lock = threading.Lock()
+
+    def update(self, type_name: str, key: str, record: dict):
+        refs = record_refs(type_name, record)
+        with self._lock:
+            self._set_refs((type_name, key), refs)
+
+    def remove(self, type_name: str, key: str):
+        with self._lock:
+            self._set_refs((type_name, key), set())
+            self._by_record.pop((type_name, key), None)
+
+    def drop_type(self, type_name: str):
+        with self._lock:
+            for tk in [tk for tk in self._by_record if tk[0] == type_name]:
+                self._set_refs(tk, set())
+                del self._by_record[tk]
+
+    def clear(self):
+        with self._lock:
+            self._users.clear()
+            self._by_record.clear()
+
+    def _set_refs(self, tk: tuple[str, str], refs: set[tuple[str, str, str]]):
+        old = self._by_record.get(tk, set())
+        for ns, ident, field in old - refs:
+            users = self._users[(ns, ident)]
+            fields = users[tk]
+            fields.discard(field)
+            if not fields:
+                del users[tk]
+                if not users:
+                    del self._users[(ns, ident)]
+        for ns, ident, field in refs - old:
+            self._users.setdefault((ns, ident), {}).setdefault(tk, set()).add(field)
+        self._by_record[tk] = refs
+
+    def users(self, namespace: str, ident: str) -> dict[tuple[str, str], list[str]]:
+        """{(type, key): [fields]} of the records referring to `ident`."""
+        with self._lock:
+            return {tk: sorted(fields) for tk, fields in self._users.get((namespace, ident), {}).items()}
+
+    def identifiers(self, namespace: str) -> dict[str, int]:
+        """Every identifier referenced in `namespace`, with how many records use it."""
+        with self._lock:
+            return {ident: len(users) for (ns, ident), users in sorted(self._users.items()) if ns == namespace}
+
+    def namespaces(self) -> list[str]:
+        with self._lock:
+            return sorted({ns for ns, _ in self._users})
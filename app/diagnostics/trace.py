@@ -0,0 +1,235 @@
+# app/diagnostics/trace.py
+"""Nested timing spans and counters for the hot paths.
+
+    with trace.span("session.repack", dirty=len(dirty)) as sp:
+        ...
+        sp.count("bytes_out", n)
+
+Disabled (the default), span() hands back one shared no-op object, so instrumented
+code pays a global lookup and a method call. Enable with enable() or the
+DOTMODDER_TRACE environment variable:
+
+    DOTMODDER_TRACE=trace.jsonl     one JSON line per finished span, as it finishes
+    DOTMODDER_TRACE=trace.json      Chrome trace (chrome://tracing, Perfetto) written at exit
+    DOTMODDER_TRACE=1               in memory only (for the GUI timing panel)
+
+Finished top-level spans are kept (with their children) for recent(), and passed to
+subscribe()d callbacks on the thread that finished them.
+"""
+import atexit, itertools, json, os, threading, time
+from collections import deque
+
+_enabled = False
+_local = threading.local()
+_ids = itertools.count(1)
+_lock = threading.Lock()
+_finished = deque(maxlen=100_000)   # every finished span, for Chrome export
+_recent = deque(maxlen=50)          # finished root spans, newest last
+_listeners = []
+_jsonl = None                       # open file when exporting JSONL
+_chrome_path = None
+_epoch_ns = time.perf_counter_ns()
+
+
+class Span:
+    __slots__ = ("id", "name", "parent", "tid", "start_ns", "end_ns", "attrs", "counters", "children")
+
+    def __init__(self, name: str, attrs: dict):
+        self.id = next(_ids)
+        self.name = name
+        self.attrs = attrs
+        self.counters = {}
+        self.children = []
+        self.tid = threading.get_ident()
+        self.parent = None
+        self.start_ns = self.end_ns = 0
+
+    @property
+    def duration_ms(self) -> float:
+        return (self.end_ns - self.start_ns) / 1e6
+
+    def count(self, name: str, n: int = 1):
+        self.counters[name] = self.counters.get(name, 0) + n
+
+    def set(self, **attrs):
+        self.attrs.update(attrs)
+
+    def __enter__(self):
+        stack = _stack()
+        if stack:
+            self.parent = stack[-1]
+            self.parent.children.append(self)
+        stack.append(self)
+        self.start_ns = time.perf_counter_ns()
+        return self
+
+    def __exit__(self, exc_type, exc, tb):
+        self.end_ns = time.perf_counter_ns()
+        if exc_type is not None:
+            self.attrs["error"] = exc_type.__name__
+        stack = _stack()
+        if stack and stack[-1] is self:
+            stack.pop()
+        _finish(self)
+        return False
+
+    def to_dict(self) -> dict:
+        return {
+            "id": self.id, "parent": self.parent.id if self.parent else None, "name": self.name,
+            "ts_us": (self.start_ns - _epoch_ns) // 1000, "dur_us": (self.end_ns - self.start_ns) // 1000,
+            "tid": self.tid, "attrs": self.attrs, "counters": self.counters,
+        }
+
+
+class _NoSpan:
+    __slots__ = ()
+
+    def count(self, name: str, n: int = 1):
+        pass
+
+    def set(self, **attrs):
+        pass
+
+    def __enter__(self):
+        return self
+
+    def __exit__(self, *exc):
+        return False
+
+
+_NO_SPAN = _NoSpan()
+
+
+def _stack() -> list:
+    stack = getattr(_local, "stack", None)
+    if stack is None:
+        stack = _local.stack = []
+    return stack
+
+
+def enabled() -> bool:
+    return _enabled
+
+
+def span(name: str, **attrs):
+    """Context manager timing a block; nested spans on the same thread become children."""
+    if not _enabled:
+        return _NO_SPAN
+    return Span(name, attrs)
+
+
+def traced(name: str):
+    """Decorator form of span()."""
+    def wrap(fn):
+        def inner(*args, **kwargs):
+            if not _enabled:
+                return fn(*args, **kwargs)
+            with Span(name, {}):
+                return fn(*args, **kwargs)
+        inner.__name__, inner.__doc__, inner.__wrapped__ = fn.__name__, fn.__doc__, fn
+        return inner
+    return wrap
+
+
+def count(name: str, n: int = 1):
+    """Add to a counter on the innermost open span of this thread (no-op outside spans)."""
+    if _enabled:
+        stack = _stack()
+        if stack:
+            stack[-1].count(name, n)
+
+
+def _finish(sp: Span):
+    root = sp.parent is None
+    with _lock:
+        _finished.append(sp)
+        if root:
+            _recent.append(sp)
+        if _jsonl is not None:
+            _jsonl.write(json.dumps(sp.to_dict(), default=str) + "\n")
+            if root:
+                _jsonl.flush()
+        listeners = list(_listeners) if root else ()
+    for fn in listeners:
+        try:
+            fn(sp)
+        except Exception as exc:
+            print(f"[DoT-Modder] Trace listener failed: {exc}")
+
+
+def recent(n: int = 20) -> list[Span]:
+    with _lock:
+        return list(_recent)[-n:]
+
+
+def subscribe(fn):
+    """Call fn(root_span) whenever a top-level span finishes."""
+    with _lock:
+        _listeners.append(fn)
+
+
+def unsubscribe(fn):
+    with _lock:
+        if fn in _listeners:
+            _listeners.remove(fn)
+
+
+def enable(jsonl: str | None = None, chrome: str | None = None):
+    """Start tracing; optionally stream JSONL to a file and/or write a Chrome trace at exit."""
+    global _enabled, _jsonl, _chrome_path
+    with _lock:
+        if jsonl and _jsonl is None:
+            _jsonl = open(jsonl, "a", encoding="utf-8")
+        if chrome:
+            _chrome_path = chrome
+        _enabled = True
+
+
+def disable():
+    global _enabled, _jsonl
+    with _lock:
+        _enabled = False
+        if _jsonl is not None:
+            _jsonl.close()
+            _jsonl = None
+
+
+def chrome_events() -> dict:
+    """Finished spans in Chrome's trace event format ("X" complete events)."""
+    pid = os.getpid()
+    with _lock:
+        spans = list(_finished)
+    events = [{"name": sp.name, "ph": "X", "pid": pid, "tid": sp.tid,
+               "ts": (sp.start_ns - _epoch_ns) / 1000, "dur": (sp.end_ns - sp.start_ns) / 1000,
+               "args": {**sp.attrs, **sp.counters}} for sp in spans]
+    return {"traceEvents": events, "displayTimeUnit": "ms"}
+
+
+def export_chrome(path: str):
+    with open(path, "w", encoding="utf-8") as f:
+        json.dump(chrome_events(), f, default=str)
+
+
+def _at_exit():
+    if _chrome_path:
+        try:
+            export_chrome(_chrome_path)
+        except OSError as exc:
+            print(f"[DoT-Modder] Could not write trace {_chrome_path}: {exc}")
+    disable()
+
+
+def _from_env():
+    target = os.getenv("DOTMODDER_TRACE", "").strip()
+    if not target or target.lower() in ("0", "false", "no", "off"):
+        return
+    if target.lower().endswith(".jsonl"):
+        enable(jsonl=target)
+    elif target.lower().endswith(".json"):
+        enable(chrome=target)
+    else:
+        enable()
+
+
+atexit.register(_at_exit)
+_from_env()
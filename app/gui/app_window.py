@@ -1,13 +1,19 @@
-﻿from PySide6.QtWidgets import QMainWindow, QWidget, QHBoxLayout, QFileDialog, QToolBar, QMessageBox
+﻿from PySide6.QtWidgets import (QMainWindow, QWidget, QHBoxLayout, QFileDialog, QToolBar, QMessageBox,
+                               QProgressBar, QPushButton, QDockWidget, QInputDialog)
 from PySide6.QtGui import QAction
+from PySide6.QtCore import Qt, QTimer, Signal
 from .panes.object_types import ObjectTypesPane
 from .panes.record_list import RecordListPane
 from .panes.record_editor import RecordEditorPane
-from app.data.jar_io import JarSession
-from app.safety.backups import BackupManager
-from app.patch_engine.patch_store import PatchStore
+from .workers import SessionWorker
+from app.diagnostics import trace
+from app.data.object_types import get_type, type_names
+from app.schema.validate import ValidationError, validate_record
 
 class AppWindow(QMainWindow):
+    AUTO_FLUSH_MS = 1000        # quiet time before queued saves hit DOT.jar
+    span_finished = Signal(object)      # trace spans finish on the worker thread
+
     def __init__(self):
         super().__init__()
         self.setWindowTitle("DoT Modder (MVP)")
@@ -15,12 +21,20 @@ class AppWindow(QMainWindow):
 
         # Core services
         self.session = None
-        self.patch_store = PatchStore()
-        self.backups = BackupManager()
+        self._streaming = None      # {type: keys so far} while load_types runs
+        self._patch_store = None    # opened on first use; see patch_store
+        self._backups = None
+        # All JarSession work runs here, one operation at a time, off the UI thread.
+        self.worker = SessionWorker(self)
+        self.worker.progress.connect(self._on_progress)
+        self.worker.busy_changed.connect(self._on_busy)
+        self.flush_timer = QTimer(self, singleShot=True, interval=self.AUTO_FLUSH_MS)
+        self.flush_timer.timeout.connect(self.flush_session)
 
         # Panes
         self.types_pane = ObjectTypesPane(on_select=self.on_type_selected)
-        self.list_pane = RecordListPane(on_select=self.on_record_selected)
+        self.list_pane = RecordListPane(on_select=self.on_record_selected, search=self.search_records,
+                                        match=self.match_records)
         self.editor_pane = RecordEditorPane(
             on_save=self.on_record_save,
             on_restore=self.on_record_restore
@@ -37,74 +51,405 @@ class AppWindow(QMainWindow):
         tb = QToolBar("Main", self); self.addToolBar(tb)
         open_act = QAction("Open DOT.jar", self, triggered=self.open_jar)
         reapply_act = QAction("Reapply My Changes", self, triggered=self.reapply_changes)
+        refs_act = QAction("Rename / Remove Reference…", self, triggered=self.edit_references)
         restore_type_act = QAction("Restore This Object Type", self, triggered=self.restore_object_type)
         restore_all_act = QAction("Restore All to Default", self, triggered=self.restore_all)
         tb.addAction(open_act); tb.addSeparator()
-        tb.addAction(reapply_act); tb.addSeparator()
+        tb.addAction(reapply_act)
+        tb.addAction(refs_act); tb.addSeparator()
         tb.addAction(restore_type_act)
         tb.addAction(restore_all_act)
+        tb.addSeparator()
+
+        # Timing breakdown; tracing only runs while the panel is open (or DOTMODDER_TRACE is set)
+        self.timings_dock = None    # built the first time it is shown
+        self.timings_act = QAction("Timings", self, checkable=True, toggled=self._toggle_timings)
+        tb.addAction(self.timings_act)
+        self._span_listener = self.span_finished.emit
+        self._traced_by_panel = False
+
+        # Progress + cancel, shown while the worker is busy
+        self.progress = QProgressBar(); self.progress.setMaximumWidth(240); self.progress.hide()
+        self.cancel_btn = QPushButton("Cancel"); self.cancel_btn.hide()
+        self.cancel_btn.clicked.connect(self.worker.cancel_all)
+        self.statusBar().addPermanentWidget(self.progress)
+        self.statusBar().addPermanentWidget(self.cancel_btn)
 
         self.update_enables(False)
+        QTimer.singleShot(0, self._after_first_paint)
+
+    def _after_first_paint(self):
+        """Startup work the window doesn't need to appear: patch log upkeep and warming
+        up the Java helper for the first read."""
+        if self.patch_store.needs_compaction():
+            self.patch_store.compact_async()
+        from app.data.dat_parser import warm_up
+        warm_up()
+
+    @property
+    def patch_store(self):
+        if self._patch_store is None:
+            from app.patch_engine.patch_store import PatchStore
+            self._patch_store = PatchStore()
+        return self._patch_store
+
+    @property
+    def backups(self):
+        if self._backups is None:
+            from app.safety.backups import BackupManager
+            self._backups = BackupManager()
+        return self._backups
+
+    # --- background plumbing ---
+    def run_task(self, name: str, fn, on_done=None, on_partial=None, always=None):
+        """Queue fn(ctx) on the session worker; failures and cancellations are reported here.
+        `always()` runs first however the task ends."""
+        def settle(callback):
+            def run(*args):
+                if always: always()
+                if callback: callback(*args)
+            return run
+        self.statusBar().showMessage(f"{name}…")
+        return self.worker.submit(
+            name, fn, on_done=settle(on_done), on_partial=on_partial,
+            on_error=settle(lambda e: self._task_failed(name, e)),
+            on_cancel=settle(lambda: self.statusBar().showMessage(f"{name} cancelled.", 5000)))
+
+    def _task_failed(self, name: str, error: Exception):
+        if isinstance(error, ValidationError):
+            QMessageBox.warning(self, "Invalid record", "\n".join(err["message"] for err in error.errors))
+        else:
+            QMessageBox.critical(self, f"{name} failed", str(error))
+        self.statusBar().clearMessage()
+
+    def _on_progress(self, message: str, done: int, total: int):
+        self.statusBar().showMessage(message)
+        self.progress.setRange(0, total)    # total 0 = busy indicator
+        self.progress.setValue(done)
+
+    def _on_busy(self, busy: bool):
+        self.progress.setVisible(busy)
+        self.cancel_btn.setVisible(busy)
+        if busy:
+            self.progress.setRange(0, 0)
+
+    def _toggle_timings(self, checked: bool):
+        if self.timings_dock is None:
+            if not checked: return
+            from .panes.timings import TimingsPane
+            self.timings_pane = TimingsPane()
+            self.timings_dock = QDockWidget("Timings", self)
+            self.timings_dock.setWidget(self.timings_pane)
+            self.addDockWidget(Qt.BottomDockWidgetArea, self.timings_dock)
+            self.timings_dock.visibilityChanged.connect(self._on_timings_visible)
+            self.timings_dock.visibilityChanged.connect(self.timings_act.setChecked)
+            self.span_finished.connect(self.timings_pane.add_span)
+        self.timings_dock.setVisible(checked)
+
+    def _on_timings_visible(self, visible: bool):
+        if visible:
+            if not trace.enabled():
+                trace.enable()
+                self._traced_by_panel = True
+            self.timings_pane.clear()
+            for span in trace.recent():
+                self.timings_pane.add_span(span)
+            trace.unsubscribe(self._span_listener)     # visibilityChanged may repeat
+            trace.subscribe(self._span_listener)
+        else:
+            trace.unsubscribe(self._span_listener)
+            if self._traced_by_panel:
+                trace.disable()
+                self._traced_by_panel = False
+
+    def closeEvent(self, event):
+        self.flush_timer.stop()
+        self.worker.cancel_all()
+        self.worker.wait()
+        self._close_session()
+        super().closeEvent(event)
+
+    def _close_session(self):
+        if not self.session: return
+        try:
+            self.session.close()    # writes any queued saves first
+        except Exception as e:
+            QMessageBox.critical(self, "Save failed", f"Pending edits could not be written: {e}")
+        self.session = None
 
     def update_enables(self, enabled: bool):
         self.types_pane.setEnabled(enabled)
         self.list_pane.setEnabled(enabled)
         self.editor_pane.setEnabled(enabled)
 
-    def open_jar(self):
-        path, _ = QFileDialog.getOpenFileName(self, "Select DOT.jar", filter="JAR Files (*.jar)")
+    def open_jar(self, path: str | None = None):
+        if not path:
+            path, _ = QFileDialog.getOpenFileName(self, "Select DOT.jar", filter="JAR Files (*.jar)")
         if not path: return
-        try:
-            self.session = JarSession.open(path, self.backups)
-            self.types_pane.load_types(["Loadouts"])
+        self.flush_timer.stop()
+        old, self.session = self.session, None
+        self.update_enables(False)
+
+        backups = self.backups
+
+        def work(ctx):
+            from app.data.jar_io import JarSession
+            if old:
+                ctx.progress("Saving previous session")
+                old.close()
+            return JarSession.open(path, backups, progress=ctx.progress)
+
+        def done(session):
+            session.auto_flush = False     # flush_timer schedules writes on the worker
+            self.session = session
+            self.types_pane.clear()
             self.list_pane.clear()
             self.editor_pane.clear()
             self.update_enables(True)
-        except Exception as e:
-            QMessageBox.critical(self, "Open failed", str(e))
+            self.statusBar().showMessage(f"Opened {path}", 5000)
+            self.load_types()
+            if session.game_update:
+                self.rebase_after_update()
+
+        self.run_task("Opening DOT.jar", work, done)
+
+    def rebase_after_update(self):
+        """The game replaced DOT.jar: move the stored patches onto the records it changed
+        and list the ones that could not follow."""
+        from app.patch_engine.rebase import rebase_patches
+        session, store = self.session, self.patch_store
+
+        def done(result):
+            records = sum(len(keys) for diff in result["changed"].values() for keys in diff.values())
+            msg = (f"DOT.jar was updated by the game: {len(session.game_update['entries'])} files and "
+                   f"{records} records changed. The backup now holds the new version.")
+            if result["rebased"]:
+                msg += f"\n\n{len(result['rebased'])} of your changes were moved onto the new records."
+            msg += "\n\nUse \"Reapply My Changes\" to write your changes into the new DOT.jar."
+            review = result["review"]
+            if review:
+                lines = [f"{c['type']}:{c['key']} — {c.get('field') or c.get('error')}" for c in review[:20]]
+                QMessageBox.warning(self, "Game updated",
+                                    msg + f"\n\n{len(review)} need review; the game changed them too:\n" + "\n".join(lines))
+            else:
+                QMessageBox.information(self, "Game updated", msg)
+
+        self.run_task("Checking the game update", lambda ctx: rebase_patches(session, store, ctx.progress), done)
+
+    def load_types(self):
+        """Read every object type in one helper pass per .dat. Types appear in the types
+        pane, and keys in the record list, as the helper streams them."""
+        session = self.session
+        self._streaming = {}
+
+        def done(types):
+            for t in types:
+                self.types_pane.add_type(t)
+            t = self.types_pane.current_type()
+            if t: self.on_type_selected(t)
+
+        def stop():
+            self._streaming = None
+
+        self.run_task("Reading object types",
+                      lambda ctx: session.load_types(ctx.progress, on_keys=lambda t, ks: ctx.partial((t, ks))),
+                      done, on_partial=lambda batch: self._on_keys(session, batch), always=stop)
+
+    def _on_keys(self, session, batch):
+        """A batch of keys streamed in by a list_records/load_types task."""
+        t, keys = batch
+        if session is not self.session: return
+        if self._streaming is not None:
+            new_type = t not in self._streaming
+            self._streaming.setdefault(t, []).extend(keys)
+            if new_type and not self.types_pane.findItems(t, Qt.MatchExactly):
+                self.types_pane.add_type(t)     # may select it, which shows _streaming[t]
+                return
+        if self.types_pane.current_type() == t:
+            self.list_pane.append_records(keys)
 
     def on_type_selected(self, type_name: str):
         if not self.session: return
         self.list_pane.set_type(type_name)
-        records = self.session.list_records(type_name)
-        self.list_pane.load_records(records)
+        keys = self.session.loaded_keys(type_name)
+        if keys is not None:
+            self.list_pane.load_records(keys)
+            return
+        if self._streaming is not None:     # load_types is reading it; batches will follow
+            self.list_pane.load_records(self._streaming.get(type_name, []))
+            return
+        self.list_pane.clear()
+        session = self.session
+
+        def work(ctx):
+            ctx.progress(f"Reading {type_name}")
+            return session.list_records(type_name, on_keys=lambda t, ks: ctx.partial((t, ks)), progress=ctx.progress)
+
+        def done(keys):
+            if self.session is session and self.types_pane.current_type() == type_name:
+                self.list_pane.load_records(keys)
+                self.statusBar().showMessage(f"{len(keys)} {type_name} records", 5000)
+
+        self.run_task(f"Loading {type_name}", work, done, on_partial=lambda batch: self._on_keys(session, batch))
+
+    def search_records(self, query: str) -> list[str]|None:
+        """Filter box lookup against the session's in-memory index; safe while the worker is busy."""
+        t = self.types_pane.current_type()
+        if not (self.session and t): return None
+        return self.session.search(t, query)
+
+    def match_records(self, query: str, keys: list[str]) -> list[str]:
+        """Filter box lookup for keys still streaming in, before the type's index exists."""
+        t = self.types_pane.current_type()
+        if not (self.session and t): return []
+        return self.session.match(t, query, keys)
 
     def on_record_selected(self, type_name: str, key: str):
         if not self.session: return
-        data = self.session.get_record(type_name, key)
+        data = self.session.get_record(type_name, key)     # in memory; fine during a repack
         self.editor_pane.load_record(type_name, key, data)
 
     def on_record_save(self, type_name: str, key: str, new_data: dict):
         if not self.session: return
-        self.session.update_record(type_name, key, new_data)
-        self.patch_store.record_patch(type_name, key, new_data, base_hash=self.session.base_hash(type_name, key))
-        QMessageBox.information(self, "Saved", f"{type_name}:{key} saved (patch recorded).")
+        try:
+            validate_record(type_name, new_data)    # instant feedback, before queueing
+        except ValidationError as e:
+            QMessageBox.warning(self, "Invalid record", "\n".join(err["message"] for err in e.errors))
+            return
+        session = self.session
+
+        def work(ctx):
+            session.update_record(type_name, key, new_data)     # written later by flush_timer
+            return session.patch_base(type_name, key)
+
+        def done(result):
+            base, base_hash = result
+            self.patch_store.record_patch(type_name, key, new_data, base_hash=base_hash, base=base)
+            self.list_pane.refilter()
+            self.statusBar().showMessage(f"{type_name}:{key} saved (patch recorded); writing DOT.jar…")
+            self.flush_timer.start()
+
+        self.run_task(f"Saving {type_name}:{key}", work, done)
+
+    def flush_session(self):
+        """Debounced write of queued saves: one serialize + repack per burst of edits."""
+        if not self.session: return
+        session = self.session
+        self.run_task("Writing DOT.jar", lambda ctx: session.flush(ctx.progress),
+                      lambda wrote: self.statusBar().showMessage("DOT.jar updated." if wrote else "Nothing to write.", 5000))
 
     def on_record_restore(self, type_name: str, key: str):
         if not self.session: return
-        self.session.restore_record(type_name, key)
-        data = self.session.get_record(type_name, key)
-        self.editor_pane.load_record(type_name, key, data)
-        QMessageBox.information(self, "Restored", f"{type_name}:{key} restored to default.")
+        session = self.session
+
+        def work(ctx):
+            session.restore_record(type_name, key)
+            return session.get_record(type_name, key), *session.patch_base(type_name, key)
+
+        def done(result):
+            data, base, base_hash = result
+            # An empty patch supersedes earlier edits, so "Reapply" won't bring them back.
+            self.patch_store.record_patch(type_name, key, data, base_hash=base_hash, base=base)
+            self.editor_pane.load_record(type_name, key, data)
+            self.list_pane.refilter()
+            self.statusBar().showMessage(f"{type_name}:{key} restored to default; writing DOT.jar…")
+            self.flush_timer.start()
+
+        self.run_task(f"Restoring {type_name}:{key}", work, done)
 
     def restore_object_type(self):
         if not self.session: return
         t = self.types_pane.current_type()
         if not t: return
-        self.session.restore_object_type(t)
-        self.on_type_selected(t)
+        self.flush_timer.stop()
+        session = self.session
+
+        def work(ctx):
+            with session.transaction(ctx.progress):
+                session.restore_object_type(t)
+
+        def done(_):
+            self.editor_pane.clear()
+            self.on_type_selected(t)
+            self.statusBar().showMessage(f"{t} restored from backup.", 5000)
+
+        self.run_task(f"Restoring {t}", work, done)
 
     def restore_all(self):
         if not self.session: return
-        self.session.restore_all()
-        self.types_pane.clear(); self.list_pane.clear(); self.editor_pane.clear()
-        self.update_enables(False)
+        self.flush_timer.stop()
+        session = self.session
+
+        def done(_):
+            self.types_pane.clear(); self.list_pane.clear(); self.editor_pane.clear()
+            self.update_enables(False)
+            self.statusBar().showMessage("DOT.jar restored to default.", 5000)
+
+        self.run_task("Restoring DOT.jar", lambda ctx: session.restore_all(ctx.progress), done)
 
     def reapply_changes(self):
         if not self.session: return
         from app.patch_engine.patch_apply import apply_all
-        conflicts = apply_all(self.session, self.patch_store)
-        if conflicts:
-            QMessageBox.warning(self, "Conflicts", f"{len(conflicts)} conflicts need review (conflict UI coming).")
-        else:
-            QMessageBox.information(self, "Reapplied", "Your changes were reapplied successfully.")
+        self.flush_timer.stop()
+        session = self.session
+
+        def done(conflicts):
+            if self.patch_store.needs_compaction():
+                self.patch_store.compact_async()
+            t = self.types_pane.current_type()
+            if t: self.on_type_selected(t)
+            if conflicts:
+                lines = [f"{c['type']}:{c['key']} — {c.get('field') or c.get('error')}" for c in conflicts[:20]]
+                QMessageBox.warning(self, "Conflicts",
+                                    f"{len(conflicts)} conflicts need review; upstream values were kept:\n" + "\n".join(lines))
+            else:
+                QMessageBox.information(self, "Reapplied", "Your changes were reapplied successfully.")
+
+        self.run_task("Reapplying changes", lambda ctx: apply_all(session, self.patch_store, ctx.progress), done)
+
+    def edit_references(self):
+        """Rename, merge or remove a perk / skill / loot table / ... across every record using it."""
+        if not self.session: return
+        if self.worker.busy:
+            self.statusBar().showMessage("Wait for the current task to finish.", 5000)
+            return
+        session, store = self.session, self.patch_store
+        namespaces = sorted({ns for t in type_names() for ns in (get_type(t).refs or {}).values()})
+        ns, ok = QInputDialog.getItem(self, "References", "Kind of reference:", namespaces, 0, False)
+        if not ok: return
+
+        def found(used):
+            if self.session is not session: return
+            if not used:
+                QMessageBox.information(self, "References", f"No record refers to any {ns}.")
+                return
+            self._rewrite_references(session, store, ns, used)
+
+        # the lookup may load types, so it runs on the worker like every other session call
+        self.run_task(f"Finding {ns} references", lambda ctx: session.references(ns), found)
+
+    def _rewrite_references(self, session, store, ns: str, used: dict[str, int]):
+        """Second half of edit_references: pick the identifier and its replacement."""
+        from app.patch_engine.bulk import rewrite_references
+        labels = [f"{ident}  ({n} records)" for ident, n in used.items()]
+        picked, ok = QInputDialog.getItem(self, "References", f"{ns} to change:", labels, 0, False)
+        if not ok: return
+        old = list(used)[labels.index(picked)]
+        new, ok = QInputDialog.getText(self, "References",
+                                       f"Replace {old!r} in {used[old]} records with (leave empty to remove):", text=old)
+        new = new.strip()
+        if not ok or new == old: return
+        self.flush_timer.stop()
+
+        def done(result):
+            t = self.types_pane.current_type()
+            if t: self.on_type_selected(t)
+            msg = f"{len(result['changed'])} records updated."
+            if result["skipped"]:
+                lines = [f"{s['type']}:{s['key']} — {s['error']}" for s in result["skipped"][:20]]
+                QMessageBox.warning(self, "References", msg + f" {len(result['skipped'])} skipped:\n" + "\n".join(lines))
+            else:
+                self.statusBar().showMessage(msg, 5000)
+
+        self.run_task(f"Updating {ns} references",
+                      lambda ctx: rewrite_references(session, store, ns, old, new or None, ctx.progress), done)
@@ -1,4 +1,5 @@
 ﻿from PySide6.QtWidgets import QListWidget
+from PySide6.QtCore import Qt
 
 class ObjectTypesPane(QListWidget):
     def __init__(self, on_select):
@@ -11,6 +12,13 @@ class ObjectTypesPane(QListWidget):
         for t in types:
             self.addItem(t)
 
+    def add_type(self, t: str):
+        """Add a type as it is discovered; the first one added becomes current."""
+        if not self.findItems(t, Qt.MatchExactly):
+            self.addItem(t)
+            if self.count() == 1:
+                self.setCurrentRow(0)
+
     def _changed(self, cur, prev):
         if cur:
             self.on_select(cur.text())
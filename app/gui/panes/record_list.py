@@ -1,21 +1,110 @@
-﻿from PySide6.QtWidgets import QListWidget
+﻿from PySide6.QtWidgets import QWidget, QVBoxLayout, QLineEdit, QListView
+from PySide6.QtCore import Qt, QAbstractListModel, QModelIndex, QTimer
 
-class RecordListPane(QListWidget):
-    def __init__(self, on_select):
+class RecordListModel(QAbstractListModel):
+    """Keys of one object type; only the visible rows are ever materialized by the view."""
+
+    def __init__(self, parent=None):
+        super().__init__(parent)
+        self._keys: list[str] = []
+
+    def rowCount(self, parent=QModelIndex()):
+        return 0 if parent.isValid() else len(self._keys)
+
+    def data(self, index, role=Qt.DisplayRole):
+        if role == Qt.DisplayRole and index.isValid():
+            return self._keys[index.row()]
+        return None
+
+    def set_keys(self, keys: list[str]):
+        self.beginResetModel()
+        self._keys = list(keys)
+        self.endResetModel()
+
+    def append_keys(self, keys: list[str]):
+        if not keys: return
+        n = len(self._keys)
+        self.beginInsertRows(QModelIndex(), n, n + len(keys) - 1)
+        self._keys.extend(keys)
+        self.endInsertRows()
+
+    def key(self, row: int) -> str:
+        return self._keys[row]
+
+    def row_of(self, key: str) -> int:
+        try:
+            return self._keys.index(key)
+        except ValueError:
+            return -1
+
+class RecordListPane(QWidget):
+    FILTER_DELAY_MS = 150   # typing pause before the filter runs; broad prefixes cost ~10-30 ms
+
+    def __init__(self, on_select, search=None, match=None):
         super().__init__()
         self.on_select = on_select
-        self.currentItemChanged.connect(self._changed)
+        self.search = search        # query -> matching keys (or None if the type has no index yet)
+        self.match = match          # (query, keys) -> those matching, same rules, for a read still streaming
         self._type = None
+        self._keys: list[str] = []
+
+        self.filter = QLineEdit(placeholderText="Filter by name, skill, perk…", clearButtonEnabled=True)
+        self._filter_timer = QTimer(self, singleShot=True, interval=self.FILTER_DELAY_MS)
+        self._filter_timer.timeout.connect(self.refilter)
+        self.filter.textChanged.connect(self._filter_timer.start)
+        self.model = RecordListModel(self)
+        self.view = QListView()
+        self.view.setUniformItemSizes(True)     # lets the view skip measuring every row
+        self.view.setModel(self.model)
+        self.view.selectionModel().currentChanged.connect(self._changed)
+
+        layout = QVBoxLayout(self); layout.setContentsMargins(0, 0, 0, 0)
+        layout.addWidget(self.filter)
+        layout.addWidget(self.view)
 
     def load_records(self, keys: list[str], type_name: str|None=None):
         if type_name: self._type = type_name
-        self.clear()
-        for k in keys:
-            self.addItem(k)
+        self._keys = list(keys)
+        self.refilter()
+
+    def append_records(self, keys: list[str]):
+        """Add keys as a read streams in; matching ones appear without resetting the view."""
+        self._keys.extend(keys)
+        query = self.filter.text().strip()
+        self.model.append_keys(self._matching(query, keys) if query else keys)
+
+    def _matching(self, query: str, keys: list[str]) -> list[str]:
+        """Keys matching `query` by the search index's rules, when there is no index yet."""
+        if self.match:
+            return self.match(query, keys)
+        q = query.lower()
+        return [k for k in keys if q in k.lower()]
+
+    def refilter(self, *_):
+        """Re-run the filter box query, keeping the current record selected if it still matches."""
+        self._filter_timer.stop()
+        query = self.filter.text().strip()
+        keys = self.search(query) if query and self.search else None
+        if keys is None:
+            keys = self._matching(query, self._keys) if query else self._keys
+        current = self.current_key()
+        self.view.selectionModel().blockSignals(True)
+        self.model.set_keys(keys)
+        if current is not None and (row := self.model.row_of(current)) >= 0:
+            self.view.setCurrentIndex(self.model.index(row))
+        self.view.selectionModel().blockSignals(False)
+
+    def current_key(self) -> str|None:
+        i = self.view.currentIndex()
+        return self.model.key(i.row()) if i.isValid() else None
+
+    def clear(self):
+        self._keys = []
+        self.model.set_keys([])
 
     def _changed(self, cur, prev):
-        if cur and self._type:
-            self.on_select(self._type, cur.text())
+        if cur.isValid() and self._type:
+            self.on_select(self._type, self.model.key(cur.row()))
 
     def set_type(self, t: str):
         self._type = t
@@ -0,0 +1,27 @@
+﻿from PySide6.QtWidgets import QTreeWidget, QTreeWidgetItem
+from PySide6.QtCore import Qt
+
+class TimingsPane(QTreeWidget):
+    """Breakdown of the last traced operations (app.diagnostics.trace spans), newest first."""
+
+    MAX_ROOTS = 30
+
+    def __init__(self):
+        super().__init__()
+        self.setHeaderLabels(["Operation", "ms", "Details"])
+        self.setColumnWidth(0, 260)
+        self.setColumnWidth(1, 80)
+
+    def add_span(self, span):
+        self.insertTopLevelItem(0, self._item(span))
+        while self.topLevelItemCount() > self.MAX_ROOTS:
+            self.takeTopLevelItem(self.topLevelItemCount() - 1)
+
+    def _item(self, span) -> QTreeWidgetItem:
+        details = ", ".join(f"{k}={v:,}" if isinstance(v, int) else f"{k}={v}"
+                            for k, v in {**span.attrs, **span.counters}.items())
+        item = QTreeWidgetItem([span.name, f"{span.duration_ms:,.1f}", details])
+        item.setTextAlignment(1, Qt.AlignRight | Qt.AlignVCenter)
+        for child in span.children:
+            item.addChild(self._item(child))
+        return item
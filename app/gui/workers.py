@@ -0,0 +1,115 @@
+﻿import threading
+from PySide6.QtCore import QObject, QRunnable, QThreadPool, Signal
+
+
+class Cancelled(Exception):
+    """Raised inside a task by TaskContext.progress() once cancel() was requested."""
+
+
+class _TaskSignals(QObject):
+    progress = Signal(str, int, int)    # message, done, total (total 0 = indeterminate)
+    partial = Signal(object)            # intermediate result, e.g. a batch of keys
+    finished = Signal(object)           # task result
+    failed = Signal(object)             # exception
+    cancelled = Signal()
+
+
+class TaskContext:
+    """Handed to every task function: report progress, and notice cancellation."""
+
+    def __init__(self, signals: _TaskSignals):
+        self._signals = signals
+        self._cancel = threading.Event()
+
+    @property
+    def cancelled(self) -> bool:
+        return self._cancel.is_set()
+
+    def progress(self, message: str, done: int = 0, total: int = 0):
+        if self._cancel.is_set():
+            raise Cancelled(message)
+        self._signals.progress.emit(message, done, total)
+
+    def partial(self, value):
+        """Hand an intermediate result to the task's on_partial callback (UI thread)."""
+        self._signals.partial.emit(value)
+
+
+class Task(QRunnable):
+    def __init__(self, name: str, fn, signals: _TaskSignals):
+        super().__init__()
+        self.setAutoDelete(False)
+        self.name = name
+        self.fn = fn
+        self.signals = signals
+        self.ctx = TaskContext(signals)
+
+    def cancel(self):
+        self.ctx._cancel.set()
+
+    def run(self):
+        if self.ctx.cancelled:      # cancelled while still queued
+            self.signals.cancelled.emit()
+            return
+        try:
+            result = self.fn(self.ctx)
+        except Cancelled:
+            self.signals.cancelled.emit()
+        except Exception as e:
+            self.signals.failed.emit(e)
+        else:
+            self.signals.finished.emit(result)
+
+
+class SessionWorker(QObject):
+    """Runs blocking session operations off the UI thread, one at a time.
+
+    A single worker thread means JarSession is only ever touched by one thread,
+    in submission order. Callbacks run back on the UI thread.
+    """
+
+    busy_changed = Signal(bool)
+    progress = Signal(str, int, int)
+
+    def __init__(self, parent=None):
+        super().__init__(parent)
+        self.pool = QThreadPool(self)
+        self.pool.setMaxThreadCount(1)
+        self._tasks = []    # queued + running, oldest first
+
+    @property
+    def busy(self) -> bool:
+        return bool(self._tasks)
+
+    def submit(self, name: str, fn, on_done=None, on_error=None, on_cancel=None, on_partial=None) -> Task:
+        """Queue fn(ctx). on_done(result) / on_error(exc) / on_cancel() / on_partial(value)
+        run on the UI thread."""
+        signals = _TaskSignals(self)
+        task = Task(name, fn, signals)
+        signals.progress.connect(self.progress)
+        if on_partial:
+            signals.partial.connect(on_partial)
+        signals.finished.connect(lambda result: self._settle(task, on_done, result))
+        signals.failed.connect(lambda exc: self._settle(task, on_error, exc))
+        signals.cancelled.connect(lambda: self._settle(task, on_cancel))
+        self._tasks.append(task)
+        if len(self._tasks) == 1:
+            self.busy_changed.emit(True)
+        self.pool.start(task)
+        return task
+
+    def cancel_all(self):
+        for task in self._tasks:
+            task.cancel()
+
+    def wait(self, msecs: int = -1) -> bool:
+        return self.pool.waitForDone(msecs)
+
+    def _settle(self, task: Task, callback, *args):
+        if task in self._tasks:
+            self._tasks.remove(task)
+        task.signals.deleteLater()
+        if callback:
+            callback(*args)
+        if not self._tasks:
+            self.busy_changed.emit(False)
@@ -0,0 +1,76 @@
+import datetime
+from app.schema.validate import check_record
+from app.diagnostics import trace
+
+
+def _swap(value, old: str, new: str|None):
+    """`value` with `old` replaced by `new` (dropped if None). Lists keep their order
+    and never end up naming the same identifier twice; a removed scalar becomes ""."""
+    if isinstance(value, (list, tuple)):
+        out = []
+        for v in value:
+            v = new if v == old else v
+            if v is not None and v not in out:
+                out.append(v)
+        return out
+    if value == old:
+        return "" if new is None else new
+    return value
+
+
+@trace.traced("patch.bulk")
+def rewrite_references(session, patch_store, namespace: str, old: str, new: str|None = None,
+                       progress=None) -> dict:
+    """Point every record that refers to `old` at `new` instead, or drop the reference
+    if `new` is None, using the session's where-used index.
+
+    All edits are written in one transaction (one serialize per type, one repack) and
+    recorded as one patch set. Records of read-only types, or that would fail schema
+    validation, are left alone and reported. Returns {"set", "changed": [(type, key)],
+    "skipped": [{type, key, error}]}.
+    """
+    set_id = f"{namespace}:{old}->{new or ''}:{datetime.datetime.utcnow().isoformat()}Z"
+    changed, skipped = [], []
+    for (t, k), fields in session.where_used(namespace, old).items():
+        try:
+            session._check_writable(t)     # also refuses types that were only partly read
+        except ValueError as exc:
+            skipped.append({"type": t, "key": k, "error": str(exc)})
+            continue
+        record = session.get_record(t, k)
+        for f in fields:
+            record[f] = _swap(record.get(f), old, new)
+        err = check_record(t, record)
+        if err:
+            skipped.append({"type": t, "key": k, "error": err["message"]})
+            continue
+        changed.append((t, k, record))
+
+    with session.transaction(progress):     # one serialize + one repack for the whole set
+        for n, (t, k, record) in enumerate(changed):
+            if progress: progress(f"Updating {namespace} references", n, len(changed))
+            session.update_record(t, k, record)
+    edits = []
+    for t, k, record in changed:
+        base, base_hash = session.patch_base(t, k)     # vanilla, so earlier edits stay in the patch
+        edits.append((t, k, record, base_hash, base))
+    patch_store.record_patches(edits, set_id=set_id)
+    trace.count("records", len(changed))
+    return {"set": set_id, "changed": [(t, k) for t, k, _ in changed], "skipped": skipped}
+
+
+def replace_reference(session, patch_store, namespace: str, old: str, new: str, progress=None) -> dict:
+    """Every use of `old` becomes `new` (which may already exist; lists are de-duplicated)."""
+    return rewrite_references(session, patch_store, namespace, old, new, progress)
+
+
+def rename_reference(session, patch_store, namespace: str, old: str, new: str, progress=None) -> dict:
+    """Like replace_reference, but refuses to merge `old` into an identifier already in use."""
+    if session.where_used(namespace, new):
+        raise ValueError(f"{namespace} {new!r} is already used; use replace to merge the two")
+    return rewrite_references(session, patch_store, namespace, old, new, progress)
+
+
+def remove_reference(session, patch_store, namespace: str, ident: str, progress=None) -> dict:
+    """Drop `ident` from every list that names it; single-value fields are blanked."""
+    return rewrite_references(session, patch_store, namespace, ident, None, progress)
@@ -0,0 +1,89 @@
+import os
+from itertools import combinations
+from .patch_store import PatchStore, is_whole_record, touched_fields
+from .patch_apply import patch_values
+from app.diagnostics import trace
+
+_MISSING = object()
+
+
+def _fields(patch: dict) -> set[str]:
+    ops = patch["ops"]
+    return set(ops[0]["value"]) if is_whole_record(ops) else touched_fields(ops)
+
+
+class LoadOrder:
+    """Several profiles' patch stores stacked by priority; later profiles win.
+
+    Built in one pass over each store's latest patches, indexed by (type, key). A
+    record patched by one profile keeps that patch as-is; a record patched by several
+    gets one folded patch holding the layers in priority order, which
+    patch_apply.merge_patch merges field by field. latest() has PatchStore's shape, so
+    apply_all applies the whole stack in one serialize and one repack.
+    """
+
+    def __init__(self, stores: list[tuple[str, PatchStore]]):
+        self.profiles = [name for name, _ in stores]
+        if len(set(self.profiles)) != len(self.profiles):
+            raise ValueError(f"a profile is listed twice: {self.profiles}")
+        self._layers: dict[tuple[str, str], list[dict]] = {}
+        with trace.span("patch.load_order", profiles=len(stores)):
+            for name, store in stores:
+                for p in store.latest():
+                    t = p["target"]
+                    self._layers.setdefault((t["type"], t["key"]), []).append(dict(p, profile=name))
+            self.overlaps = self._overlaps()
+        trace.count("records", len(self._layers))
+
+    @classmethod
+    def from_profiles(cls, names: list[str], root: str = "profiles") -> "LoadOrder":
+        return cls([(name, PatchStore(os.path.join(root, name))) for name in names])
+
+    def layers(self, type_name: str, key: str) -> list[dict]:
+        """The patches for one record, lowest priority first."""
+        return list(self._layers.get((type_name, key), ()))
+
+    def latest(self) -> list[dict]:
+        """One effective patch per record: the patch itself, or a folded one."""
+        out = []
+        for (t, k), layers in self._layers.items():
+            if len(layers) == 1:
+                out.append(layers[0])
+                continue
+            top = layers[-1]
+            out.append({
+                "id": f"{t}:{k}:" + "+".join(p["profile"] for p in layers),
+                "target": top["target"],
+                "layers": layers,
+                "created": top.get("created"),
+            })
+        return out
+
+    def _overlaps(self) -> list[dict]:
+        """Per pair of profiles and record, the fields both set to different values.
+        Fields set to the same value fold cleanly and are not listed. "winners" names,
+        per field, the profile whose value the folded stack ends up with: the highest
+        layer touching it, which need not be either of the pair."""
+        out = []
+        for (t, k), layers in self._layers.items():
+            if len(layers) < 2:
+                continue
+            values = [(p, _fields(p), patch_values(p)) for p in layers]
+            top = {}
+            for p, fields, _ in values:     # lowest first, so the highest layer stays
+                top.update(dict.fromkeys(fields, p["profile"]))
+            for (a, fa, va), (b, fb, vb) in combinations(values, 2):
+                fields = sorted(f for f in fa & fb if va.get(f, _MISSING) != vb.get(f, _MISSING))
+                if fields:
+                    out.append({"profiles": [a["profile"], b["profile"]], "type": t, "key": k,
+                                "fields": fields, "winners": {f: top[f] for f in fields}})
+        return out
+
+    def conflict_matrix(self) -> dict[str, dict[str, int]]:
+        """{profile: {other profile: records where they disagree}} for every pair."""
+        matrix = {a: {b: 0 for b in self.profiles if b != a} for a in self.profiles}
+        for o in self.overlaps:
+            a, b = o["profiles"]
+            matrix[a][b] += 1
+            matrix[b][a] += 1
+        return matrix
@@ -1,11 +1,137 @@
-﻿def apply_all(session, patch_store) -> list[dict]:
-    """Apply naive replace patches; return list of conflicts."""
+﻿import jsonpatch
+from .patch_store import is_whole_record, touched_fields
+from app.schema.validate import check_record
+from app.diagnostics import trace
+
+_MISSING = object()
+
+
+def patch_values(patch: dict) -> dict:
+    """The values a stored patch gives the fields it touches (a field it removes is
+    absent). Whole-record patches give the whole record."""
+    ops = patch["ops"]
+    if is_whole_record(ops):
+        return ops[0]["value"]
+    fields = touched_fields(ops)
+    return jsonpatch.apply_patch({f: v for f, v in patch.get("base", {}).items() if f in fields}, ops)
+
+
+def merge_patch(patch: dict, current: dict, current_hash: str|None) -> tuple[dict, list[dict]]:
+    """Three-way merge one stored patch onto the current upstream record.
+
+    If the patch's baseHash matches `current_hash` the ops apply as-is. Otherwise each
+    touched field is merged on its own: if upstream still has the base value ours wins,
+    if upstream already equals ours nothing changes, and anything else is a conflict
+    (upstream's value is kept). Untouched fields always follow upstream.
+    A folded patch (see load_order) is merged layer by layer.
+    Returns (merged record, per-field conflicts).
+    """
+    if "layers" in patch:
+        return merge_layers(patch["layers"], current, current_hash)
+    ops = patch["ops"]
+    if is_whole_record(ops):
+        ours = ops[0]["value"]
+        if patch["target"].get("baseHash") == current_hash:
+            return dict(ours), []
+        base = None     # legacy patch: no base values, so any difference is a conflict
+        fields = set(ours) | set(current)
+    else:
+        if patch["target"].get("baseHash") == current_hash:
+            return jsonpatch.apply_patch(current, ops), []
+        base = patch.get("base", {})
+        fields = touched_fields(ops)
+        ours = patch_values(patch)
+
+    merged = dict(current)
     conflicts = []
-    for p in patch_store.load_all():
+    for f in sorted(fields):
+        mine = ours.get(f, _MISSING)
+        theirs = current.get(f, _MISSING)
+        if mine == theirs:
+            continue
+        if base is not None and theirs == base.get(f, _MISSING):
+            if mine is _MISSING:
+                merged.pop(f, None)
+            else:
+                merged[f] = mine
+            continue
+        conflicts.append({
+            "field": f,
+            "base": None if base is None else base.get(f),
+            "ours": None if mine is _MISSING else mine,
+            "theirs": None if theirs is _MISSING else theirs,
+        })
+    return merged, conflicts
+
+
+def merge_layers(layers: list[dict], current: dict, current_hash: str|None) -> tuple[dict, list[dict]]:
+    """Merge several profiles' patches for one record, lowest priority first.
+
+    Each layer is merged against upstream on its own, then the layers are laid over
+    each other field by field: a field takes its value from the highest layer that
+    touches it, and only that layer's conflicts on it are reported. A whole-record
+    layer claims every field, hiding the layers beneath it.
+    """
+    merged = dict(current)
+    conflicts, claimed = [], set()
+    for p in reversed(layers):
+        record, clashes = merge_patch(p, current, current_hash)
+        if is_whole_record(p["ops"]):
+            fields = set(record) | set(current)
+        else:
+            fields = touched_fields(p["ops"])
+        for f in fields - claimed:
+            if f in record:
+                merged[f] = record[f]
+            else:
+                merged.pop(f, None)
+        conflicts.extend({"patch": p["id"], "profile": p.get("profile"), **c}
+                         for c in clashes if c["field"] not in claimed)
+        claimed |= fields
+    return merged, conflicts
+
+
+@trace.traced("patch.apply_all")
+def apply_all(session, patch_store, progress=None) -> list[dict]:
+    """Merge the latest patch per record onto the session in one batched write.
+    `patch_store` may also be a LoadOrder, whose folded patches stack several profiles.
+
+    The merged set is schema-checked up front; invalid records are reported and
+    skipped. Returns conflicts: one entry per conflicting field, or per patch that
+    failed outright.
+    """
+    conflicts, merged = [], []
+    latest = patch_store.latest()
+    trace.count("patches", len(latest))
+    for n, p in enumerate(latest):
+        if progress: progress("Merging patches", n, len(latest))
         t, k = p["target"]["type"], p["target"]["key"]
         try:
-            new_data = p["ops"][0]["value"]
-            session.update_record(t, k, new_data)
+            if session.has_record(t, k):
+                current, current_hash = session.original_record(t, k), session.base_hash(t, k)
+            else:
+                current, current_hash = {}, None
+            record, clashes = merge_patch(p, current, current_hash)
+            merged.append((p, record))
+            conflicts.extend({"patch": p["id"], "type": t, "key": k, **c} for c in clashes)
         except Exception as e:
-            conflicts.append({"patch": p["id"], "error": str(e)})
+            conflicts.append({"patch": p["id"], "type": t, "key": k, "error": str(e)})
+
+    invalid = {}
+    with trace.span("patch.validate", records=len(merged)):
+        for p, record in merged:
+            err = check_record(p["target"]["type"], record)
+            if err:
+                invalid[p["id"]] = err["message"]
+    with session.transaction(progress):     # one serialize + one repack for the whole set
+        for p, record in merged:
+            t, k = p["target"]["type"], p["target"]["key"]
+            if p["id"] in invalid:
+                conflicts.append({"patch": p["id"], "type": t, "key": k, "error": invalid[p["id"]]})
+                continue
+            try:
+                session.update_record(t, k, record)
+            except Exception as e:
+                conflicts.append({"patch": p["id"], "type": t, "key": k, "error": str(e)})
+    trace.count("conflicts", len(conflicts))
     return conflicts
@@ -1,24 +1,162 @@
-﻿import os, json, datetime
+﻿import os, json, datetime, threading
 from app.safety.hashes import sha256_json
+from app.diagnostics import trace
+
+
+def is_whole_record(ops: list[dict]) -> bool:
+    """Legacy patches replace the whole record at path "/"."""
+    return len(ops) == 1 and ops[0].get("op") == "replace" and ops[0].get("path") in ("", "/")
+
+
+def touched_fields(ops: list[dict]) -> set[str]:
+    """Top-level record fields a JSON Patch reads or writes."""
+    fields = set()
+    for op in ops:
+        for ptr in (op.get("path"), op.get("from")):
+            if ptr:
+                head = ptr.split("/")[1]
+                fields.add(head.replace("~1", "/").replace("~0", "~"))
+    return fields
 
 class PatchStore:
+    """Append-only patches.jsonl plus an in-memory index of the latest patch per record.
+
+    The index is built incrementally: each refresh parses only the bytes appended since
+    the last one. `compact()` rewrites the log down to one line per (type, key).
+    """
+
+    COMPACT_MIN_LINES = 200     # don't bother compacting tiny logs
+
     def __init__(self, profile_dir="profiles/default"):
         self.dir = profile_dir
         os.makedirs(self.dir, exist_ok=True)
         self.file = os.path.join(self.dir, "patches.jsonl")
+        self._index = {}        # {(type,key): latest patch}, in order of last write
+        self._offset = 0        # bytes of self.file already indexed
+        self._lines = 0         # patch lines seen in self.file
+        self._stamp = None      # (st_dev, st_ino) of the indexed file, to spot replacement
+        self._lock = threading.RLock()
+
+    @trace.traced("patch.record")
+    def record_patch(self, type_name: str, key: str, new_data: dict, base_hash: str, base: dict|None = None):
+        """Append a patch for one record.
+
+        With `base` (the upstream record the edit started from) the patch holds a minimal
+        JSON Patch plus the base values of every field it touches, which is what the
+        three-way merge in patch_apply needs. Without it, the whole record is stored.
+        An edit back to `base` records an empty patch, superseding earlier edits.
+        """
+        self.record_patches([(type_name, key, new_data, base_hash, base)])
+
+    @trace.traced("patch.record_set")
+    def record_patches(self, edits: list[tuple], set_id: str|None = None):
+        """Append patches for several records in one write; `edits` holds
+        record_patch() argument tuples. With `set_id`, each patch carries it as "set" so
+        the edits of one bulk operation can be told apart later."""
+        import jsonpatch    # only needed once something is edited; keeps startup light
+        lines = []
+        for type_name, key, new_data, base_hash, base in edits:
+            target = {"type": type_name, "key": key, "baseHash": base_hash}
+            if base is None:
+                ops = [{"op":"replace","path":"/","value":new_data}]
+                patch_base = None
+            else:
+                ops = jsonpatch.make_patch(base, new_data).patch
+                patch_base = {f: base[f] for f in touched_fields(ops) if f in base}
+            patch = {
+                "id": f"{type_name}:{key}:{datetime.datetime.utcnow().isoformat()}Z",
+                "target": target,
+                "ops": ops,
+                "hash": sha256_json(new_data),
+                "created": datetime.datetime.utcnow().isoformat()+"Z"
+            }
+            if patch_base is not None:
+                patch["base"] = patch_base
+            if set_id is not None:
+                patch["set"] = set_id
+            lines.append(json.dumps(patch, ensure_ascii=False) + "\n")
+        with self._lock:
+            self._refresh()
+            with open(self.file, "a", encoding="utf-8") as f:
+                f.write("".join(lines))
+            self._refresh()
+
+    def latest(self) -> list[dict]:
+        """The effective patch for every touched record, ordered by last edit."""
+        with self._lock:
+            self._refresh()
+            return list(self._index.values())
+
+    def needs_compaction(self) -> bool:
+        with self._lock:
+            self._refresh()
+            return self._lines >= self.COMPACT_MIN_LINES and self._lines > 2 * len(self._index)
+
+    @trace.traced("patch.compact")
+    def compact(self):
+        """Rewrite the log keeping only the latest patch per record.
+
+        The new log is written without holding the lock; patches appended meanwhile
+        are carried over verbatim before the swap.
+        """
+        with self._lock:
+            self._refresh()
+            snapshot = list(self._index.values())
+            offset = self._offset
+        tmp = self.file + ".compact"
+        with open(tmp, "w", encoding="utf-8", newline="\n") as f:
+            for patch in snapshot:
+                f.write(json.dumps(patch, ensure_ascii=False) + "\n")
+        with self._lock:
+            self._refresh()
+            if self._offset > offset:
+                with open(self.file, "rb") as src, open(tmp, "ab") as dst:
+                    src.seek(offset)
+                    dst.write(src.read(self._offset - offset))
+            os.replace(tmp, self.file)
+            self._reset()
+            self._refresh()
+
+    def compact_async(self) -> threading.Thread:
+        t = threading.Thread(target=self._compact_quietly, name="patch-compaction", daemon=True)
+        t.start()
+        return t
+
+    def _compact_quietly(self):
+        try:
+            self.compact()
+        except Exception as exc:
+            print(f"[DoT-Modder] Patch log compaction failed: {exc}")
+
+    def _reset(self):
+        self._index = {}
+        self._offset = 0
+        self._lines = 0
+        self._stamp = None
 
-    def record_patch(self, type_name: str, key: str, new_data: dict, base_hash: str):
-        patch = {
-            "id": f"{type_name}:{key}:{datetime.datetime.utcnow().isoformat()}Z",
-            "target": {"type": type_name, "key": key, "baseHash": base_hash},
-            "ops": [{"op":"replace","path":"/","value":new_data}],
-            "hash": sha256_json(new_data),
-            "created": datetime.datetime.utcnow().isoformat()+"Z"
-        }
-        with open(self.file, "a", encoding="utf-8") as f:
-            f.write(json.dumps(patch, ensure_ascii=False) + "\n")
-
-    def load_all(self) -> list[dict]:
-        if not os.path.exists(self.file): return []
-        with open(self.file, "r", encoding="utf-8") as f:
-            return [json.loads(line) for line in f if line.strip()]
+    def _refresh(self):
+        """Index lines appended since the last call (or everything, if the file was replaced)."""
+        try:
+            st = os.stat(self.file)
+        except FileNotFoundError:
+            self._reset()
+            return
+        if self._stamp != (st.st_dev, st.st_ino) or st.st_size < self._offset:
+            self._reset()
+            self._stamp = (st.st_dev, st.st_ino)
+        if st.st_size == self._offset:
+            return
+        with open(self.file, "rb") as f:
+            f.seek(self._offset)
+            chunk = f.read(st.st_size - self._offset)
+        end = chunk.rfind(b"\n") + 1     # leave a half-written last line for next time
+        for line in chunk[:end].splitlines():
+            if not line.strip():
+                continue
+            patch = json.loads(line)
+            target = patch["target"]
+            k = (target["type"], target["key"])
+            self._index.pop(k, None)
+            self._index[k] = patch
+            self._lines += 1
+        self._offset += end
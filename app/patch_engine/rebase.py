@@ -0,0 +1,43 @@
+from .patch_apply import merge_patch
+from app.diagnostics import trace
+
+
+@trace.traced("patch.rebase")
+def rebase_patches(session, patch_store, progress=None) -> dict:
+    """After a game update (session.game_update), move the stored patches onto the new
+    records.
+
+    Only patches on records the update actually changed are looked at; the others
+    still merge exactly as before. Each is three-way merged onto the new record: a
+    clean merge is recorded as a fresh patch against it (one patch set, "rebase:<new
+    baseline>"), anything else is left as it was and listed for review.
+    Returns {"changed": session.changed_records(), "rebased": [(type, key)],
+    "review": [conflicts, as apply_all reports them]}.
+    """
+    update = session.game_update
+    if not update:
+        return {"changed": {}, "rebased": [], "review": []}
+    changed = session.changed_records(progress)
+    touched = {(t, k) for t, diff in changed.items() for keys in diff.values() for k in keys}
+    edits, review = [], []
+    for p in patch_store.latest():
+        t, k = p["target"]["type"], p["target"]["key"]
+        if (t, k) not in touched:
+            continue
+        if not session.has_record(t, k):
+            review.append({"patch": p["id"], "type": t, "key": k, "error": "removed by the game update"})
+            continue
+        current, current_hash = session.original_record(t, k), session.base_hash(t, k)
+        try:
+            merged, clashes = merge_patch(p, current, current_hash)
+        except Exception as e:
+            review.append({"patch": p["id"], "type": t, "key": k, "error": str(e)})
+            continue
+        if clashes:
+            review.extend({"patch": p["id"], "type": t, "key": k, **c} for c in clashes)
+            continue
+        edits.append((t, k, merged, current_hash, current))
+    if edits:
+        patch_store.record_patches(edits, set_id=f"rebase:{update['baseline']}")
+    trace.count("rebased", len(edits))
+    return {"changed": changed, "rebased": [(t, k) for t, k, *_ in edits], "review": review}
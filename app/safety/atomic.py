@@ -1,6 +1,155 @@
-﻿import os, shutil
+﻿import os, glob, hashlib, time
+from app.diagnostics import trace
+from .hashes import record_hash
 
-def atomic_replace(src: str, dst: str):
-    tmp = dst + ".tmpswap"
-    shutil.copy2(src, tmp)
-    os.replace(tmp, dst)
+# How hard commit() pushes the new file to disk before and after the rename:
+#   "none"  rename only; the OS writes it back whenever (fastest, a power cut may lose it)
+#   "file"  fsync the temp file before the rename, so the name never points at partial data
+#   "full"  also fsync the directory after the rename, so the rename itself survives a power cut
+DURABILITY = ("none", "file", "full")
+DEFAULT_DURABILITY = "file"
+_TMP_SUFFIX = ".tmp"
+STALE_AFTER_S = 3600    # a temp file untouched this long is left over whatever its pid says
+
+
+class AtomicFile:
+    """Write-once replacement of `dst`: a same-directory temp file that is hashed as it is
+    written and renamed over `dst` by commit(). Nothing touches `dst` before that.
+
+    Write-only and forward-only (seeking is only allowed to the current position), which
+    is all zipfile needs in "w" mode when entries are written raw. Use as a context
+    manager: leaving the block without commit() removes the temp file.
+    """
+
+    def __init__(self, dst: str, durability: str = DEFAULT_DURABILITY):
+        if durability not in DURABILITY:
+            raise ValueError(f"durability must be one of {DURABILITY}, not {durability!r}")
+        self.dst = dst
+        self.durability = durability
+        self.tmp = f"{dst}.{os.getpid()}{_TMP_SUFFIX}"
+        self._f = open(self.tmp, "wb")
+        self._sha = hashlib.sha256()
+        self._pos = 0
+
+    def write(self, b) -> int:
+        n = self._f.write(b)
+        self._sha.update(b)
+        self._pos += n
+        return n
+
+    def tell(self) -> int:
+        return self._pos
+
+    def seek(self, offset: int, whence: int = 0) -> int:
+        if (offset, whence) not in ((self._pos, 0), (0, 1)):
+            raise OSError("AtomicFile is forward-only")
+        return self._pos
+
+    def flush(self):
+        self._f.flush()
+
+    def reset(self):
+        """Throw away everything written so far (e.g. before retrying another way)."""
+        self._f.seek(0)
+        self._f.truncate()
+        self._sha = hashlib.sha256()
+        self._pos = 0
+
+    @trace.traced("safety.commit")
+    def commit(self, check=None, entries: dict | None = None) -> str:
+        """Run `check(temp_path)` (it raises to refuse the file), then sync and rename it
+        over `dst`. Returns the new file's "sha256:..." hash, which is also recorded
+        next to it (see hashes.known_hash) so nobody has to re-read it to know it,
+        together with `entries`, the JAR fingerprint, if given."""
+        try:
+            self._f.flush()
+            if check:
+                check(self.tmp)
+            if self.durability != "none":
+                with trace.span("safety.fsync"):
+                    os.fsync(self._f.fileno())
+            self._f.close()
+            os.replace(self.tmp, self.dst)
+        except BaseException:
+            self.abort()
+            raise
+        if self.durability == "full" and os.name != "nt":   # Windows can't open a directory to sync it
+            fd = os.open(os.path.dirname(os.path.abspath(self.dst)), os.O_RDONLY)
+            try:
+                os.fsync(fd)
+            finally:
+                os.close(fd)
+        digest = "sha256:" + self._sha.hexdigest()
+        trace.count("bytes", self._pos)
+        record_hash(self.dst, digest, entries)
+        return digest
+
+    def abort(self):
+        self._f.close()
+        try:
+            os.unlink(self.tmp)
+        except FileNotFoundError:
+            pass
+
+    def __enter__(self):
+        return self
+
+    def __exit__(self, *exc):
+        if not self._f.closed:
+            self.abort()
+
+
+def _pid_alive(pid: int) -> bool:
+    if pid == os.getpid():
+        return True
+    if os.name == "nt":     # os.kill would terminate the process there
+        import ctypes
+        kernel32 = ctypes.windll.kernel32
+        handle = kernel32.OpenProcess(0x1000, False, pid)   # PROCESS_QUERY_LIMITED_INFORMATION
+        if not handle:
+            return False
+        code = ctypes.c_ulong()
+        try:
+            ok = kernel32.GetExitCodeProcess(handle, ctypes.byref(code))
+        finally:
+            kernel32.CloseHandle(handle)
+        return not ok or code.value == 259      # STILL_ACTIVE
+    try:
+        os.kill(pid, 0)
+    except ProcessLookupError:
+        return False
+    except PermissionError:
+        return True
+    return True
+
+
+def _abandoned(path: str, dst: str) -> bool:
+    """Whether no running save can still be writing `path`: its writer's pid is gone, or
+    it has not been touched for STALE_AFTER_S (older names carry no pid)."""
+    try:
+        age = time.time() - os.stat(path).st_mtime
+    except OSError:
+        return False
+    if age > STALE_AFTER_S:
+        return True
+    pid = path[len(dst) + 1:-len(_TMP_SUFFIX)]
+    return path.endswith(_TMP_SUFFIX) and pid.isdigit() and not _pid_alive(int(pid))
+
+
+def recover_temp_files(dst: str) -> list[str]:
+    """Delete temp files an interrupted save of `dst` left behind. `dst` itself is never
+    touched by a save until its final rename, so they are always incomplete leftovers;
+    ones another running instance may still be writing are left alone.
+    Returns the removed paths."""
+    found = glob.glob(glob.escape(dst) + ".*" + _TMP_SUFFIX) + [dst + ".tmp.zip", dst + ".tmpswap"]
+    removed = []
+    for path in found:
+        if not os.path.isfile(path) or not _abandoned(path, dst):
+            continue
+        try:
+            os.unlink(path)
+            removed.append(path)
+            print(f"[DoT-Modder] Removed leftover from an interrupted save: {path}")
+        except OSError as exc:
+            print(f"[DoT-Modder] Could not remove {path}: {exc}")
+    return removed
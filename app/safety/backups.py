@@ -1,19 +1,310 @@
-﻿import os, shutil, datetime
+﻿import os, json, zipfile, zlib, datetime, time
+from contextlib import nullcontext
+from app.data.jar_index import data_offset
+from app.data.jar_repack import write_raw_entry
+from app.diagnostics import trace
+from .hashes import sha256_bytes, known_hash, record_entries
+
+_PROGRESS_EVERY = 256   # entries between progress callbacks
+_STORED, _DEFLATED = zipfile.ZIP_STORED, zipfile.ZIP_DEFLATED
+
+
+def _part(path: str) -> str:
+    """Per-process temp name, so parallel runs sharing a profile never write the same file."""
+    return f"{path}.{os.getpid()}.part"
+
 
 class BackupManager:
-    def __init__(self, root="profiles"):
+    """Content-addressed backups of DOT.jar under <root>/<profile>/backups.
+
+    Every JAR entry is stored once, by the SHA-256 of its content, as a blob in
+    objects/ holding the entry's compressed bytes exactly as they were in the JAR
+    (one method byte, then the raw stored/deflated data). A snapshot is a manifest in
+    snapshots/: a header line, then one JSON line per entry naming its blob. So a
+    snapshot of a JAR that changed in three entries costs three blobs and a manifest,
+    and restoring one entry reads one blob.
+
+    Entries unchanged since the jar's previous snapshot (same name, CRC and size) reuse
+    that snapshot's hash without being read. The first snapshot of a jar is its
+    "baseline", the vanilla state the restore commands go back to.
+    """
+
+    BASELINE = "baseline"
+    GC_GRACE_S = 3600   # gc() keeps blobs this young: a snapshot being taken has no manifest yet
+
+    def __init__(self, root="profiles", profile="default"):
         self.root = root
+        self.profile = profile
+        self.dir = os.path.join(root, profile, "backups")
+        self.objects_dir = os.path.join(self.dir, "objects")
+        self.snapshots_dir = os.path.join(self.dir, "snapshots")
+        self._entries = {}      # {snapshot id: {name: entry}}, manifests read so far
+
+    # --- snapshots ---
+    @trace.traced("safety.ensure_backup")
+    def ensure_backup(self, jar_path: str, progress=None) -> str:
+        """Id of the jar's baseline snapshot, taking it first if there is none. A full-copy
+        `<jar>.backup` left by older versions becomes the baseline."""
+        snap = self.baseline(jar_path)
+        if snap is None:
+            legacy = jar_path + ".backup"
+            source = legacy if os.path.exists(legacy) else jar_path
+            snap = self.snapshot(jar_path, self.BASELINE, source=source, progress=progress)
+            if source == legacy:
+                print(f"[DoT-Modder] Imported {legacy} into {self.dir}; the old copy can be deleted.")
+            else:   # the live JAR is the baseline: remember it, so any later change shows
+                record_entries(jar_path, self.fingerprint(snap))
+        return snap
+
+    def baseline(self, jar_path: str) -> str | None:
+        found = [h for h in self.snapshots(jar_path) if h["label"] == self.BASELINE]
+        return found[-1]["id"] if found else None
+
+    def snapshots(self, jar_path: str | None = None) -> list[dict]:
+        """Snapshot headers (id, label, jar, created, entries), oldest first."""
+        if not os.path.isdir(self.snapshots_dir):
+            return []
+        jar = os.path.abspath(jar_path) if jar_path else None
+        out = []
+        for name in os.listdir(self.snapshots_dir):
+            if not name.endswith(".jsonl"):
+                continue
+            try:
+                with open(os.path.join(self.snapshots_dir, name), "r", encoding="utf-8") as f:
+                    header = json.loads(f.readline())
+            except (OSError, ValueError) as exc:
+                print(f"[DoT-Modder] Skipping unreadable snapshot {name}: {exc}")
+                continue
+            if jar is None or header.get("jar") == jar:
+                out.append(header)
+        return sorted(out, key=lambda h: h["created"])
+
+    @trace.traced("safety.snapshot")
+    def snapshot(self, jar_path: str, label: str = "snapshot", source: str | None = None,
+                 progress=None, carry: dict[str, dict] | None = None) -> str:
+        """Record the jar's current entries (or those of `source`, a copy of it) and
+        return the new snapshot's id. Only entries not already stored are read.
+        `carry` maps entry names to manifest lines (of another snapshot) recorded in
+        their place, whatever the jar holds for them now."""
+        source = source or jar_path
+        carry = carry or {}
+        known = {}
+        previous = self.snapshots(jar_path)
+        if previous:
+            known = {(e["name"], e["crc"], e["size"]): e["hash"] for e in self.entries(previous[-1]["id"]).values()}
+        created = datetime.datetime.now()
+        snap = f"{created.strftime('%Y%m%d-%H%M%S-%f')}-{label}"
+        os.makedirs(self.snapshots_dir, exist_ok=True)
+        path = os.path.join(self.snapshots_dir, snap + ".jsonl")
+        part = _part(path)
+        with zipfile.ZipFile(source, "r") as z, open(source, "rb") as raw, \
+                open(part, "w", encoding="utf-8") as out:
+            infos = z.infolist()
+            header = {"id": snap, "label": label, "jar": os.path.abspath(jar_path),
+                      "created": created.isoformat(), "sha256": known_hash(source),
+                      "comment": z.comment.hex(), "entries": len(infos)}
+            if os.path.abspath(source) != os.path.abspath(jar_path):
+                header["imported"] = os.path.abspath(source)
+            out.write(json.dumps(header) + "\n")
+            for n, info in enumerate(infos):
+                if progress and n % _PROGRESS_EVERY == 0:
+                    progress("Backing up DOT.jar", n, len(infos))
+                if info.filename in carry:
+                    out.write(json.dumps(carry[info.filename]) + "\n")
+                    continue
+                h = known.get((info.filename, info.CRC, info.file_size))
+                if h is None or not os.path.exists(self._blob_path(h)):
+                    h = self._store(z, raw, info)
+                entry = {"name": info.filename, "hash": h, "crc": info.CRC, "size": info.file_size,
+                         "date_time": list(info.date_time), "system": info.create_system,
+                         "attr": info.external_attr}
+                if info.extra:
+                    entry["extra"] = info.extra.hex()
+                out.write(json.dumps(entry) + "\n")
+        os.replace(part, path)
+        return snap
+
+    def fingerprint(self, snapshot_id: str) -> dict[str, list[int]]:
+        """The snapshot's jar_index.fingerprint(), from its manifest."""
+        return {name: [e["crc"], e["size"]] for name, e in self.entries(snapshot_id).items()
+                if not name.endswith("/")}
+
+    def upstream_changes(self, jar_path: str, current: dict, written: dict | None,
+                         wrote: bool = False) -> list[str]:
+        """Entries the game changed since the jar's baseline, from fingerprints only
+        (see jar_index.fingerprint): `current` is the jar's now, `written` the one we
+        recorded at our last write (or when the baseline was taken), if any.
+
+        An entry counts if it differs from the baseline and is not what we wrote.
+        Without a fingerprint, every difference counts, unless we did write the jar
+        and kept no fingerprint: a baseline imported from a legacy `.backup`, or
+        `wrote` (an older version's hash record). Then .dat files differing from the
+        baseline are taken for our edits, and the jar counts as updated only if some
+        other entry differs, which no edit of ours can cause.
+        """
+        snap = self.baseline(jar_path)
+        if snap is None:
+            return []
+        base = self.fingerprint(snap)
+        differ = sorted(n for n in base.keys() | current.keys() if base.get(n) != current.get(n))
+        if written is not None:
+            return [n for n in differ if current.get(n) != written.get(n)]
+        imported = any(h.get("imported") for h in self.snapshots(jar_path) if h["id"] == snap)
+        if (imported or wrote) and all(n.lower().endswith(".dat") for n in differ):
+            return []
+        return differ
+
+    @trace.traced("safety.refresh_baseline")
+    def refresh_baseline(self, jar_path: str, changed: list[str], progress=None) -> str:
+        """New baseline after a game update: the `changed` entries are read from the jar,
+        every other entry is carried over from the old baseline (so edits of ours still
+        in the jar stay out of it). baseline() returns the newest; the one it replaces is
+        kept for comparing with (JarSession.changed_records), older ones are deleted and
+        blobs nothing refers to any more are collected."""
+        old = self.baseline(jar_path)
+        changed = set(changed)
+        carry = {n: e for n, e in self.entries(old).items() if n not in changed} if old else None
+        snap = self.snapshot(jar_path, self.BASELINE, progress=progress, carry=carry)
+        for h in [h for h in self.snapshots(jar_path) if h["label"] == self.BASELINE][:-2]:
+            self.delete_snapshot(h["id"])
+        removed = self.gc()
+        if removed:
+            print(f"[DoT-Modder] Removed {removed} backup blobs no snapshot uses any more.")
+        return snap
+
+    def entries(self, snapshot_id: str) -> dict[str, dict]:
+        """{entry name: manifest line} of a snapshot, in JAR order."""
+        entries = self._entries.get(snapshot_id)
+        if entries is None:
+            with open(os.path.join(self.snapshots_dir, snapshot_id + ".jsonl"), "r", encoding="utf-8") as f:
+                f.readline()
+                entries = {}
+                for line in f:
+                    e = json.loads(line)
+                    entries[e["name"]] = e
+            self._entries[snapshot_id] = entries
+        return entries
+
+    def entry_hash(self, snapshot_id: str, name: str) -> str | None:
+        e = self.entries(snapshot_id).get(name)
+        return e["hash"] if e else None
+
+    def delete_snapshot(self, snapshot_id: str):
+        """Drop a manifest. Its blobs stay until gc()."""
+        self._entries.pop(snapshot_id, None)
+        os.unlink(os.path.join(self.snapshots_dir, snapshot_id + ".jsonl"))
+
+    def gc(self) -> int:
+        """Delete blobs no snapshot refers to; returns how many were removed. Blobs younger
+        than GC_GRACE_S stay: another process may be taking a snapshot that uses them."""
+        live = {e["hash"] for h in self.snapshots() for e in self.entries(h["id"]).values()}
+        cutoff = time.time() - self.GC_GRACE_S
+        removed = 0
+        for dirpath, _, files in os.walk(self.objects_dir):
+            for name in files:
+                h = "sha256:" + os.path.basename(dirpath) + name
+                path = os.path.join(dirpath, name)
+                try:
+                    if h not in live and os.stat(path).st_mtime < cutoff:
+                        os.unlink(path)
+                        removed += 1
+                except OSError:     # removed meanwhile by another process's gc()
+                    continue
+        return removed
+
+    # --- restores ---
+    def read_entry(self, snapshot_id: str, name: str) -> bytes | None:
+        """Content of one entry as it was in the snapshot, or None if it had no such entry."""
+        h = self.entry_hash(snapshot_id, name)
+        if h is None:
+            return None
+        method, payload = self._read_blob(h)
+        return zlib.decompress(payload, -15) if method == _DEFLATED else payload
+
+    def extract_entry(self, snapshot_id: str, name: str, dest: str) -> bool:
+        """Write one entry of the snapshot to `dest` (via a .part file); False if it has none."""
+        data = self.read_entry(snapshot_id, name)
+        if data is None:
+            return False
+        os.makedirs(os.path.dirname(dest) or ".", exist_ok=True)
+        part = _part(dest)
+        with open(part, "wb") as f:
+            f.write(data)
+        os.replace(part, dest)
+        return True
+
+    @trace.traced("safety.restore_jar")
+    def restore_jar(self, snapshot_id: str, dst, current: str | None = None,
+                    progress=None) -> list[zipfile.ZipInfo]:
+        """Rebuild the snapshot's JAR into `dst` (path or writable binary file).
+
+        Entries that `current` (normally the live JAR) still has unchanged are copied as
+        raw bytes from it; only the others are read from blobs. Nothing is recompressed.
+        Returns the new central directory.
+        """
+        with open(os.path.join(self.snapshots_dir, snapshot_id + ".jsonl"), "r", encoding="utf-8") as f:
+            comment = bytes.fromhex(json.loads(f.readline()).get("comment", ""))
+        entries = list(self.entries(snapshot_id).values())
+        have = {}
+        if current and os.path.exists(current):
+            with zipfile.ZipFile(current, "r") as z:
+                have = z.NameToInfo
+        with open(current, "rb") if have else nullcontext() as raw, zipfile.ZipFile(dst, "w") as out:
+            out.comment = comment
+            for n, e in enumerate(entries):
+                if progress and n % _PROGRESS_EVERY == 0:
+                    progress(n, len(entries))
+                zinfo = zipfile.ZipInfo(e["name"], tuple(e["date_time"]))
+                zinfo.create_system = e["system"]
+                zinfo.external_attr = e["attr"]
+                zinfo.extra = bytes.fromhex(e.get("extra", ""))
+                zinfo.CRC, zinfo.file_size = e["crc"], e["size"]
+                old = have.get(e["name"])
+                if old is not None and old.CRC == e["crc"] and old.file_size == e["size"] \
+                        and old.compress_type in (_STORED, _DEFLATED):
+                    raw.seek(data_offset(raw, old))
+                    method, payload = old.compress_type, raw.read(old.compress_size)
+                    trace.count("bytes_reused", len(payload))
+                else:
+                    method, payload = self._read_blob(e["hash"])
+                    trace.count("bytes_from_blobs", len(payload))
+                zinfo.compress_type = method
+                write_raw_entry(out, zinfo, payload)
+            infos = out.infolist()
+        return infos
 
-    def jar_backup_path(self, jar_path: str) -> str:
-        return jar_path + ".backup"
+    # --- blobs ---
+    def _blob_path(self, h: str) -> str:
+        hexdigest = h.split(":", 1)[1]
+        return os.path.join(self.objects_dir, hexdigest[:2], hexdigest[2:])
 
-    def ensure_backup(self, jar_path: str):
-        bak = self.jar_backup_path(jar_path)
-        if not os.path.exists(bak):
-            shutil.copy2(jar_path, bak)
-        return bak
+    def _read_blob(self, h: str) -> tuple[int, bytes]:
+        with open(self._blob_path(h), "rb") as f:
+            blob = f.read()
+        return blob[0], blob[1:]
 
-    def dat_rollback_dir(self, profile_name="default"):
-        d = os.path.join(self.root, profile_name, "backups", datetime.datetime.now().strftime("%Y%m%d-%H%M%S"))
-        os.makedirs(d, exist_ok=True)
-        return d
+    def _store(self, z: zipfile.ZipFile, raw, info: zipfile.ZipInfo) -> str:
+        """Hash one entry and store its blob unless an identical one exists."""
+        if info.compress_type in (_STORED, _DEFLATED):
+            raw.seek(data_offset(raw, info))
+            method, payload = info.compress_type, raw.read(info.compress_size)
+            data = zlib.decompress(payload, -15) if method == _DEFLATED else payload
+            if zlib.crc32(data) != info.CRC:
+                raise zipfile.BadZipFile(f"CRC mismatch for {info.filename}")
+        else:
+            data = z.read(info)
+            comp = zlib.compressobj(zlib.Z_DEFAULT_COMPRESSION, zlib.DEFLATED, -15)
+            method, payload = _DEFLATED, comp.compress(data) + comp.flush()
+        h = sha256_bytes(data)
+        path = self._blob_path(h)
+        if not os.path.exists(path):
+            os.makedirs(os.path.dirname(path), exist_ok=True)
+            part = _part(path)
+            with open(part, "wb") as f:
+                f.write(bytes([method]) + payload)
+            os.replace(part, path)
+            trace.count("blobs_written")
+            trace.count("bytes_stored", len(payload))
+        else:
+            os.utime(path)      # in use again: young enough that a gc() meanwhile keeps it
+        return h
@@ -1,7 +1,61 @@
-﻿import hashlib, json
+﻿import hashlib, json, os
+from app.diagnostics import trace
 
 def sha256_bytes(b: bytes) -> str:
     return "sha256:" + hashlib.sha256(b).hexdigest()
 
 def sha256_json(d: dict) -> str:
     return sha256_bytes(json.dumps(d, sort_keys=True).encode("utf-8"))
+
+def sha256_file(path: str, chunk: int = 1 << 20) -> str:
+    h = hashlib.sha256()
+    with trace.span("safety.sha256_file") as sp, open(path, "rb") as f:
+        while buf := f.read(chunk):
+            h.update(buf)
+            sp.count("bytes", len(buf))
+    return "sha256:" + h.hexdigest()
+
+def _sidecar(path: str) -> str:
+    return path + ".sha256"
+
+def record_hash(path: str, digest: str, entries: dict | None = None):
+    """Remember `path`'s verified hash next to it, tied to its current size and mtime.
+    For a JAR, `entries` is its fingerprint as written (see jar_index.fingerprint)."""
+    st = os.stat(path)
+    rec = {"hash": digest, "size": st.st_size, "mtime_ns": st.st_mtime_ns}
+    if entries is not None:
+        rec["entries"] = entries
+    try:
+        with open(_sidecar(path), "w", encoding="utf-8") as f:
+            json.dump(rec, f)
+    except OSError as exc:
+        print(f"[DoT-Modder] Could not record hash of {path}: {exc}")
+
+def known_hash(path: str) -> str | None:
+    """Hash recorded by record_hash(), if the file has not changed since."""
+    try:
+        with open(_sidecar(path), "r", encoding="utf-8") as f:
+            rec = json.load(f)
+        st = os.stat(path)
+    except (OSError, ValueError):
+        return None
+    if rec.get("size") == st.st_size and rec.get("mtime_ns") == st.st_mtime_ns:
+        return rec.get("hash")
+    return None
+
+def recorded_entries(path: str) -> dict | None:
+    """The fingerprint recorded with the last hash, whether or not the file changed since."""
+    try:
+        with open(_sidecar(path), "r", encoding="utf-8") as f:
+            return json.load(f).get("entries")
+    except (OSError, ValueError):
+        return None
+
+def record_entries(path: str, entries: dict):
+    """Record a JAR's fingerprint on its own (e.g. of a JAR we read but did not write),
+    keeping the hash recorded for it if that is still valid."""
+    record_hash(path, known_hash(path), entries)
+
+def has_record(path: str) -> bool:
+    """Whether record_hash() was ever called for `path` (by this or an older version)."""
+    return os.path.exists(_sidecar(path))
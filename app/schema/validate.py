@@ -0,0 +1,117 @@
+﻿# app/schema/validate.py
+import os, json, hashlib, threading, importlib.util
+from typing import Any, Callable, Dict, Iterable, List, Tuple
+
+SCHEMA_DIR = os.path.dirname(os.path.abspath(__file__))
+CACHE_DIR = os.path.join("profiles", "cache", "schema")
+
+# object type -> schema file in app/schema
+TYPE_SCHEMAS = {
+    "Loadouts": "loadout.json",
+    "Backgrounds": "background.json",
+}
+
+_validators: Dict[str, Callable | None] = {}
+_lock = threading.Lock()
+
+
+class ValidationError(ValueError):
+    """One or more records do not match their schema. `errors` lists {type, key, message}."""
+
+    def __init__(self, errors: List[Dict[str, Any]]):
+        self.errors = errors
+        head = "; ".join(e["message"] for e in errors[:3])
+        more = f" (+{len(errors) - 3} more)" if len(errors) > 3 else ""
+        super().__init__(head + more)
+
+
+def to_json_schema(spec: dict) -> dict:
+    """Translate our field-list schema files into JSON Schema.
+
+    Optional fields may be null (the dump helper emits null for unset strings);
+    unknown fields are allowed so new game fields don't block edits.
+    """
+    props, required = {}, []
+    for name, field in spec.get("fields", {}).items():
+        prop = {k: v for k, v in field.items() if k not in ("required", "default")}
+        if field.get("required"):
+            required.append(name)
+        elif "type" in prop:
+            prop["type"] = [prop["type"], "null"]
+        props[name] = prop
+    return {"type": "object", "properties": props, "required": required}
+
+
+def _compiled_module(type_name: str, schema: dict) -> Callable:
+    """Load the generated validator from the on-disk cache, generating it on a miss."""
+    import fastjsonschema
+    blob = json.dumps(schema, sort_keys=True).encode("utf-8")
+    digest = hashlib.sha256(blob + fastjsonschema.VERSION.encode("utf-8")).hexdigest()[:16]
+    path = os.path.join(CACHE_DIR, f"{type_name.lower()}_{digest}.py")
+    if not os.path.exists(path):
+        os.makedirs(CACHE_DIR, exist_ok=True)
+        code = fastjsonschema.compile_to_code(schema, use_default=False)
+        tmp = f"{path}.{os.getpid()}.tmp"
+        with open(tmp, "w", encoding="utf-8") as f:
+            f.write(code)
+        os.replace(tmp, path)
+    spec = importlib.util.spec_from_file_location(f"_dotmodder_schema_{type_name.lower()}_{digest}", path)
+    module = importlib.util.module_from_spec(spec)
+    spec.loader.exec_module(module)
+    return module.validate
+
+
+def validator_for(type_name: str) -> Callable | None:
+    """Compiled validator for a type, or None if the type has no schema."""
+    if type_name in _validators:
+        return _validators[type_name]
+    with _lock:
+        if type_name not in _validators:
+            fname = TYPE_SCHEMAS.get(type_name)
+            fn = None
+            if fname:
+                with open(os.path.join(SCHEMA_DIR, fname), "r", encoding="utf-8-sig") as f:
+                    schema = to_json_schema(json.load(f))
+                try:
+                    fn = _compiled_module(type_name, schema)
+                except OSError as exc:
+                    print(f"[DoT-Modder] Schema cache unavailable ({exc}); compiling in memory.")
+                    import fastjsonschema
+                    fn = fastjsonschema.compile(schema, use_default=False)
+            _validators[type_name] = fn
+    return _validators[type_name]
+
+
+def check_record(type_name: str, record: dict) -> Dict[str, Any] | None:
+    """Error dict for one record, or None if it is valid."""
+    fn = validator_for(type_name)
+    if fn is None:
+        return None
+    from fastjsonschema import JsonSchemaException     # loaded with the validator anyway
+    key = record.get("key") if isinstance(record, dict) else None
+    try:
+        fn(record, name_prefix=str(key or "record"))
+    except JsonSchemaException as exc:
+        return {"type": type_name, "key": key, "message": getattr(exc, "message", str(exc))}
+    return None
+
+
+def validate_many(items: Iterable[Tuple[str, dict]]) -> List[Dict[str, Any]]:
+    """Validate (type, record) pairs, e.g. a whole patch set; returns every error found."""
+    errors = []
+    for type_name, record in items:
+        err = check_record(type_name, record)
+        if err:
+            errors.append(err)
+    return errors
+
+
+def validate_records(type_name: str, records: Iterable[dict]) -> List[Dict[str, Any]]:
+    return validate_many((type_name, r) for r in records)
+
+
+def validate_record(type_name: str, record: dict):
+    """Raise ValidationError if the record does not match its type's schema."""
+    err = check_record(type_name, record)
+    if err:
+        raise ValidationError([err])
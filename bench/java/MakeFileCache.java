@@ -0,0 +1,96 @@
+import java.io.*;
+import java.util.*;
+import dot.bench.*;
+import dot.loading.filecache.FileCache;
+
+/**
+ * Writes a synthetic FileCache .dat for the benchmarks.
+ *
+ *   java -cp <classes> MakeFileCache <out.dat> <loadouts> <backgrounds> <seed>
+ *
+ * Records are deterministic for a given seed. Besides the two object types the cache
+ * holds a few hundred unrelated xml objects, so deserialization isn't unrealistically cheap.
+ */
+public class MakeFileCache {
+
+  static final String[] WORDS = {
+    "ancient", "blade", "crimson", "dawn", "ember", "frost", "grim", "hollow", "iron", "jade",
+    "keen", "lunar", "mire", "night", "oak", "pale", "quick", "rune", "storm", "thorn",
+    "umbral", "vale", "wild", "yew", "zephyr"
+  };
+
+  static String words(Random r, int n, String sep) {
+    StringBuilder b = new StringBuilder();
+    for (int i = 0; i < n; i++) {
+      if (i > 0) b.append(sep);
+      b.append(WORDS[r.nextInt(WORDS.length)]);
+    }
+    return b.toString();
+  }
+
+  static String ids(Random r, String prefix, int pool, int n) {
+    StringBuilder b = new StringBuilder();
+    for (int i = 0; i < n; i++) {
+      if (i > 0) b.append(",");
+      b.append(prefix).append(r.nextInt(pool));
+    }
+    return b.toString();
+  }
+
+  public static void main(String[] args) throws Exception {
+    if (args.length < 4) {
+      System.err.println("Usage: MakeFileCache <out.dat> <loadouts> <backgrounds> <seed>");
+      System.exit(1);
+    }
+    int nLoadouts = Integer.parseInt(args[1]);
+    int nBackgrounds = Integer.parseInt(args[2]);
+    Random r = new Random(Long.parseLong(args[3]));
+
+    LoadoutsXml lx = new LoadoutsXml();
+    lx.loadouts = new Loadout[nLoadouts];
+    for (int i = 0; i < nLoadouts; i++) {
+      Loadout l = new Loadout();
+      l.key = "loadout_" + i;
+      l.name = words(r, 2, " ") + " " + i;
+      l.description = words(r, 24, " ");
+      l.sortOrder = i;
+      l.selectMajorSkills = r.nextInt(3);
+      l.selectMinorSkills = r.nextInt(4);
+      l.majorSkills = ids(r, "skill_", 60, 3);
+      l.minorSkills = ids(r, "skill_", 60, 4);
+      l.abilities = ids(r, "ability_", 200, 2);
+      l.perks = ids(r, "perk_", 300, 4);
+      l.selectPerks = ids(r, "perk_", 300, 2);
+      l.lootTable = "loot_" + r.nextInt(100);
+      l.lootDescription = words(r, 6, " ");
+      l.card = "cards/" + l.key + ".png";
+      l.cardSmall = "cards/small/" + l.key + ".png";
+      l.cardSquare = "cards/square/" + l.key + ".png";
+      l.defaultBodyType = r.nextBoolean() ? "male" : "female";
+      lx.loadouts[i] = l;
+    }
+
+    BackgroundsXml bx = new BackgroundsXml();
+    bx.backgrounds = new Background[nBackgrounds];
+    for (int i = 0; i < nBackgrounds; i++) {
+      Background b = new Background();
+      b.key = "background_" + i;
+      b.name = words(r, 2, " ");
+      b.description = words(r, 16, " ");
+      b.abilities = ids(r, "ability_", 200, 2);
+      b.perks = ids(r, "perk_", 300, 3);
+      b.sortOrder = i;
+      bx.backgrounds[i] = b;
+    }
+
+    FileCache fc = new FileCache();
+    fc.xmlFiles.put("/modules/loadouts/data/loadouts.xml", lx);
+    fc.xmlFiles.put("/modules/backgrounds/data/backgrounds.xml", bx);
+    for (int i = 0; i < 300; i++) {
+      fc.xmlFiles.put("/modules/filler/data/filler_" + i + ".xml", words(r, 64, " "));
+    }
+    try (ObjectOutputStream out = new ObjectOutputStream(new BufferedOutputStream(new FileOutputStream(args[0])))) {
+      out.writeObject(fc);
+    }
+  }
+}
@@ -0,0 +1,10 @@
+package dot.bench;
+
+import java.io.Serializable;
+
+public class Background implements Serializable {
+  private static final long serialVersionUID = 1L;
+
+  public String key, name, description, abilities, perks;
+  public int sortOrder;
+}
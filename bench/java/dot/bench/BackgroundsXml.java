@@ -0,0 +1,9 @@
+package dot.bench;
+
+import java.io.Serializable;
+
+public class BackgroundsXml implements Serializable {
+  private static final long serialVersionUID = 1L;
+
+  public Background[] backgrounds = new Background[0];
+}
@@ -0,0 +1,13 @@
+package dot.bench;
+
+import java.io.Serializable;
+
+/** Field layout the loadout helpers expect (CSV strings for the list fields). */
+public class Loadout implements Serializable {
+  private static final long serialVersionUID = 1L;
+
+  public String key, name, description, warning;
+  public int sortOrder, selectMajorSkills, selectMinorSkills;
+  public String majorSkills, minorSkills, abilities, perks, selectPerks;
+  public String lootTable, lootDescription, card, cardSmall, cardSquare, defaultBodyType;
+}
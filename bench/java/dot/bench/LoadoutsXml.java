@@ -0,0 +1,9 @@
+package dot.bench;
+
+import java.io.Serializable;
+
+public class LoadoutsXml implements Serializable {
+  private static final long serialVersionUID = 1L;
+
+  public Loadout[] loadouts = new Loadout[0];
+}
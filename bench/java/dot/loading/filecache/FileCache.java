@@ -0,0 +1,14 @@
+package dot.loading.filecache;
+
+import java.io.Serializable;
+import java.util.HashMap;
+
+/**
+ * Stand-in for the game's FileCache, for benchmarks only. Carries just what the
+ * helpers touch: parsed xml objects keyed by their path inside the game data.
+ */
+public class FileCache implements Serializable {
+  private static final long serialVersionUID = 1L;
+
+  public HashMap<String, Object> xmlFiles = new HashMap<>();
+}
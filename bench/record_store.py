@@ -0,0 +1,115 @@
+﻿"""RecordStore vs the old dict-of-dicts session cache: memory and latency.
+
+    python -m bench.record_store [--records N]
+"""
+import argparse, json, time, tracemalloc
+from app.data.record_store import RecordStore
+from app.safety.hashes import sha256_json
+from .validation import synthetic_records
+
+
+class DictOfDicts:
+    """What JarSession did before RecordStore: a live copy plus a JSON-roundtrip original."""
+
+    def __init__(self):
+        self.cache, self.orig = {}, {}
+
+    def load(self, t, k, rec):
+        self.cache[(t, k)] = rec
+        self.orig.setdefault((t, k), json.loads(json.dumps(rec)))
+
+    def get(self, t, k):
+        return json.loads(json.dumps(self.cache[(t, k)]))
+
+    def set(self, t, k, rec):
+        self.cache[(t, k)] = rec
+
+    def revert(self, t, k):
+        self.cache[(t, k)] = json.loads(json.dumps(self.orig[(t, k)]))
+
+    def base_hash(self, t, k):
+        return sha256_json(self.orig[(t, k)])
+
+    def views(self, t):
+        return [v for (tt, k), v in self.cache.items() if tt == t]
+
+
+class Store:
+    def __init__(self):
+        self.s = RecordStore()
+
+    def load(self, t, k, rec):
+        self.s.load(t, k, rec)
+
+    def get(self, t, k):
+        return self.s.get(t, k)
+
+    def set(self, t, k, rec):
+        self.s.set(t, k, rec)
+
+    def revert(self, t, k):
+        self.s.revert(t, k)
+
+    def base_hash(self, t, k):
+        return self.s.base_hash(t, k)
+
+    def views(self, t):
+        return self.s.views(t)
+
+
+def _per_op_us(fn, keys) -> float:
+    t = time.perf_counter()
+    for k in keys:
+        fn(k)
+    return (time.perf_counter() - t) / len(keys) * 1e6
+
+
+def run(impl, records: list[dict], samples: int) -> dict:
+    parsed = json.loads(json.dumps(records))    # fresh objects, as parse_dat would return
+    tracemalloc.start()
+    base = tracemalloc.get_traced_memory()[0]
+    t = time.perf_counter()
+    store = impl()
+    for rec in parsed:
+        store.load("Loadouts", rec["key"], rec)
+    del parsed, rec
+    load_ms = (time.perf_counter() - t) * 1000
+    mem = tracemalloc.get_traced_memory()[0] - base
+    tracemalloc.stop()
+
+    keys = [r["key"] for r in records[:samples]]
+    out = {"load_ms": load_ms, "memory_mb": mem / 2**20}
+    out["get_us"] = _per_op_us(lambda k: store.get("Loadouts", k), keys)
+    out["base_hash_us"] = _per_op_us(lambda k: store.base_hash("Loadouts", k), keys)
+    out["base_hash_again_us"] = _per_op_us(lambda k: store.base_hash("Loadouts", k), keys)
+
+    def edit(k):
+        rec = store.get("Loadouts", k)
+        rec["name"] = rec["name"] + "!"
+        store.set("Loadouts", k, rec)
+    out["edit_us"] = _per_op_us(edit, keys)
+    out["revert_us"] = _per_op_us(lambda k: store.revert("Loadouts", k), keys)
+    t = time.perf_counter()
+    store.views("Loadouts")
+    out["views_ms"] = (time.perf_counter() - t) * 1000
+    return out
+
+
+def main(argv=None):
+    ap = argparse.ArgumentParser(description=__doc__.splitlines()[0])
+    ap.add_argument("--records", type=int, default=50_000)
+    ap.add_argument("--samples", type=int, default=2_000, help="records per latency measurement")
+    args = ap.parse_args(argv)
+
+    records = synthetic_records(args.records)
+    results = {name: run(impl, records, min(args.samples, len(records)))
+               for name, impl in (("dict-of-dicts", DictOfDicts), ("RecordStore", Store))}
+
+    print(f"{args.records:,} Loadouts records")
+    print(f"{'':22}" + "".join(f"{name:>16}" for name in results))
+    for metric in next(iter(results.values())):
+        print(f"{metric:22}" + "".join(f"{r[metric]:16.2f}" for r in results.values()))
+
+
+if __name__ == "__main__":
+    main()
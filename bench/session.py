@@ -0,0 +1,175 @@
+"""End-to-end JarSession timings against a synthetic DOT.jar.
+
+    python -m bench.session [--repeat N] [--out FILE] [--baseline FILE] [synth options]
+
+Times open, list_records (cold JVM, warm daemon, record cache), update_record,
+_repack, restore_object_type and apply_all. Results are written as JSON and checked
+against bench/thresholds.json (absolute ceilings) and, with --baseline, against an
+earlier results file (relative). Exits 1 if anything regressed. Needs a JDK.
+"""
+import argparse, json, os, platform, shutil, statistics, subprocess, sys, tempfile, time
+from app.data import dat_parser
+from app.data.jar_io import JarSession
+from app.patch_engine.patch_apply import apply_all
+from app.patch_engine.patch_store import PatchStore
+from app.safety.backups import BackupManager
+from .synth import CACHE_DIR, add_spec_args, cached_jar, spec_from_args
+
+THRESHOLDS = os.path.join(os.path.dirname(os.path.abspath(__file__)), "thresholds.json")
+
+
+def _java_version() -> str:
+    try:
+        proc = subprocess.run(["java", "-version"], capture_output=True, text=True)
+        return (proc.stderr or proc.stdout).splitlines()[0]
+    except (OSError, IndexError):
+        return "unknown"
+
+
+def use_private_helpers(root: str, dotjar: str):
+    """Build the helper jar into `root` against the synthetic JAR, so the real helper
+    cache never holds classes built against the stand-in FileCache."""
+    dat_parser.shutdown_helpers()
+    dat_parser.HELPER_CACHE = os.path.join(root, "helpers")
+    dat_parser._helper_jars.clear()
+    os.environ["DOT_JAR_PATH"] = dotjar
+    os.environ["DOTMODDER_WARMUP"] = "0"    # the timings start their own JVMs
+    dat_parser.helper_jar(dotjar)
+
+
+class Run:
+    """One scratch copy of the synthetic JAR with its own profile directory."""
+
+    def __init__(self, pristine: str, root: str):
+        self.root = tempfile.mkdtemp(prefix="run_", dir=root)
+        self.jar = os.path.join(self.root, "DOT.jar")
+        shutil.copy2(pristine, self.jar)
+        self.backups = BackupManager(os.path.join(self.root, "profiles"))
+        self.session = None
+
+    def open(self) -> JarSession:
+        self.session = JarSession.open(self.jar, self.backups)
+        return self.session
+
+    def close(self):
+        if self.session:
+            self.session.close()
+        shutil.rmtree(self.root, ignore_errors=True)
+
+
+def _timed(fn) -> float:
+    t = time.perf_counter()
+    fn()
+    return (time.perf_counter() - t) * 1000
+
+
+def measure_once(pristine: str, root: str, patches: int) -> dict[str, float]:
+    out = {}
+    run = Run(pristine, root)
+    try:
+        out["open"] = _timed(run.open)
+        s = run.session
+        cache = s.record_cache
+        s.record_cache = None
+        dat_parser.shutdown_helpers()
+        out["list_records_cold"] = _timed(lambda: s.list_records("Loadouts"))
+        out["list_records_warm"] = _timed(lambda: s.list_records("Loadouts"))
+        s.record_cache = cache
+        s.list_records("Loadouts")      # fills the record cache
+        out["list_records_cached"] = _timed(lambda: s.list_records("Loadouts"))
+
+        keys = s.loaded_keys("Loadouts")
+        rec = s.get_record("Loadouts", keys[0])
+        rec["name"] = rec["name"] + " (bench)"
+        out["update_record"] = _timed(lambda: s.update_record("Loadouts", keys[0], rec))
+
+        s.entries.mark_dirty(s._dat_entry("Loadouts"))
+        out["repack"] = _timed(s._repack)
+        out["restore_object_type"] = _timed(lambda: s.restore_object_type("Loadouts"))
+
+        store = PatchStore(os.path.join(run.root, "profiles", "default"))
+        for k in keys[:patches]:
+            edited = s.get_record("Loadouts", k)
+            edited["description"] = (edited.get("description") or "") + " (patched)"
+            store.record_patch("Loadouts", k, edited, s.base_hash("Loadouts", k), base=s.original_record("Loadouts", k))
+        s.restore_object_type("Loadouts")
+        out["apply_all"] = _timed(lambda: apply_all(s, store))
+    finally:
+        run.close()
+    return out
+
+
+def summarize(runs: list[dict[str, float]]) -> dict[str, dict]:
+    return {name: {"median_ms": round(statistics.median(r[name] for r in runs), 2),
+                   "min_ms": round(min(r[name] for r in runs), 2),
+                   "max_ms": round(max(r[name] for r in runs), 2)}
+            for name in runs[0]}
+
+
+def check(results: dict, thresholds: dict, baseline: dict | None, tolerance: float) -> list[dict]:
+    """Metrics over their ceiling, or slower than `baseline` by more than `tolerance`."""
+    regressions = []
+    for name, r in results.items():
+        limit = thresholds.get(name, {}).get("max_ms")
+        if limit is not None and r["median_ms"] > limit:
+            regressions.append({"metric": name, "median_ms": r["median_ms"], "max_ms": limit})
+        if baseline and name in baseline:
+            before = baseline[name]["median_ms"]
+            if r["median_ms"] > before * (1 + tolerance):
+                regressions.append({"metric": name, "median_ms": r["median_ms"], "baseline_ms": before})
+    return regressions
+
+
+def main(argv=None):
+    ap = argparse.ArgumentParser(description=__doc__.splitlines()[0])
+    add_spec_args(ap)
+    ap.add_argument("--repeat", type=int, default=3)
+    ap.add_argument("--patches", type=int, default=200, help="patches replayed by apply_all")
+    ap.add_argument("--out", default=os.path.join(CACHE_DIR, "results.json"))
+    ap.add_argument("--thresholds", default=THRESHOLDS)
+    ap.add_argument("--baseline", help="earlier results file to compare against")
+    ap.add_argument("--tolerance", type=float, default=0.25, help="allowed slowdown vs --baseline")
+    args = ap.parse_args(argv)
+
+    spec = spec_from_args(args)
+    pristine = cached_jar(spec)
+    root = tempfile.mkdtemp(prefix="dotmodder_bench_")
+    try:
+        use_private_helpers(root, pristine)
+        runs = [measure_once(pristine, root, args.patches) for _ in range(args.repeat)]
+    finally:
+        dat_parser.shutdown_helpers()
+        shutil.rmtree(root, ignore_errors=True)
+
+    results = summarize(runs)
+    thresholds = {}
+    if args.thresholds and os.path.exists(args.thresholds):
+        with open(args.thresholds, "r", encoding="utf-8") as f:
+            thresholds = json.load(f)
+    baseline = None
+    if args.baseline:
+        with open(args.baseline, "r", encoding="utf-8") as f:
+            baseline = json.load(f)["results"]
+    regressions = check(results, thresholds, baseline, args.tolerance)
+
+    report = {
+        "meta": {"spec": spec.as_dict(), "repeat": args.repeat, "patches": args.patches,
+                 "python": platform.python_version(), "platform": platform.platform(),
+                 "java": _java_version(), "time": time.strftime("%Y-%m-%dT%H:%M:%S")},
+        "results": results,
+        "regressions": regressions,
+    }
+    os.makedirs(os.path.dirname(os.path.abspath(args.out)), exist_ok=True)
+    with open(args.out, "w", encoding="utf-8") as f:
+        json.dump(report, f, indent=2)
+
+    for name, r in results.items():
+        print(f"{name:22} {r['median_ms']:10.1f} ms  (min {r['min_ms']:.1f}, max {r['max_ms']:.1f})")
+    for reg in regressions:
+        print(f"REGRESSION {reg}")
+    print(f"results: {args.out}")
+    sys.exit(1 if regressions else 0)
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,137 @@
+"""Cold-start timings of the GUI: time to first window and to the first record list.
+
+    python -m bench.startup [--repeat N] [--no-jar] [--out FILE] [--baseline FILE] [synth options]
+
+Each run is a fresh `python` process (offscreen Qt) timed from launch. With a JAR it then
+opens a synthetic DOT.jar through AppWindow.open_jar and stops once the record list
+shows keys. The first run starts with an empty helper cache (javac included), later
+runs reuse the prebuilt helper jar. Backups and the record cache are fresh every run.
+Needs a JDK unless --no-jar is given.
+"""
+import argparse, json, os, platform, shutil, subprocess, sys, time
+from .synth import CACHE_DIR, add_spec_args, cached_jar, spec_from_args
+
+REPO = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+WORK = os.path.join(CACHE_DIR, "startup")     # cwd of the runs; keeps profiles/cache/helpers
+TIMEOUT_S = 180
+
+
+def child(jar: str):
+    """Runs in the timed process: show the window, optionally open `jar`, report marks."""
+    from PySide6.QtWidgets import QApplication
+    from PySide6.QtCore import QTimer
+    from app.gui.app_window import AppWindow
+
+    app = QApplication(sys.argv[:1])
+    win = AppWindow()
+    win.show()
+
+    def mark(name: str):
+        print(name, flush=True)
+
+    def first_list():
+        if win.list_pane.model.rowCount():
+            mark("first_record_list")
+            app.quit()
+        else:
+            QTimer.singleShot(5, first_list)
+
+    def shown():
+        mark("first_window")
+        if not jar:
+            app.quit()
+            return
+        win.open_jar(jar)
+        first_list()
+
+    QTimer.singleShot(0, shown)
+    app.exec()
+    win.close()
+
+
+def run_once(jar: str | None, cold: bool) -> dict[str, float]:
+    """Launch one child and time its marks from process start."""
+    profiles = os.path.join(WORK, "profiles")
+    shutil.rmtree(os.path.join(profiles, "default"), ignore_errors=True)
+    shutil.rmtree(os.path.join(profiles, "cache", "records"), ignore_errors=True)
+    if cold:
+        shutil.rmtree(os.path.join(profiles, "cache", "helpers"), ignore_errors=True)
+    target = ""
+    if jar:
+        target = os.path.abspath(os.path.join(WORK, "DOT.jar"))
+        shutil.copy2(jar, target)
+    env = dict(os.environ, QT_QPA_PLATFORM="offscreen", PYTHONPATH=REPO,
+               DOT_JAR_PATH=target or os.environ.get("DOT_JAR_PATH", ""))
+    marks = {}
+    started = time.perf_counter()
+    proc = subprocess.Popen([sys.executable, "-m", "bench.startup", "--child", target],
+                            cwd=WORK, env=env, stdout=subprocess.PIPE, stderr=subprocess.DEVNULL, text=True)
+    try:
+        for line in proc.stdout:
+            name = line.strip()
+            if name in ("first_window", "first_record_list"):
+                marks[name] = (time.perf_counter() - started) * 1000
+        proc.wait(timeout=TIMEOUT_S)
+    finally:
+        if proc.poll() is None:
+            proc.kill()
+    if proc.returncode != 0 or "first_window" not in marks or (jar and "first_record_list" not in marks):
+        raise RuntimeError(f"startup run failed (exit {proc.returncode}, marks {sorted(marks)})")
+    if cold and jar:
+        marks["first_record_list_cold"] = marks.pop("first_record_list")
+    return marks
+
+
+def main(argv=None):
+    if argv is None and sys.argv[1:2] == ["--child"]:
+        return child(sys.argv[2] if len(sys.argv) > 2 else "")
+    from .session import THRESHOLDS, check, summarize   # not in the timed child: it loads the app
+    ap = argparse.ArgumentParser(description=__doc__.splitlines()[0])
+    add_spec_args(ap)
+    ap.add_argument("--repeat", type=int, default=5)
+    ap.add_argument("--no-jar", action="store_true", help="only time the first window (no JDK needed)")
+    ap.add_argument("--out", default=os.path.join(CACHE_DIR, "startup.json"))
+    ap.add_argument("--thresholds", default=THRESHOLDS)
+    ap.add_argument("--baseline", help="earlier results file to compare against")
+    ap.add_argument("--tolerance", type=float, default=0.25, help="allowed slowdown vs --baseline")
+    args = ap.parse_args(argv)
+
+    jar = None if args.no_jar else cached_jar(spec_from_args(args))
+    os.makedirs(WORK, exist_ok=True)
+    runs = [run_once(jar, cold=(n == 0)) for n in range(args.repeat)]
+    results = summarize([{k: v for k, v in r.items() if k != "first_record_list_cold"} for r in runs[1:] or runs])
+    if jar:
+        results["first_record_list_cold"] = summarize([runs[0]])["first_record_list_cold"]
+        if len(runs) == 1:
+            results.pop("first_record_list", None)
+
+    thresholds = {}
+    if args.thresholds and os.path.exists(args.thresholds):
+        with open(args.thresholds, "r", encoding="utf-8") as f:
+            thresholds = json.load(f)
+    baseline = None
+    if args.baseline:
+        with open(args.baseline, "r", encoding="utf-8") as f:
+            baseline = json.load(f)["results"]
+    regressions = check(results, thresholds, baseline, args.tolerance)
+
+    report = {
+        "meta": {"repeat": args.repeat, "jar": bool(jar), "python": platform.python_version(),
+                 "platform": platform.platform(), "time": time.strftime("%Y-%m-%dT%H:%M:%S")},
+        "results": results,
+        "regressions": regressions,
+    }
+    os.makedirs(os.path.dirname(os.path.abspath(args.out)), exist_ok=True)
+    with open(args.out, "w", encoding="utf-8") as f:
+        json.dump(report, f, indent=2)
+
+    for name, r in results.items():
+        print(f"{name:24} {r['median_ms']:10.1f} ms  (min {r['min_ms']:.1f}, max {r['max_ms']:.1f})")
+    for reg in regressions:
+        print(f"REGRESSION {reg}")
+    print(f"results: {args.out}")
+    sys.exit(1 if regressions else 0)
+
+
+if __name__ == "__main__":
+    main()
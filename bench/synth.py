@@ -0,0 +1,112 @@
+"""Synthetic DOT.jar for benchmarks: stand-in FileCache classes, a generated
+modules/loadouts.dat, filler class files and incompressible assets.
+
+    python -m bench.synth OUT.jar [--loadouts N] [--classes N] [--assets N] [--asset-kb N]
+
+Needs a JDK (javac + java on PATH). Output is deterministic for a given --seed.
+"""
+import argparse, glob, hashlib, json, os, random, shutil, subprocess, tempfile, zipfile
+
+JAVA_SRC = os.path.join(os.path.dirname(os.path.abspath(__file__)), "java")
+CACHE_DIR = os.path.join("profiles", "cache", "bench")
+
+
+class SynthSpec:
+    def __init__(self, loadouts: int = 2000, backgrounds: int = 200, classes: int = 2000,
+                 class_bytes: int = 2048, assets: int = 200, asset_kb: int = 64, seed: int = 1):
+        self.loadouts = loadouts
+        self.backgrounds = backgrounds
+        self.classes = classes          # filler .class entries (compressible)
+        self.class_bytes = class_bytes
+        self.assets = assets            # random-byte assets (incompressible, stored)
+        self.asset_kb = asset_kb
+        self.seed = seed
+
+    def as_dict(self) -> dict:
+        return dict(vars(self))
+
+    def digest(self) -> str:
+        h = hashlib.sha256(json.dumps(self.as_dict(), sort_keys=True).encode("utf-8"))
+        for path in sorted(glob.glob(os.path.join(JAVA_SRC, "**", "*.java"), recursive=True)):
+            with open(path, "rb") as f:
+                h.update(f.read())
+        return h.hexdigest()[:16]
+
+
+def _run(cmd: list[str], cwd: str | None = None):
+    proc = subprocess.run(cmd, cwd=cwd, capture_output=True, text=True)
+    if proc.returncode != 0:
+        raise RuntimeError(f"{cmd[0]} failed: {proc.stderr.strip() or proc.stdout.strip()}")
+
+
+def compile_standins(dest: str):
+    sources = glob.glob(os.path.join(JAVA_SRC, "**", "*.java"), recursive=True)
+    os.makedirs(dest, exist_ok=True)
+    _run(["javac", "-d", dest] + sources)
+
+
+def build_jar(out_path: str, spec: SynthSpec):
+    """Write a synthetic DOT.jar to `out_path`."""
+    rnd = random.Random(spec.seed)
+    work = tempfile.mkdtemp(prefix="dotmodder_synth_")
+    try:
+        classes = os.path.join(work, "classes")
+        compile_standins(classes)
+        dat = os.path.join(work, "loadouts.dat")
+        _run(["java", "-cp", classes, "MakeFileCache", dat,
+              str(spec.loadouts), str(spec.backgrounds), str(spec.seed)])
+
+        tmp = out_path + ".part"
+        with zipfile.ZipFile(tmp, "w", zipfile.ZIP_DEFLATED) as z:
+            z.writestr("META-INF/MANIFEST.MF", "Manifest-Version: 1.0\r\n\r\n")
+            for path in sorted(glob.glob(os.path.join(classes, "dot", "**", "*.class"), recursive=True)):
+                z.write(path, os.path.relpath(path, classes).replace(os.sep, "/"))
+            for i in range(spec.classes):
+                # Class-file-like bytes: magic, then repetitive constant-pool-ish text.
+                body = b"\xca\xfe\xba\xbe" + (f"dot/gen/C{i} field{rnd.randrange(999)} ".encode() * spec.class_bytes)[:spec.class_bytes]
+                z.writestr(f"dot/gen/C{i}.class", body)
+            z.write(dat, "modules/loadouts.dat")
+            for i in range(spec.assets):
+                z.writestr(zipfile.ZipInfo(f"assets/img_{i:05}.png"), rnd.randbytes(spec.asset_kb * 1024),
+                           compress_type=zipfile.ZIP_STORED)
+        os.replace(tmp, out_path)
+    finally:
+        shutil.rmtree(work, ignore_errors=True)
+
+
+def cached_jar(spec: SynthSpec, cache_dir: str = CACHE_DIR) -> str:
+    """Path of a pristine synthetic JAR for `spec`, built on first use."""
+    path = os.path.join(cache_dir, f"DOT-{spec.digest()}.jar")
+    if not os.path.exists(path):
+        os.makedirs(cache_dir, exist_ok=True)
+        build_jar(path, spec)
+    return path
+
+
+def add_spec_args(ap: argparse.ArgumentParser):
+    d = SynthSpec()
+    ap.add_argument("--loadouts", type=int, default=d.loadouts)
+    ap.add_argument("--backgrounds", type=int, default=d.backgrounds)
+    ap.add_argument("--classes", type=int, default=d.classes)
+    ap.add_argument("--class-bytes", type=int, default=d.class_bytes)
+    ap.add_argument("--assets", type=int, default=d.assets)
+    ap.add_argument("--asset-kb", type=int, default=d.asset_kb)
+    ap.add_argument("--seed", type=int, default=d.seed)
+
+
+def spec_from_args(args) -> SynthSpec:
+    return SynthSpec(args.loadouts, args.backgrounds, args.classes, args.class_bytes,
+                     args.assets, args.asset_kb, args.seed)
+
+
+def main(argv=None):
+    ap = argparse.ArgumentParser(description=__doc__.splitlines()[0])
+    ap.add_argument("out")
+    add_spec_args(ap)
+    args = ap.parse_args(argv)
+    build_jar(args.out, spec_from_args(args))
+    print(f"wrote {args.out} ({os.path.getsize(args.out) / 2**20:.1f} MB)")
+
+
+if __name__ == "__main__":
+    main()
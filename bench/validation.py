@@ -0,0 +1,43 @@
+﻿"""Schema validation throughput.
+
+    python -m bench.validation [--records N]
+"""
+import argparse, json, os, time
+from app.schema import validate
+
+PROBE = os.path.join(os.path.dirname(__file__), "..", "tools", "java", "_probe.json")
+
+
+def synthetic_records(n: int) -> list[dict]:
+    with open(PROBE, "r", encoding="utf-8-sig") as f:
+        probe = json.load(f)
+    return [dict(probe[i % len(probe)], key=f"{probe[i % len(probe)]['key']}_{i}") for i in range(n)]
+
+
+def main(argv=None):
+    ap = argparse.ArgumentParser(description=__doc__.splitlines()[0])
+    ap.add_argument("--records", type=int, default=100_000)
+    ap.add_argument("--type", default="Loadouts")
+    args = ap.parse_args(argv)
+
+    t = time.perf_counter()
+    validate.validator_for(args.type)
+    first_ms = (time.perf_counter() - t) * 1000
+    validate._validators.clear()
+    t = time.perf_counter()
+    validate.validator_for(args.type)
+    cached_ms = (time.perf_counter() - t) * 1000
+
+    records = synthetic_records(args.records)
+    t = time.perf_counter()
+    errors = validate.validate_records(args.type, records)
+    dt = time.perf_counter() - t
+
+    print(f"validator first load: {first_ms:.1f} ms, from disk cache: {cached_ms:.1f} ms")
+    print(f"validated {len(records):,} {args.type} records in {dt * 1000:.1f} ms "
+          f"-> {len(records) / dt:,.0f} records/sec ({len(errors)} errors)")
+    print(f"per record: {dt / len(records) * 1e6:.2f} us")
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,23 @@
+import os, subprocess, sys, time
+from app.safety.atomic import STALE_AFTER_S, recover_temp_files
+
+
+def _dead_pid() -> int:
+    proc = subprocess.Popen([sys.executable, "-c", "pass"])
+    proc.wait()
+    return proc.pid
+
+
+def test_only_abandoned_temp_files_are_removed(tmp_path):
+    dst = str(tmp_path / "DOT.jar")
+    live = f"{dst}.{os.getppid()}.tmp"      # another instance, mid-save
+    dead = f"{dst}.{_dead_pid()}.tmp"
+    stale = f"{dst}.{os.getppid()}9.tmp"
+    for path in (live, dead, stale):
+        with open(path, "wb") as f:
+            f.write(b"partial")
+    old = time.time() - STALE_AFTER_S - 60
+    os.utime(stale, (old, old))
+
+    assert sorted(recover_temp_files(dst)) == sorted([dead, stale])
+    assert os.path.exists(live)
@@ -0,0 +1,105 @@
+import os, zipfile
+import pytest
+from app.data.jar_io import JarSession
+from app.data.jar_repack import check_written
+from app.safety.backups import BackupManager
+
+V1 = {"dot/A.class": b"A1", "modules/loadouts.dat": b"L1", "modules/other.dat": b"O1"}
+
+
+def _write_jar(path, files):
+    with zipfile.ZipFile(path, "w", zipfile.ZIP_DEFLATED) as z:
+        for name, data in files.items():
+            z.writestr(name, data)
+
+
+@pytest.fixture
+def jar(tmp_path, monkeypatch):
+    monkeypatch.setenv("DOTMODDER_WARMUP", "0")
+    path = str(tmp_path / "DOT.jar")
+    _write_jar(path, V1)
+    return path
+
+
+def _blobs(backups) -> int:
+    return sum(len(files) for _, _, files in os.walk(backups.objects_dir))
+
+
+def _open(jar, backups):
+    session = JarSession.open(jar, backups)
+    session.close()
+    return session.game_update
+
+
+def test_dat_only_update_of_a_never_saved_jar_is_detected(tmp_path, jar):
+    backups = BackupManager(str(tmp_path / "profiles"))
+    assert _open(jar, backups) is None
+
+    _write_jar(jar, dict(V1, **{"modules/loadouts.dat": b"L2"}))    # the game, not us
+    update = _open(jar, backups)
+    assert update["entries"] == ["modules/loadouts.dat"]
+    assert backups.read_entry(update["baseline"], "modules/loadouts.dat") == b"L2"
+    assert _open(jar, backups) is None
+
+
+def test_dat_edits_under_a_legacy_backup_are_ours(tmp_path, jar):
+    _write_jar(jar + ".backup", V1)
+    _write_jar(jar, dict(V1, **{"modules/loadouts.dat": b"L1-modded"}))   # saved by an old version
+    backups = BackupManager(str(tmp_path / "profiles"))
+    assert _open(jar, backups) is None
+    assert backups.read_entry(backups.baseline(os.path.abspath(jar)), "modules/loadouts.dat") == b"L1"
+
+    _write_jar(jar, dict(V1, **{"modules/other.dat": b"O2"}))   # a later game update is still seen
+    assert _open(jar, backups)["entries"] == ["modules/other.dat"]
+
+
+def test_game_updates_keep_two_baselines_and_collect_the_rest(tmp_path, jar):
+    backups = BackupManager(str(tmp_path / "profiles"))
+    backups.GC_GRACE_S = -1
+    _open(jar, backups)
+    for n in (2, 3):
+        _write_jar(jar, dict(V1, **{"modules/loadouts.dat": b"L%d" % n}))
+        update = _open(jar, backups)
+    assert [h["id"] for h in backups.snapshots(jar)] == [update["previous"], update["baseline"]]
+    assert backups.read_entry(update["previous"], "modules/loadouts.dat") == b"L2"
+    assert _blobs(backups) == len(V1) + 1     # L1's blob went with the first baseline
+
+
+def test_snapshots_store_each_content_once(tmp_path, jar):
+    backups = BackupManager(str(tmp_path / "profiles"))
+    _write_jar(jar, dict(V1, **{"dot/Copy.class": b"A1"}))
+    first = backups.snapshot(jar, backups.BASELINE)
+    assert _blobs(backups) == 3
+    _write_jar(jar, dict(V1, **{"modules/other.dat": b"O2"}))
+    second = backups.snapshot(jar)
+    assert _blobs(backups) == 4
+    assert backups.entry_hash(first, "dot/A.class") == backups.entry_hash(second, "dot/A.class")
+    assert backups.read_entry(first, "modules/other.dat") == b"O1"
+    assert backups.read_entry(second, "modules/other.dat") == b"O2"
+    assert backups.read_entry(second, "dot/Copy.class") is None
+
+
+def test_restore_jar_round_trips_and_reads_only_what_changed(tmp_path, jar, monkeypatch):
+    with zipfile.ZipFile(jar, "a") as z:
+        z.comment = b"build 1"
+        z.writestr(zipfile.ZipInfo("dot/Stored.class", (2020, 5, 6, 7, 8, 10)), b"S" * 100)
+    backups = BackupManager(str(tmp_path / "profiles"))
+    snap = backups.ensure_backup(jar)
+    with zipfile.ZipFile(jar) as z:
+        original = [(i.filename, i.date_time, i.compress_type, z.read(i)) for i in z.infolist()]
+
+    out = str(tmp_path / "restored.jar")
+    check_written(out, backups.restore_jar(snap, out))
+    with zipfile.ZipFile(out) as z:
+        assert z.comment == b"build 1"
+        assert [(i.filename, i.date_time, i.compress_type, z.read(i)) for i in z.infolist()] == original
+
+    _write_jar(jar, {"dot/A.class": b"A1", "modules/loadouts.dat": b"L-modded", "mods/extra.txt": b"x"})
+    read = []
+    real = backups._read_blob
+    monkeypatch.setattr(backups, "_read_blob", lambda h: (read.append(h), real(h))[1])
+    backups.restore_jar(snap, out, current=jar)
+    assert sorted(read) == sorted(backups.entry_hash(snap, n)
+                                  for n in ("modules/loadouts.dat", "modules/other.dat", "dot/Stored.class"))
+    with zipfile.ZipFile(out) as z:
+        assert [(i.filename, i.date_time, i.compress_type, z.read(i)) for i in z.infolist()] == original
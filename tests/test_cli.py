@@ -0,0 +1,65 @@
+import json, os, zipfile
+import pytest
+from app import cli
+from app.data import dat_parser
+from app.patch_engine.patch_store import PatchStore
+
+JAVA_MAGIC = b"\xac\xed\x00\x05"
+
+
+def _stream(path, type_names):
+    with open(path, "rb") as f:
+        yield from (("Loadouts", r) for r in json.loads(f.read()[len(JAVA_MAGIC):]))
+
+
+def _write(path, records):
+    with open(path, "wb") as f:
+        f.write(JAVA_MAGIC + json.dumps(records).encode())
+
+
+@pytest.fixture
+def jars(tmp_path, monkeypatch):
+    monkeypatch.chdir(tmp_path)
+    monkeypatch.setenv("DOTMODDER_WARMUP", "0")
+    monkeypatch.delenv("DOT_JAR_PATH", raising=False)
+    paths = []
+    for name in ("one", "two"):
+        os.makedirs(tmp_path / name)
+        path = str(tmp_path / name / "DOT.jar")
+        with zipfile.ZipFile(path, "w") as z:
+            z.writestr("modules/loadouts.dat", JAVA_MAGIC + json.dumps([{"key": "A", "name": "A"}]).encode())
+        paths.append(path)
+    return paths
+
+
+def test_each_jar_is_read_and_written_against_its_own_classes(tmp_path, jars, monkeypatch):
+    seen = []
+
+    def stream(path, type_names):
+        seen.append(("read", os.environ.get("DOT_JAR_PATH")))
+        yield from _stream(path, type_names)
+
+    def write(path, records):
+        seen.append(("write", os.environ.get("DOT_JAR_PATH")))
+        _write(path, records)
+
+    monkeypatch.setattr(dat_parser, "_stream_java", stream)
+    monkeypatch.setattr(dat_parser, "_write_loadouts", write)
+    PatchStore(str(tmp_path / "profiles" / "default")).record_patch(
+        "Loadouts", "A", {"key": "A", "name": "A2"}, base_hash=None)
+
+    results = [cli.apply_to_jar(j, str(tmp_path / "profiles"), ["default"]) for j in jars]
+    assert [r["error"] for r in results] == [None, None]
+    assert seen[0] == ("read", jars[0])     # the second JAR's read is a record cache hit
+    assert [jar for op, jar in seen if op == "write"] == jars
+    assert "DOT_JAR_PATH" not in os.environ
+
+
+def test_backups_do_not_depend_on_the_profiles_applied(tmp_path, jars, monkeypatch):
+    monkeypatch.setattr(dat_parser, "_stream_java", _stream)
+    monkeypatch.setattr(dat_parser, "_write_loadouts", _write)
+    root = str(tmp_path / "profiles")
+    PatchStore(os.path.join(root, "content")).record_patch("Loadouts", "A", {"key": "A", "name": "A2"}, base_hash=None)
+    assert cli.apply_to_jar(jars[0], root, ["content"])["error"] is None
+    assert os.path.isdir(os.path.join(root, "default", "backups"))
+    assert not os.path.exists(os.path.join(root, "content", "backups"))
@@ -0,0 +1,51 @@
+import zipfile
+import pytest
+from app.data import dat_parser
+from app.data.dat_parser import IncompleteRead, iter_types
+from app.data.jar_io import JarSession
+from app.data.record_cache import RecordCache
+from app.safety.backups import BackupManager
+
+JAVA_MAGIC = b"\xac\xed\x00\x05"
+
+
+def _dies_mid_type(path, type_names):
+    """A helper run that streams two Loadouts and then crashes."""
+    yield "Loadouts", {"key": "L1", "name": "one"}
+    yield "Loadouts", {"key": "L2", "name": "two"}
+    raise dat_parser._DumpFailed("Helper daemon died mid-dump", error="connection reset")
+
+
+@pytest.fixture
+def broken_helper(monkeypatch):
+    monkeypatch.setattr(dat_parser, "_stream_java", _dies_mid_type)
+
+
+def test_iter_types_raises_when_the_stream_breaks(tmp_path, broken_helper):
+    dat = tmp_path / "loadouts.dat"
+    dat.write_bytes(JAVA_MAGIC)
+    cache = RecordCache(str(tmp_path / "cache"))
+    got = []
+    with pytest.raises(IncompleteRead) as exc:
+        for t, record in iter_types(str(dat), ["Loadouts", "Backgrounds"], cache):
+            got.append((t, record["key"]))
+    assert exc.value.types == ["Loadouts", "Backgrounds"]
+    assert got == [("Loadouts", "L1"), ("Loadouts", "L2"), ("Backgrounds", "raw_backgrounds")]
+    assert cache.get(dat_parser.sha256_file(str(dat)), "Loadouts", dat_parser.helper_version("Loadouts")) is None
+
+
+def test_partly_read_type_is_not_writable(tmp_path, broken_helper):
+    jar = tmp_path / "DOT.jar"
+    with zipfile.ZipFile(jar, "w") as z:
+        z.writestr("modules/loadouts.dat", JAVA_MAGIC)
+    session = JarSession(str(jar), str(tmp_path / "work"), BackupManager(str(tmp_path / "profiles")))
+    session.auto_flush = False
+
+    assert session.list_records("Loadouts") == ["L1", "L2"]
+    with pytest.raises(ValueError, match="partly read"):
+        session.update_record("Loadouts", "L1", {"key": "L1", "name": "edited"})
+    session.ensure_loaded("Loadouts")       # no silent retry that would mark it complete
+    with pytest.raises(ValueError, match="partly read"):
+        session.update_record("Loadouts", "L1", {"key": "L1", "name": "edited"})
+    assert not session.has_pending
+    assert session.flush() is False
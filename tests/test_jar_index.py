@@ -0,0 +1,66 @@
+import os, zipfile
+import pytest
+from app.data.jar_index import EntryCache, JarIndex, fingerprint
+
+FILES = {"dot/A.class": b"A" * 100, "modules/loadouts.dat": b"L" * 300, "modules/skills.dat": b"S" * 300}
+
+
+@pytest.fixture
+def jar(tmp_path):
+    path = str(tmp_path / "DOT.jar")
+    with zipfile.ZipFile(path, "w") as z:
+        z.writestr("modules/", b"")
+        for name, data in FILES.items():
+            z.writestr(name, data, compress_type=zipfile.ZIP_STORED if name.endswith(".class") else zipfile.ZIP_DEFLATED)
+    return path
+
+
+def test_index_lists_files_and_extracts_one_entry(tmp_path, jar):
+    index = JarIndex(jar)
+    assert list(index.entries) == list(FILES)
+    assert index.find(r"modules/.*loadouts.*\.dat$") == "modules/loadouts.dat"
+    for name, data in FILES.items():
+        dest = str(tmp_path / "out" / name)
+        index.extract(name, dest)
+        with open(dest, "rb") as f:
+            assert f.read() == data
+    assert set(fingerprint(index.entries.values())) == set(FILES)
+
+
+def test_extract_refuses_a_bad_crc(tmp_path, jar):
+    index = JarIndex(jar)
+    index.entries["dot/A.class"].CRC ^= 1
+    with pytest.raises(zipfile.BadZipFile, match="CRC"):
+        index.extract("dot/A.class", str(tmp_path / "out" / "A.class"))
+    assert not os.listdir(tmp_path / "out")     # no .part left behind
+
+
+def test_cache_extracts_on_demand_and_evicts_clean_entries(tmp_path, jar, monkeypatch):
+    index = JarIndex(jar)
+    extracted = []
+    real = index.extract
+    monkeypatch.setattr(index, "extract", lambda name, dest: (extracted.append(name), real(name, dest)))
+    cache = EntryCache(index, str(tmp_path / "cache"), max_bytes=400)
+
+    assert os.listdir(tmp_path) == ["DOT.jar"]      # nothing is extracted up front
+    loadouts = cache.get("modules/loadouts.dat")
+    assert cache.get("modules/loadouts.dat") == loadouts
+    assert extracted == ["modules/loadouts.dat"]
+
+    cache.mark_dirty("modules/loadouts.dat")
+    cache.get("modules/skills.dat")     # over the budget, but a dirty entry stays
+    assert os.path.exists(loadouts)
+    cache.commit()
+    assert not os.path.exists(loadouts)     # clean again, so the least recently used goes
+    assert os.path.exists(cache.path("modules/skills.dat"))
+
+
+def test_cache_re_extracts_entries_the_jar_changed(tmp_path, jar):
+    cache = EntryCache(JarIndex(jar), str(tmp_path / "cache"))
+    path = cache.get("modules/loadouts.dat")
+    with zipfile.ZipFile(jar, "w") as z:
+        z.writestr("modules/loadouts.dat", b"L2")
+    cache.index.refresh()
+    assert cache.get("modules/loadouts.dat") == path
+    with open(path, "rb") as f:
+        assert f.read() == b"L2"
@@ -0,0 +1,99 @@
+import io, zipfile
+import pytest
+from app.data.jar_index import data_offset
+from app.data.jar_repack import check_written, repack_full, repack_incremental
+
+FILES = [
+    ("META-INF/MANIFEST.MF", b"Manifest-Version: 1.0\n", zipfile.ZIP_STORED),
+    ("dot/A.class", b"A" * 5000, zipfile.ZIP_DEFLATED),
+    ("modules/loadouts.dat", b"L1" * 1000, zipfile.ZIP_DEFLATED),
+    ("dot/B.class", b"B" * 3000, zipfile.ZIP_DEFLATED),
+]
+
+
+class _Stream(io.RawIOBase):
+    """A write-only stream: zipfile cannot seek back, so it writes data descriptors."""
+
+    def __init__(self):
+        self.data = bytearray()
+
+    def writable(self):
+        return True
+
+    def write(self, b):
+        self.data += b
+        return len(b)
+
+
+@pytest.fixture(params=[False, True], ids=["headers", "descriptors"])
+def jar(request, tmp_path):
+    path = tmp_path / "DOT.jar"
+    stream = _Stream() if request.param else open(path, "wb")
+    with zipfile.ZipFile(stream, "w") as z:
+        z.comment = b"game build 42"
+        for name, data, method in FILES:
+            z.writestr(zipfile.ZipInfo(name, (2020, 1, 1, 0, 0, 0)), data, compress_type=method)
+    if request.param:
+        path.write_bytes(stream.data)
+    else:
+        stream.close()
+    with zipfile.ZipFile(path) as z:
+        assert all(bool(i.flag_bits & 0x08) == request.param for i in z.infolist())
+    return str(path)
+
+
+def _raw(path, name) -> bytes:
+    with zipfile.ZipFile(path) as z, open(path, "rb") as f:
+        info = z.getinfo(name)
+        f.seek(data_offset(f, info))
+        return f.read(info.compress_size)
+
+
+@pytest.mark.parametrize("repack", [repack_incremental, repack_full])
+def test_repack_swaps_dirty_entries_and_keeps_the_rest(tmp_path, jar, repack):
+    dat = tmp_path / "loadouts.dat"
+    dat.write_bytes(b"L2" * 1500)
+    new = tmp_path / "new.txt"
+    new.write_bytes(b"added")
+    out = str(tmp_path / "out.jar")
+    infos = repack(jar, out, {"modules/loadouts.dat": str(dat), "modules/new.txt": str(new)})
+    check_written(out, infos)
+
+    with zipfile.ZipFile(out) as z:
+        assert z.testzip() is None
+        assert z.comment == b"game build 42"
+        assert z.namelist() == [name for name, _, _ in FILES] + ["modules/new.txt"]
+        assert z.read("modules/loadouts.dat") == b"L2" * 1500
+        assert z.read("modules/new.txt") == b"added"
+        for name, data, method in FILES:
+            if name != "modules/loadouts.dat":
+                assert z.read(name) == data
+                assert z.getinfo(name).compress_type == method
+
+
+def test_incremental_repack_copies_unchanged_entries_raw(tmp_path, jar):
+    dat = tmp_path / "loadouts.dat"
+    dat.write_bytes(b"L2")
+    out = str(tmp_path / "out.jar")
+    repack_incremental(jar, out, {"modules/loadouts.dat": str(dat)})
+    with zipfile.ZipFile(jar) as src, zipfile.ZipFile(out) as z:
+        for name in ("META-INF/MANIFEST.MF", "dot/A.class", "dot/B.class"):
+            assert _raw(out, name) == _raw(jar, name)
+            assert z.getinfo(name).flag_bits == src.getinfo(name).flag_bits
+        assert not z.getinfo("modules/loadouts.dat").flag_bits & 0x08
+        # whole local records go across, data descriptors included
+        with open(jar, "rb") as f:
+            before = f.read()
+        with open(out, "rb") as f:
+            after = f.read()
+        cut = src.getinfo("modules/loadouts.dat").header_offset
+        assert after[:cut] == before[:cut]
+        b_src, b_out = src.getinfo("dot/B.class").header_offset, z.getinfo("dot/B.class").header_offset
+        assert after[b_out:z.start_dir] == before[b_src:src.start_dir]
+
+
+def test_check_written_rejects_a_directory_that_does_not_match(tmp_path, jar):
+    out = str(tmp_path / "out.jar")
+    infos = repack_incremental(jar, out, {})
+    with pytest.raises(zipfile.BadZipFile):
+        check_written(out, infos[:-1])
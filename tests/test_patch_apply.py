@@ -0,0 +1,73 @@
+import pytest
+from app.patch_engine.patch_apply import merge_layers, merge_patch, patch_values
+from app.patch_engine.patch_store import PatchStore
+from app.safety.hashes import sha256_json
+
+BASE = {"key": "A", "name": "A", "perks": ["p1"], "sortOrder": 1}
+
+
+def _patch(tmp_path, new, base=BASE, profile=None, whole=False):
+    """A stored patch from `base` to `new`; `whole` stores the whole record instead."""
+    store = PatchStore(str(tmp_path / (profile or "default")))
+    store.record_patch("Loadouts", "A", new, base_hash=sha256_json(base), base=None if whole else base)
+    (p,) = store.latest()
+    return dict(p, profile=profile) if profile else p
+
+
+def test_minimal_patch_applies_as_is_on_its_own_base(tmp_path):
+    p = _patch(tmp_path, dict(BASE, name="A2", sortOrder=None))
+    assert {op["path"] for op in p["ops"]} == {"/name", "/sortOrder"}
+    assert p["base"] == {"name": "A", "sortOrder": 1}
+    assert patch_values(p) == {"name": "A2", "sortOrder": None}
+    assert merge_patch(p, BASE, sha256_json(BASE)) == (dict(BASE, name="A2", sortOrder=None), [])
+
+
+def test_upstream_changes_elsewhere_merge_cleanly(tmp_path):
+    p = _patch(tmp_path, {k: v for k, v in BASE.items() if k != "sortOrder"} | {"name": "A2"})
+    upstream = dict(BASE, perks=["p1", "p2"], description="new")
+    merged, conflicts = merge_patch(p, upstream, sha256_json(upstream))
+    assert conflicts == []
+    assert merged == {"key": "A", "name": "A2", "perks": ["p1", "p2"], "description": "new"}
+
+
+def test_upstream_change_to_an_edited_field_is_a_conflict(tmp_path):
+    p = _patch(tmp_path, dict(BASE, name="A2", perks=["p9"]))
+    upstream = dict(BASE, name="Upstream", perks=["p9"])
+    merged, conflicts = merge_patch(p, upstream, sha256_json(upstream))
+    assert merged == upstream       # upstream's value stays; the same value is no conflict
+    assert conflicts == [{"field": "name", "base": "A", "ours": "A2", "theirs": "Upstream"}]
+
+
+def test_whole_record_patch_conflicts_on_every_difference_once_upstream_moved(tmp_path):
+    p = _patch(tmp_path, dict(BASE, name="A2"), whole=True)
+    assert merge_patch(p, BASE, sha256_json(BASE)) == (dict(BASE, name="A2"), [])
+    upstream = dict(BASE, sortOrder=2)
+    merged, conflicts = merge_patch(p, upstream, sha256_json(upstream))
+    assert merged == upstream
+    assert [c["field"] for c in conflicts] == ["name", "sortOrder"]
+
+
+def test_layers_take_each_field_from_the_highest_layer_touching_it(tmp_path):
+    low = _patch(tmp_path, dict(BASE, name="Low", sortOrder=5), profile="balance")
+    high = _patch(tmp_path, dict(BASE, name="High", perks=["p1", "p2"]), profile="content")
+    merged, conflicts = merge_patch({"layers": [low, high]}, BASE, sha256_json(BASE))
+    assert conflicts == []
+    assert merged == {"key": "A", "name": "High", "perks": ["p1", "p2"], "sortOrder": 5}
+
+
+def test_layer_conflicts_are_reported_only_for_the_winning_layer(tmp_path):
+    low = _patch(tmp_path, dict(BASE, name="Low", sortOrder=5), profile="balance")
+    high = _patch(tmp_path, dict(BASE, name="High"), profile="content")
+    upstream = dict(BASE, name="Upstream", sortOrder=7)
+    merged, conflicts = merge_layers([low, high], upstream, sha256_json(upstream))
+    assert merged == upstream
+    assert sorted((c["profile"], c["field"]) for c in conflicts) == [("balance", "sortOrder"), ("content", "name")]
+
+
+@pytest.mark.parametrize("whole", [False, True], ids=["minimal", "whole"])
+def test_only_a_whole_record_layer_hides_the_ones_beneath(tmp_path, whole):
+    low = _patch(tmp_path, dict(BASE, sortOrder=5), profile="balance")
+    top = _patch(tmp_path, dict(BASE, name="Top"), profile="content", whole=whole)
+    merged, _ = merge_layers([low, top], BASE, sha256_json(BASE))
+    assert merged["name"] == "Top"
+    assert merged["sortOrder"] == (1 if whole else 5)
@@ -0,0 +1,120 @@
+import json, zipfile
+import pytest
+from app.data import dat_parser
+from app.data.jar_io import JarSession
+from app.patch_engine.bulk import rename_reference
+from app.patch_engine.patch_apply import apply_all
+from app.patch_engine.patch_store import PatchStore
+from app.safety.backups import BackupManager
+
+JAVA_MAGIC = b"\xac\xed\x00\x05"
+VANILLA = [{"key": "A", "name": "A", "perks": ["p1"]}, {"key": "B", "name": "B"}]
+
+
+def _dat(records) -> bytes:
+    return JAVA_MAGIC + json.dumps(records).encode("utf-8")
+
+
+def _stream(path, type_names):
+    """Stands in for the helper: the .dat is the magic plus a JSON array of Loadouts."""
+    with open(path, "rb") as f:
+        records = json.loads(f.read()[len(JAVA_MAGIC):])
+    for r in records:
+        yield "Loadouts", r
+
+
+def _write(path, records):
+    with open(path, "wb") as f:
+        f.write(_dat(records))
+
+
+@pytest.fixture
+def jar(tmp_path, monkeypatch):
+    monkeypatch.chdir(tmp_path)     # schema validators are cached under ./profiles
+    monkeypatch.setenv("DOTMODDER_WARMUP", "0")
+    monkeypatch.setattr(dat_parser, "_stream_java", _stream)
+    monkeypatch.setattr(dat_parser, "_write_loadouts", _write)
+    path = str(tmp_path / "DOT.jar")
+    with zipfile.ZipFile(path, "w") as z:
+        z.writestr("dot/A.class", b"A")
+        z.writestr("modules/loadouts.dat", _dat(VANILLA))
+    return path
+
+
+def _save(jar, backups, store, key, fields):
+    """What the editor's save does: edit, record the patch, write the JAR."""
+    with JarSession.open(jar, backups) as session:
+        session.auto_flush = False
+        record = dict(session.get_record("Loadouts", key) if session.has_record("Loadouts", key) else {}, **fields)
+        session.update_record("Loadouts", key, record)
+        base, base_hash = session.patch_base("Loadouts", key)
+        store.record_patch("Loadouts", key, record, base_hash=base_hash, base=base)
+        session.flush()
+
+
+def test_later_saves_keep_the_fields_of_earlier_ones(tmp_path, jar):
+    backups = BackupManager(str(tmp_path / "profiles"))
+    store = PatchStore(str(tmp_path / "profiles" / "default"))
+    _save(jar, backups, store, "A", {"name": "A2", "perks": ["p1", "p9"]})
+    _save(jar, backups, store, "A", {"sortOrder": 5})
+
+    with JarSession.open(jar, backups) as session:
+        session.auto_flush = False
+        session.restore_all()
+        assert session.has_record("Loadouts", "A")
+        assert session.get_record("Loadouts", "A") == VANILLA[0]
+        assert apply_all(session, store) == []
+        assert session.get_record("Loadouts", "A") == {"key": "A", "name": "A2", "perks": ["p1", "p9"], "sortOrder": 5}
+
+
+def test_a_new_record_is_stored_whole(tmp_path, jar):
+    backups = BackupManager(str(tmp_path / "profiles"))
+    store = PatchStore(str(tmp_path / "profiles" / "default"))
+    _save(jar, backups, store, "C", {"key": "C", "name": "C"})
+    (patch,) = store.latest()
+    assert patch["target"]["baseHash"] is None and patch["ops"][0]["path"] == "/"
+
+
+def test_bulk_edits_keep_the_fields_of_earlier_saves(tmp_path, jar):
+    backups = BackupManager(str(tmp_path / "profiles"))
+    store = PatchStore(str(tmp_path / "profiles" / "default"))
+    _save(jar, backups, store, "A", {"name": "A2"})
+    with JarSession.open(jar, backups) as session:
+        session.auto_flush = False
+        assert rename_reference(session, store, "perk", "p1", "p2")["changed"] == [("Loadouts", "A")]
+        session.flush()
+
+    with JarSession.open(jar, backups) as session:
+        session.auto_flush = False
+        session.restore_all()
+        assert apply_all(session, store) == []
+        assert session.get_record("Loadouts", "A") == {"key": "A", "name": "A2", "perks": ["p2"]}
+
+
+def test_bulk_edits_skip_partly_read_types(tmp_path, jar, monkeypatch):
+    def dies(path, type_names):
+        yield from _stream(path, type_names)
+        raise dat_parser._DumpFailed("Helper daemon died mid-dump", error="connection reset")
+
+    monkeypatch.setattr(dat_parser, "_stream_java", dies)
+    store = PatchStore(str(tmp_path / "profiles" / "default"))
+    with JarSession.open(jar, BackupManager(str(tmp_path / "profiles"))) as session:
+        session.auto_flush = False
+        result = rename_reference(session, store, "perk", "p1", "p2")
+        assert result["changed"] == []
+        assert [s["key"] for s in result["skipped"]] == ["A"]
+        assert not session.has_pending
+    assert store.latest() == []
+
+
+def test_restoring_a_record_of_an_unread_type(tmp_path, jar):
+    backups = BackupManager(str(tmp_path / "profiles"))
+    _save(jar, backups, PatchStore(str(tmp_path / "profiles" / "default")), "A", {"name": "A2"})
+    with JarSession.open(jar, backups) as session:
+        session.auto_flush = False
+        session.restore_record("Loadouts", "A")
+        assert session.get_record("Loadouts", "A") == VANILLA[0]
+        assert session.search("Loadouts", "A2") == []
+        session.flush()
+    with zipfile.ZipFile(jar) as z:
+        assert json.loads(z.read("modules/loadouts.dat")[len(JAVA_MAGIC):]) == VANILLA
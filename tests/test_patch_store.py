@@ -0,0 +1,50 @@
+import json
+from app.patch_engine.patch_store import PatchStore
+
+
+def _edit(store, key, name):
+    store.record_patch("Loadouts", key, {"key": key, "name": name}, base_hash="h", base={"key": key, "name": key})
+
+
+def _names(store):
+    return [(p["target"]["key"], p["ops"][0]["value"]) for p in store.latest()]
+
+
+def test_latest_keeps_one_patch_per_record_in_order_of_last_edit(tmp_path):
+    store = PatchStore(str(tmp_path))
+    _edit(store, "A", "A1")
+    _edit(store, "B", "B1")
+    _edit(store, "A", "A2")
+    assert _names(store) == [("B", "B1"), ("A", "A2")]
+    assert store.latest()[1]["base"] == {"name": "A"}
+
+
+def test_the_index_picks_up_lines_appended_elsewhere(tmp_path):
+    store, other = PatchStore(str(tmp_path)), PatchStore(str(tmp_path))
+    _edit(store, "A", "A1")
+    assert _names(store) == [("A", "A1")]
+    _edit(other, "A", "A2")
+    with open(store.file, "a", encoding="utf-8") as f:
+        f.write('{"target": {"type": "Loadouts", "key": "C"')    # still being written
+    assert _names(store) == [("A", "A2")]
+    with open(store.file, "a", encoding="utf-8") as f:
+        f.write('}, "ops": [{"op": "replace", "path": "/name", "value": "C1"}]}\n')
+    assert _names(store) == [("A", "A2"), ("C", "C1")]
+
+
+def test_compact_rewrites_the_log_to_the_latest_patches(tmp_path):
+    store = PatchStore(str(tmp_path))
+    store.COMPACT_MIN_LINES = 4
+    for n in range(3):
+        _edit(store, "A", f"A{n}")
+        _edit(store, "B", f"B{n}")
+    assert store.needs_compaction()
+    before = store.latest()
+    store.compact()
+    assert store.latest() == before
+    with open(store.file, encoding="utf-8") as f:
+        assert [json.loads(line) for line in f] == before
+    assert not store.needs_compaction()
+
+    _edit(store, "A", "A9")     # appends after a compaction are indexed as usual
+    assert _names(PatchStore(str(tmp_path))) == _names(store) == [("B", "B2"), ("A", "A9")]
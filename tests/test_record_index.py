@@ -0,0 +1,16 @@
+import pytest
+from app.data.record_index import RecordIndex, matches, query_words, record_tokens
+
+RECORDS = [
+    ("class_knight", {"name": "Knight", "perks": ["squires_training"], "lootTable": "class_knight"}),
+    ("class_fighter", {"name": "Fighter", "description": "Axes and shields", "perks": []}),
+    ("bg_noble", {"name": "Noble", "skills": ["chivalry", "persuasion"]}),
+]
+
+
+@pytest.mark.parametrize("query", ["k", "fig ax", "class", "chiv per", "knight fighter", "s", "zzz", ""])
+def test_streaming_match_agrees_with_the_index(query):
+    index = RecordIndex(RECORDS)
+    words = query_words(query)
+    streamed = [k for k, r in RECORDS if matches(words, record_tokens(k, r))]
+    assert streamed == index.search(query)
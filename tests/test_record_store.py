@@ -0,0 +1,61 @@
+import pytest
+from app.data.record_store import RecordStore, thaw
+from app.safety.hashes import sha256_json
+
+ORIGINAL = {"key": "A", "name": "A", "perks": ["p1"], "stats": {"hp": 10}}
+
+
+@pytest.fixture
+def store():
+    s = RecordStore()
+    s.load("Loadouts", "A", ORIGINAL)
+    return s
+
+
+def test_unedited_view_is_the_frozen_original(store):
+    view = store.view("Loadouts", "A")
+    assert thaw(view) == ORIGINAL and store.view("Loadouts", "A") is view
+    with pytest.raises(TypeError):
+        view["name"] = "x"
+    with pytest.raises(TypeError):
+        view["stats"]["hp"] = 1
+    assert store.base_hash("Loadouts", "A") == sha256_json(ORIGINAL)
+
+
+def test_edits_are_kept_as_field_deltas(store):
+    store.set("Loadouts", "A", {"key": "A", "name": "A2", "perks": ["p1"]})
+    assert set(store._delta[("Loadouts", "A")]) == {"name", "stats"}     # changed, removed
+    assert store.get("Loadouts", "A") == {"key": "A", "name": "A2", "perks": ["p1"]}
+    assert store.original("Loadouts", "A") == ORIGINAL
+    assert store.view("Loadouts", "A")["perks"] is store.view("Loadouts", "A")["perks"]     # shared, not copied
+
+    store.set("Loadouts", "A", ORIGINAL)    # back to the original: no delta left
+    assert ("Loadouts", "A") not in store._delta
+
+
+def test_get_hands_out_private_copies(store):
+    record = store.get("Loadouts", "A")
+    record["perks"].append("p2")
+    record["stats"]["hp"] = 1
+    assert store.get("Loadouts", "A") == ORIGINAL
+
+
+def test_reload_keeps_unsaved_edits_only_when_asked(store):
+    store.set("Loadouts", "A", dict(ORIGINAL, name="mine"))
+    store.load("Loadouts", "A", dict(ORIGINAL, name="disk"), keep_edits=True)
+    assert store.get("Loadouts", "A")["name"] == "mine"
+    store.load("Loadouts", "A", dict(ORIGINAL, name="disk"))
+    assert store.get("Loadouts", "A")["name"] == "disk"
+    assert store.original("Loadouts", "A") == ORIGINAL      # the first read stays the original
+
+
+def test_new_records_revert_and_discard(store):
+    store.set("Loadouts", "B", {"key": "B", "name": "B"})
+    assert store.keys("Loadouts") == ["A", "B"]
+    assert not store.has_original("Loadouts", "B")
+    assert store.revert("Loadouts", "B") is False
+    store.discard("Loadouts", "B")
+    assert store.keys("Loadouts") == ["A"] and ("Loadouts", "B") not in store
+    store.set("Loadouts", "A", {"key": "A"})
+    assert store.revert("Loadouts", "A") is True
+    assert store.get("Loadouts", "A") == ORIGINAL
@@ -30,24 +30,26 @@ public class DumpLoadouts {
     out.append("\"").append(esc(key)).append("\":").append(jsonValue);
   }
 
-  public static void main(String[] args) throws Exception {
-    if(args.length<2){ System.err.println("Usage: java -cp .;<DOT.jar> DumpLoadouts <modules\\loadouts.dat> <arrays:true|false>"); System.exit(1); }
-    String dat = args[0];
-    boolean arrays = Boolean.parseBoolean(args[1]);
-
-    Object root = new ObjectInputStream(new FileInputStream(dat)).readObject();
-    FileCache fc = (FileCache) root;
+  static FileCache load(String dat) throws Exception {
+    try(ObjectInputStream in=new ObjectInputStream(new BufferedInputStream(new FileInputStream(dat)))){ return (FileCache) in.readObject(); }
+  }
 
+  static Object findLoadoutsXml(FileCache fc){
     Object loadoutsXml = fc.xmlFiles.get("/modules/loadouts/data/loadouts.xml");
     if(loadoutsXml==null){
       for(Object k : fc.xmlFiles.keySet()){
         if(k instanceof String && ((String)k).toLowerCase().endsWith("loadouts.xml")) { loadoutsXml = fc.xmlFiles.get(k); break; }
       }
     }
-    if(loadoutsXml==null){ System.out.print("[]"); return; }
+    return loadoutsXml;
+  }
+
+  static String dump(FileCache fc, boolean arrays) throws Exception {
+    Object loadoutsXml = findLoadoutsXml(fc);
+    if(loadoutsXml==null) return "[]";
 
     Object arrObj = f(loadoutsXml,"loadouts").get(loadoutsXml);
-    if(!(arrObj instanceof Object[])){ System.out.print("[]"); return; }
+    if(!(arrObj instanceof Object[])) return "[]";
     Object[] arr = (Object[]) arrObj;
 
     StringBuilder out=new StringBuilder(); out.append("[");
@@ -110,6 +112,13 @@ public class DumpLoadouts {
       out.append("}");
     }
     out.append("]");
-    System.out.print(out.toString());
+    return out.toString();
+  }
+
+  public static void main(String[] args) throws Exception {
+    if(args.length<2){ System.err.println("Usage: java -cp .;<DOT.jar> DumpLoadouts <modules\\loadouts.dat> <arrays:true|false>"); System.exit(1); }
+    String dat = args[0];
+    boolean arrays = Boolean.parseBoolean(args[1]);
+    System.out.print(dump(load(dat), arrays));
   }
 }
\ No newline at end of file
@@ -0,0 +1,158 @@
+import java.io.*;
+import java.lang.reflect.*;
+import java.nio.charset.StandardCharsets;
+import java.util.*;
+import dot.loading.filecache.FileCache;
+
+/**
+ * Dumps several object types from one deserialized FileCache, walking xmlFiles once.
+ *
+ * Specs (JSON array, one per type):
+ *   {"type":"Loadouts","path":"/modules/loadouts/data/loadouts.xml","xml":"loadouts.xml",
+ *    "array":"loadouts","fields":[["key","string"],["sortOrder","int"],["perks","list"],...]}
+ * An exact "path" match wins over an "xml" suffix match. Field kinds: string | int |
+ * list (comma-separated string -> JSON array). Without "fields", every non-static String,
+ * number or boolean field of the element class is emitted. Null fields are left out.
+ *
+ * dumpAll() returns {"Loadouts":[...],...}; types whose xml is not in the cache are left out.
+ * each() hands records to a Sink one at a time, which is how main() and the daemon's
+ * "dump_stream" command stream them without building the whole document.
+ */
+public class DumpTypes {
+
+  interface Sink {
+    void begin(String type) throws IOException;
+    void record(String type, String json) throws IOException;
+  }
+
+  static String str(Map<String, Object> spec, String name) {
+    Object v = spec.get(name);
+    return v == null ? null : String.valueOf(v);
+  }
+
+  @SuppressWarnings("unchecked")
+  static void each(FileCache fc, List<Object> specs, Sink sink) throws Exception {
+    Map<String, Object> exact = new HashMap<>();    // type -> xml object
+    Map<String, Object> suffix = new HashMap<>();
+    for (Object o : fc.xmlFiles.entrySet()) {
+      Map.Entry<?, ?> e = (Map.Entry<?, ?>) o;
+      if (!(e.getKey() instanceof String)) continue;
+      String path = (String) e.getKey();
+      for (Object s : specs) {
+        Map<String, Object> spec = (Map<String, Object>) s;
+        String type = str(spec, "type");
+        String want = str(spec, "path");
+        String xml = str(spec, "xml");
+        if (want != null && path.equals(want)) {
+          exact.put(type, e.getValue());
+        } else if (xml != null && !suffix.containsKey(type) && path.toLowerCase().endsWith(xml.toLowerCase())) {
+          suffix.put(type, e.getValue());
+        }
+      }
+    }
+
+    for (Object s : specs) {
+      Map<String, Object> spec = (Map<String, Object>) s;
+      String type = str(spec, "type");
+      Object xml = exact.containsKey(type) ? exact.get(type) : suffix.get(type);
+      if (xml == null) continue;
+      sink.begin(type);
+      dumpType(xml, spec, type, sink);
+    }
+  }
+
+  static String dumpAll(FileCache fc, List<Object> specs) throws Exception {
+    StringBuilder out = new StringBuilder("{");
+    each(fc, specs, new Sink() {
+      int types = 0, records = 0;
+      public void begin(String type) {
+        if (types++ > 0) out.append("],");
+        out.append(DumpLoadouts.q(type)).append(":[");
+        records = 0;
+      }
+      public void record(String type, String json) {
+        if (records++ > 0) out.append(",");
+        out.append(json);
+      }
+    });
+    if (out.length() > 1) out.append("]");
+    return out.append("}").toString();
+  }
+
+  @SuppressWarnings("unchecked")
+  static void dumpType(Object xml, Map<String, Object> spec, String type, Sink sink) throws Exception {
+    Object arrObj = DumpLoadouts.f(xml, str(spec, "array")).get(xml);
+    if (!(arrObj instanceof Object[])) return;
+    List<Object> fields = (List<Object>) spec.get("fields");
+
+    for (Object el : (Object[]) arrObj) {
+      StringBuilder out = new StringBuilder("{");
+      boolean[] first = new boolean[]{true};
+      if (fields != null) {
+        for (Object fo : fields) {
+          List<Object> fk = (List<Object>) fo;
+          String name = String.valueOf(fk.get(0));
+          String kind = String.valueOf(fk.get(1));
+          DumpLoadouts.addKV(out, first, name, value(el, name, kind));
+        }
+      } else {
+        dumpAllFields(out, first, el);
+      }
+      sink.record(type, out.append("}").toString());
+    }
+  }
+
+  static String value(Object el, String name, String kind) {
+    switch (kind) {
+      case "int": {
+        Integer v = DumpLoadouts.i(el, name);
+        return v == null ? null : String.valueOf(v);
+      }
+      case "list":
+        return DumpLoadouts.csvToJson(DumpLoadouts.s(el, name));
+      default:
+        return DumpLoadouts.q(DumpLoadouts.s(el, name));
+    }
+  }
+
+  static void dumpAllFields(StringBuilder out, boolean[] first, Object el) throws Exception {
+    for (Class<?> c = el.getClass(); c != null && c != Object.class; c = c.getSuperclass()) {
+      for (Field x : c.getDeclaredFields()) {
+        if (Modifier.isStatic(x.getModifiers())) continue;
+        x.setAccessible(true);
+        Object v = x.get(el);
+        if (v instanceof String) {
+          DumpLoadouts.addKV(out, first, x.getName(), DumpLoadouts.q((String) v));
+        } else if (v instanceof Boolean || v instanceof Integer || v instanceof Long || v instanceof Short || v instanceof Byte) {
+          DumpLoadouts.addKV(out, first, x.getName(), String.valueOf(v));
+        } else if (v instanceof Number && !Double.isNaN(((Number) v).doubleValue()) && !Double.isInfinite(((Number) v).doubleValue())) {
+          DumpLoadouts.addKV(out, first, x.getName(), String.valueOf(v));
+        }
+      }
+    }
+  }
+
+  /** NDJSON: one ["Type",{record}] array per line, written as records are dumped. */
+  @SuppressWarnings("unchecked")
+  public static void main(String[] args) throws Exception {
+    if (args.length < 2) {
+      System.err.println("Usage: java -cp .;<DOT.jar> DumpTypes <modules\\loadouts.dat> <specs-json>");
+      System.exit(1);
+    }
+    Object specs = WriteLoadouts.JsonParser.parse(args[1]);
+    if (!(specs instanceof List)) {
+      System.err.println("Expected a JSON array of type specs");
+      System.exit(1);
+    }
+    Writer out = new BufferedWriter(new OutputStreamWriter(new FileOutputStream(FileDescriptor.out), StandardCharsets.UTF_8), 1 << 16);
+    System.setOut(System.err);      // game classes printing must not corrupt the stream
+    FileCache fc = DumpLoadouts.load(args[0]);
+    each(fc, (List<Object>) specs, new Sink() {
+      public void begin(String type) {}
+      public void record(String type, String json) throws IOException {
+        out.write("[" + DumpLoadouts.q(type) + "," + json + "]\n");
+      }
+    });
+    out.flush();
+  }
+}
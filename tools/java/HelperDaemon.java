@@ -0,0 +1,168 @@
+import java.io.*;
+import java.nio.charset.StandardCharsets;
+import java.util.*;
+import dot.loading.filecache.FileCache;
+
+/**
+ * Long-lived helper for the Python side. Keeps deserialized FileCaches in memory and
+ * serves dump/write/ping commands over stdin/stdout.
+ *
+ * Framing (both directions): 4-byte big-endian length, then that many bytes of UTF-8 JSON.
+ *   request:  {"cmd":"ping"} | {"cmd":"dump","path":...,"arrays":true}
+ *             | {"cmd":"dump_types","path":...,"types":[<DumpTypes spec>,...]}
+ *             | {"cmd":"dump_stream","path":...,"types":[...]}
+ *             | {"cmd":"write","path":...,"records":[...]} | {"cmd":"shutdown"}
+ *   response: {"ok":true,"result":<json>} | {"ok":false,"error":"..."}
+ *   dump_stream sends one {"ok":true,"item":["Type",{record}]} frame per record before
+ *   its final response.
+ */
+public class HelperDaemon {
+
+  static final String VERSION = "3";
+
+  static final class Cached {
+    final FileCache fc;
+    final long modified;
+    final long length;
+
+    Cached(FileCache fc, File file) {
+      this.fc = fc;
+      this.modified = file.lastModified();
+      this.length = file.length();
+    }
+
+    boolean matches(File file) {
+      return modified == file.lastModified() && length == file.length();
+    }
+  }
+
+  static final Map<String, Cached> CACHE = new HashMap<>();
+
+  static FileCache cached(String path) throws Exception {
+    File file = new File(path);
+    Cached c = CACHE.get(path);
+    if (c != null && c.matches(file)) {
+      return c.fc;
+    }
+    FileCache fc = DumpLoadouts.load(path);
+    CACHE.put(path, new Cached(fc, file));
+    return fc;
+  }
+
+  static String str(Map<String, Object> req, String name) {
+    Object v = req.get(name);
+    if (v == null) {
+      throw new IllegalArgumentException("Missing field: " + name);
+    }
+    return String.valueOf(v);
+  }
+
+  @SuppressWarnings("unchecked")
+  static String handle(Map<String, Object> req) throws Exception {
+    String cmd = str(req, "cmd");
+    switch (cmd) {
+      case "ping":
+        return "{\"version\":" + DumpLoadouts.q(VERSION) + "}";
+      case "dump": {
+        boolean arrays = !Boolean.FALSE.equals(req.get("arrays"));
+        return DumpLoadouts.dump(cached(str(req, "path")), arrays);
+      }
+      case "dump_types": {
+        Object types = req.get("types");
+        if (!(types instanceof List)) {
+          throw new IllegalArgumentException("Expected types array");
+        }
+        return DumpTypes.dumpAll(cached(str(req, "path")), (List<Object>) types);
+      }
+      case "write": {
+        String path = str(req, "path");
+        Object records = req.get("records");
+        if (!(records instanceof List)) {
+          throw new IllegalArgumentException("Expected records array");
+        }
+        FileCache fc = cached(path);
+        try {
+          WriteLoadouts.apply(fc, (List<Object>) records);
+          WriteLoadouts.save(fc, path);
+        } catch (Exception e) {
+          // fc may be half-updated; reload from disk next time.
+          CACHE.remove(path);
+          throw e;
+        }
+        CACHE.put(path, new Cached(fc, new File(path)));
+        return "null";
+      }
+      default:
+        throw new IllegalArgumentException("Unknown command: " + cmd);
+    }
+  }
+
+  static void send(DataOutputStream out, String json) throws IOException {
+    byte[] body = json.getBytes(StandardCharsets.UTF_8);
+    out.writeInt(body.length);
+    out.write(body);
+  }
+
+  static void reply(DataOutputStream out, String json) throws IOException {
+    send(out, json);
+    out.flush();
+  }
+
+  static final int STREAM_FLUSH_EVERY = 256;  // records per flush while streaming
+
+  @SuppressWarnings("unchecked")
+  static void stream(Map<String, Object> req, DataOutputStream out) throws Exception {
+    Object types = req.get("types");
+    if (!(types instanceof List)) {
+      throw new IllegalArgumentException("Expected types array");
+    }
+    DumpTypes.each(cached(str(req, "path")), (List<Object>) types, new DumpTypes.Sink() {
+      int n = 0;
+      public void begin(String type) {}
+      public void record(String type, String json) throws IOException {
+        send(out, "{\"ok\":true,\"item\":[" + DumpLoadouts.q(type) + "," + json + "]}");
+        if (++n % STREAM_FLUSH_EVERY == 0) out.flush();
+      }
+    });
+  }
+
+  @SuppressWarnings("unchecked")
+  public static void main(String[] args) throws Exception {
+    DataInputStream in = new DataInputStream(new BufferedInputStream(System.in));
+    DataOutputStream out = new DataOutputStream(new BufferedOutputStream(new FileOutputStream(FileDescriptor.out)));
+    // Anything printed by game classes must not corrupt the frame stream.
+    System.setOut(System.err);
+
+    while (true) {
+      int len;
+      try {
+        len = in.readInt();
+      } catch (EOFException eof) {
+        break;
+      }
+      byte[] buf = new byte[len];
+      in.readFully(buf);
+
+      try {
+        Object parsed = WriteLoadouts.JsonParser.parse(new String(buf, StandardCharsets.UTF_8));
+        if (!(parsed instanceof Map)) {
+          throw new IllegalArgumentException("Expected request object");
+        }
+        Map<String, Object> req = (Map<String, Object>) parsed;
+        if ("shutdown".equals(req.get("cmd"))) {
+          reply(out, "{\"ok\":true,\"result\":null}");
+          break;
+        }
+        if ("dump_stream".equals(req.get("cmd"))) {
+          stream(req, out);
+          reply(out, "{\"ok\":true,\"result\":null}");
+          continue;
+        }
+        reply(out, "{\"ok\":true,\"result\":" + handle(req) + "}");
+      } catch (Throwable t) {
+        String msg = t.getClass().getSimpleName() + (t.getMessage() == null ? "" : ": " + t.getMessage());
+        reply(out, "{\"ok\":false,\"error\":" + DumpLoadouts.q(msg) + "}");
+      }
+    }
+  }
+}
@@ -293,34 +293,24 @@ public class WriteLoadouts {
     set(target, "selectPerks", listToCsv(record.get("selectPerks")));
   }
 
-  @SuppressWarnings("unchecked")
-  public static void main(String[] args) throws Exception {
-    if (args.length < 2) {
-      System.err.println("Usage: java -cp .;<DOT.jar> WriteLoadouts <modules\\loadouts.dat> <json file>");
-      System.exit(1);
-    }
-    String datPath = args[0];
-    String jsonPath = args[1];
-
-    StringBuilder buf = new StringBuilder();
-    try (BufferedReader br = new BufferedReader(new InputStreamReader(new FileInputStream(jsonPath), "UTF-8"))) {
-      String line;
-      while ((line = br.readLine()) != null) {
-        buf.append(line);
-      }
+  static FileCache load(String datPath) throws Exception {
+    try (ObjectInputStream ois = new ObjectInputStream(new BufferedInputStream(new FileInputStream(datPath)))) {
+      return (FileCache) ois.readObject();
     }
+  }
 
-    Object parsed = JsonParser.parse(buf.toString());
-    if (!(parsed instanceof List)) {
-      throw new JsonParseException("Expected top-level array");
+  static void save(FileCache fc, String datPath) throws Exception {
+    // Write next to the target and swap, so a crash mid-write never leaves a truncated .dat.
+    File target = new File(datPath);
+    File tmp = new File(datPath + ".tmp");
+    try (ObjectOutputStream oos = new ObjectOutputStream(new BufferedOutputStream(new FileOutputStream(tmp)))) {
+      oos.writeObject(fc);
     }
-    List<Object> records = (List<Object>) parsed;
-
-    ObjectInputStream ois = new ObjectInputStream(new FileInputStream(datPath));
-    Object root = ois.readObject();
-    ois.close();
-    FileCache fc = (FileCache) root;
+    java.nio.file.Files.move(tmp.toPath(), target.toPath(), java.nio.file.StandardCopyOption.REPLACE_EXISTING);
+  }
 
+  @SuppressWarnings("unchecked")
+  static void apply(FileCache fc, List<Object> records) throws Exception {
     Object loadoutsXml = fc.xmlFiles.get("/modules/loadouts/data/loadouts.xml");
     if (loadoutsXml == null) {
       for (Object k : fc.xmlFiles.keySet()) {
@@ -371,9 +361,33 @@ public class WriteLoadouts {
       newArr[i] = newList.get(i);
     }
     loadoutsField.set(loadoutsXml, newArr);
+  }
+
+  @SuppressWarnings("unchecked")
+  public static void main(String[] args) throws Exception {
+    if (args.length < 2) {
+      System.err.println("Usage: java -cp .;<DOT.jar> WriteLoadouts <modules\\loadouts.dat> <json file>");
+      System.exit(1);
+    }
+    String datPath = args[0];
+    String jsonPath = args[1];
+
+    StringBuilder buf = new StringBuilder();
+    try (BufferedReader br = new BufferedReader(new InputStreamReader(new FileInputStream(jsonPath), "UTF-8"))) {
+      String line;
+      while ((line = br.readLine()) != null) {
+        buf.append(line);
+      }
+    }
+
+    Object parsed = JsonParser.parse(buf.toString());
+    if (!(parsed instanceof List)) {
+      throw new JsonParseException("Expected top-level array");
+    }
+    List<Object> records = (List<Object>) parsed;
 
-    ObjectOutputStream oos = new ObjectOutputStream(new FileOutputStream(datPath));
-    oos.writeObject(fc);
-    oos.close();
+    FileCache fc = load(datPath);
+    apply(fc, records);
+    save(fc, datPath);
   }
 }